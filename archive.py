@@ -0,0 +1,405 @@
+# archive.py
+"""
+서버 내장 장시간 아카이브 (녹음 탭) + 시간 구간 추출.
+
+ArchiveTap (쓰기):
+- 캡처 링(PcmRing / SharedPcmRing)을 전용 스레드가 자기 커서로 읽음
+  → 송신 경로(_fanout)와 무관, 디스크가 느려도 라이브 송출은 안 막힘 (밀리면 overrun 으로 구멍).
+- 세그먼트 = 고정 크기 WAV (44바이트 헤더 + segment_seconds 분량 PCM16).
+  열 때 전체 크기로 미리 할당하고 mmap 에 청크를 복사 (청크마다 write syscall 없음).
+- archive.idx : 작은 헤더 + 고정 길이 레코드 (시각 → 세그먼트 / 오프셋).
+  index_interval 초마다 1개, 구멍(overrun) / 시작 / 종료 때 1개씩 → 하루 ~2.4 MB.
+  같은 디렉터리로 다시 시작하면 다음 세그먼트부터 이어서 기록.
+
+ArchiveReader (읽기):
+- 인덱스를 numpy 로 읽어 bisect, 세그먼트는 mmap → 원하는 구간만 바로 슬라이스 (스캔 없음).
+- extract(start_ns, end_ns) : epoch ns 구간의 PCM16 (구멍은 0 으로 채워 길이 = 구간 길이).
+- 기록 중인 아카이브도 읽을 수 있음 (마지막 레코드 이후 ~index_interval 초는 다음 레코드부터 보임).
+
+    tap = ArchiveTap(ring, "archive", segment_seconds=600)
+    tap.start()
+    ...
+    tap.close()
+
+    with ArchiveReader("archive") as ar:
+        pcm = ar.extract(t0_ns, t0_ns + 30 * 10**9)
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from metrics import Gauge, PipelineMetrics
+from ring_buffer import PcmRing
+
+DEFAULT_SEGMENT_SECONDS = 600.0
+DEFAULT_INDEX_INTERVAL = 1.0
+DEFAULT_SAMPLE_RATE = 16000
+WAIT_TIMEOUT = 0.2
+
+INDEX_NAME = "archive.idx"
+INDEX_MAGIC = b"AMAR"
+INDEX_VERSION = 1
+# magic, version, channels, sample_rate, segment_frames
+INDEX_HEADER = struct.Struct("<4sHHii")
+# time_ns (epoch, 레코드 위치의 첫 샘플), seq, segment, byte_offset (PCM 기준), kind
+INDEX_RECORD = struct.Struct("<qqiii")
+INDEX_DTYPE = np.dtype(
+    [("time_ns", "<i8"), ("seq", "<i8"), ("segment", "<i4"), ("offset", "<i4"), ("kind", "<i4")]
+)
+
+KIND_START = 0   # 기록 시작 (새 세그먼트)
+KIND_MARK = 1    # 주기 레코드
+KIND_GAP = 2     # overrun 뒤 (시각이 건너뜀, 바이트는 이어짐)
+KIND_END = 3     # 정상 종료 (이 레코드부터는 데이터 없음)
+
+WAV_HEADER_SIZE = 44
+# 주기 레코드의 캡처 시각이 직전 구간 끝과 이 이내로 어긋나면 샘플이 이어진 것으로 배치
+SNAP_SECONDS = 0.1
+
+
+def _wav_header(data_bytes: int, sample_rate: int, channels: int) -> bytes:
+    block = channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block, block, 16,
+        b"data", data_bytes,
+    )
+
+
+def _segment_path(directory: str, n: int) -> str:
+    return os.path.join(directory, f"seg_{n:05d}.wav")
+
+
+def _read_index(path: str):
+    """(header tuple, records) – 끝에 잘린 레코드는 무시."""
+    with open(path, "rb") as f:
+        head = f.read(INDEX_HEADER.size)
+    if len(head) < INDEX_HEADER.size:
+        raise ValueError(f"archive index too short: {path}")
+    magic, version, channels, sample_rate, segment_frames = INDEX_HEADER.unpack(head)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise ValueError(f"not an archive index: {path}")
+    count = (os.path.getsize(path) - INDEX_HEADER.size) // INDEX_RECORD.size
+    records = np.fromfile(path, dtype=INDEX_DTYPE, count=count, offset=INDEX_HEADER.size)
+    return (channels, sample_rate, segment_frames), records
+
+
+class ArchiveTap:
+    """캡처 링의 기본 스트림(PCM16 모노)을 세그먼트 파일로 기록하는 소비자 스레드."""
+
+    def __init__(
+        self,
+        ring: PcmRing,
+        directory: str,
+        segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+        index_interval: float = DEFAULT_INDEX_INTERVAL,
+        status_cb: Optional[Callable[[str, object], None]] = None,
+        metrics: Optional[PipelineMetrics] = None,
+    ) -> None:
+        self.ring = ring
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.index_interval_ns = int(index_interval * 1e9)
+        self.status_cb = status_cb or (lambda tag, payload=None: None)
+        self.channels = 1
+        self.frame_bytes = 2 * self.channels
+        self.index_path = os.path.join(directory, INDEX_NAME)
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wall_offset = 0   # epoch ns - monotonic ns
+
+        # writer 스레드 상태
+        self.sample_rate = 0
+        self.segment_bytes = 0
+        self._index = None
+        self._segment = 0
+        self._offset = 0        # 현재 세그먼트 PCM 오프셋
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._last_mark = 0
+        self._end_ns = 0        # 마지막으로 기록한 샘플 끝 시각 (epoch)
+
+        self.bytes_written = 0
+        self.gaps = 0           # overrun 으로 놓친 청크 수
+        self.lag = 0
+        self.error: Optional[Exception] = None
+
+        if metrics is not None:
+            r = metrics.registry
+            r.register(
+                Gauge(
+                    "audiomi_archive_bytes",
+                    "PCM bytes written to the archive",
+                    lambda: self.bytes_written,
+                )
+            )
+            r.register(
+                Gauge(
+                    "audiomi_archive_missed_chunks",
+                    "chunks lost to archive overrun",
+                    lambda: self.gaps,
+                )
+            )
+            r.register(
+                Gauge("audiomi_archive_lag", "chunks the archive tap is behind", lambda: self.lag)
+            )
+
+    def _log(self, msg: str) -> None:
+        self.status_cb("status", msg)
+
+    # ---------- 제어 ----------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._wall_offset = time.time_ns() - time.monotonic_ns()
+        # 시작 시점(live)부터. 이전 청크는 기록하지 않음
+        cursor = self.ring.cursor()
+        self._thread = threading.Thread(target=self._run, args=(cursor,), daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """링에 남은 청크까지 기록하고 종료 (END 레코드, 세그먼트 flush)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    # ---------- writer 스레드 ----------
+    def _run(self, cursor) -> None:
+        ring = self.ring
+        try:
+            while True:
+                stopping = self._stop.is_set()
+                if not stopping and not ring.wait(cursor.seq, WAIT_TIMEOUT):
+                    continue
+                while True:
+                    missed = cursor.overruns
+                    item = cursor.next()
+                    if item is None:
+                        break
+                    seq, view = item
+                    gap = cursor.overruns - missed
+                    self.gaps += gap
+                    self._write_chunk(seq, ring.stamp(seq), view, gap > 0)
+                    self.lag = cursor.lag
+                if stopping:
+                    break
+        except (OSError, ValueError) as e:
+            self.error = e
+            self._log(f"[ARCHIVE] stopped: {e}")
+        finally:
+            try:
+                self._finish()
+            except OSError as e:
+                self.error = self.error or e
+
+    def _open_index(self) -> None:
+        self.sample_rate = self.ring.sample_rate or DEFAULT_SAMPLE_RATE
+        segment_frames = int(self.segment_seconds * self.sample_rate)
+        self.segment_bytes = segment_frames * self.frame_bytes
+        if not 0 < self.segment_bytes < 2**31:
+            raise ValueError(f"invalid segment size: {self.segment_seconds}s")
+        header = (self.channels, self.sample_rate, segment_frames)
+        if os.path.exists(self.index_path):
+            existing, records = _read_index(self.index_path)
+            if existing != header:
+                raise ValueError(f"archive format mismatch: {existing} != {header}")
+            self._segment = int(records["segment"].max()) + 1 if len(records) else 0
+            self._index = open(self.index_path, "r+b")
+            # 비정상 종료로 잘린 레코드 제거
+            self._index.truncate(INDEX_HEADER.size + len(records) * INDEX_RECORD.size)
+            self._index.seek(0, os.SEEK_END)
+        else:
+            self._segment = 0
+            self._index = open(self.index_path, "wb")
+            self._index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, *header))
+        self._offset = 0
+        self._log(f"[ARCHIVE] {self.directory} from segment {self._segment}")
+
+    def _record(self, kind: int, seq: int, time_ns: int) -> None:
+        self._index.write(INDEX_RECORD.pack(time_ns, seq, self._segment, self._offset, kind))
+        self._index.flush()
+        self._last_mark = time_ns
+
+    def _open_segment(self) -> None:
+        size = WAV_HEADER_SIZE + self.segment_bytes
+        f = open(_segment_path(self.directory, self._segment), "w+b")
+        f.truncate(size)
+        if hasattr(os, "posix_fallocate"):
+            # 디스크 공간을 미리 확보 (도중에 ENOSPC / 단편화 방지)
+            os.posix_fallocate(f.fileno(), 0, size)
+        mm = mmap.mmap(f.fileno(), size)
+        mm[:WAV_HEADER_SIZE] = _wav_header(self.segment_bytes, self.sample_rate, self.channels)
+        self._file, self._mm = f, mm
+
+    def _close_segment(self) -> None:
+        if self._mm is None:
+            return
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+        self._mm = self._file = None
+        self._segment += 1
+        self._offset = 0
+
+    def _write_chunk(self, seq: int, stamp_ns: int, view, gap: bool) -> None:
+        first = self._index is None
+        if first:
+            self._open_index()
+        n = len(view)
+        duration_ns = n // self.frame_bytes * 1_000_000_000 // self.sample_rate
+        # 링 stamp 는 청크 마지막 샘플 수신 시각 → 인덱스 time_ns 는 첫 샘플 시각
+        time_ns = stamp_ns + self._wall_offset - duration_ns
+        if first:
+            self._record(KIND_START, seq, time_ns)
+        elif gap:
+            self._record(KIND_GAP, seq, time_ns)
+        elif time_ns - self._last_mark >= self.index_interval_ns:
+            self._record(KIND_MARK, seq, time_ns)
+
+        self._end_ns = time_ns + duration_ns
+        self.bytes_written += n
+        pos = 0
+        while pos < n:
+            if self._mm is None:
+                self._open_segment()
+            k = min(n - pos, self.segment_bytes - self._offset)
+            start = WAV_HEADER_SIZE + self._offset
+            self._mm[start : start + k] = view[pos : pos + k]
+            self._offset += k
+            pos += k
+            if self._offset >= self.segment_bytes:
+                self._close_segment()
+
+    def _finish(self) -> None:
+        if self._index is None:
+            return
+        self._record(KIND_END, -1, self._end_ns)
+        self._close_segment()
+        self._index.close()
+        self._index = None
+
+
+class ArchiveReader:
+    """ArchiveTap 이 만든 디렉터리에서 시간 구간 추출 (읽기 전용 mmap)."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        (self.channels, self.sample_rate, segment_frames), rec = _read_index(
+            os.path.join(directory, INDEX_NAME)
+        )
+        self.frame_bytes = 2 * self.channels
+        self.segment_bytes = segment_frames * self.frame_bytes
+        self.records = rec
+        self._times = rec["time_ns"]
+        # 스트림 전체 기준 바이트 위치 → 레코드 사이 구간 길이
+        self._pos = rec["segment"].astype(np.int64) * self.segment_bytes + rec["offset"]
+        lengths = np.zeros(len(rec), dtype=np.int64)
+        if len(rec) > 1:
+            lengths[:-1] = np.maximum(np.diff(self._pos), 0)
+        lengths[rec["kind"] == KIND_END] = 0
+        self._lengths = lengths
+        self._place = self._placement()
+        self._maps: Dict[int, mmap.mmap] = {}
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for mm in self._maps.values():
+            mm.close()
+        self._maps.clear()
+
+    def _duration_ns(self, nbytes):
+        return nbytes // self.frame_bytes * 1_000_000_000 // self.sample_rate
+
+    def _placement(self) -> np.ndarray:
+        """
+        레코드별 첫 샘플의 프레임 위치 (첫 레코드 시각 기준).
+        캡처 시각은 청크마다 조금씩 흔들리므로, 주기 레코드는 직전 구간 바로 뒤에 이어 붙이고
+        (샘플 단위로 끊김 없음) 시계와 SNAP_SECONDS 넘게 벌어졌을 때만 캡처 시각으로 다시 맞춤.
+        """
+        n = len(self._times)
+        place = np.zeros(n, dtype=np.int64)
+        if not n:
+            return place
+        rate, fb = self.sample_rate, self.frame_bytes
+        raw = (self._times - self._times[0]) * rate // 1_000_000_000
+        snap = int(SNAP_SECONDS * rate)
+        kinds = self.records["kind"]
+        for i in range(1, n):
+            place[i] = raw[i]
+            if kinds[i] == KIND_MARK:
+                cont = place[i - 1] + self._lengths[i - 1] // fb
+                if abs(raw[i] - cont) <= snap:
+                    place[i] = cont
+        return place
+
+    @property
+    def start_ns(self) -> Optional[int]:
+        return int(self._times[0]) if len(self._times) else None
+
+    @property
+    def end_ns(self) -> Optional[int]:
+        if not len(self._times):
+            return None
+        frames = (self._place + self._lengths // self.frame_bytes).max()
+        return int(self._times[0]) + int(frames) * 1_000_000_000 // self.sample_rate
+
+    def _segment_map(self, n: int) -> mmap.mmap:
+        mm = self._maps.get(n)
+        if mm is None:
+            with open(_segment_path(self.directory, n), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[n] = mm
+        return mm
+
+    def _copy(self, pos: int, out: memoryview) -> None:
+        """스트림 위치 pos 부터 len(out) 바이트 (세그먼트 경계를 넘으면 이어서)."""
+        done = 0
+        while done < len(out):
+            seg, off = divmod(pos + done, self.segment_bytes)
+            k = min(len(out) - done, self.segment_bytes - off)
+            start = WAV_HEADER_SIZE + off
+            out[done : done + k] = self._segment_map(seg)[start : start + k]
+            done += k
+
+    def extract(self, start_ns: int, end_ns: int) -> bytes:
+        """[start_ns, end_ns) (epoch ns) 의 PCM16. 기록이 없는 부분은 0."""
+        rate, fb = self.sample_rate, self.frame_bytes
+        nframes = max(0, (end_ns - start_ns) * rate // 1_000_000_000)
+        out = bytearray(nframes * fb)
+        view = memoryview(out)
+        if not len(self._place):
+            return bytes(out)
+        # 출력 첫 프레임의 위치 (첫 레코드 기준, _placement 와 같은 축)
+        origin = (start_ns - int(self._times[0])) * rate // 1_000_000_000
+        place = self._place
+        i0 = max(0, int(np.searchsorted(place, origin, "right")) - 1)
+        i1 = int(np.searchsorted(place, origin + nframes, "left"))
+        for i in range(i0, i1):
+            length = int(self._lengths[i]) // fb
+            if not length:
+                continue
+            # 레코드 첫 샘플의 출력 프레임 위치 (음수 = 구간 시작 전)
+            first = int(place[i]) - origin
+            a = max(0, first)
+            b = min(nframes, first + length)
+            if a >= b:
+                continue
+            self._copy(int(self._pos[i]) + (a - first) * fb, view[a * fb : b * fb])
+        return bytes(out)
@@ -0,0 +1,591 @@
+# audio_client.py
+"""
+재사용 가능한 비동기 오디오 클라이언트.
+
+    client = AudioStreamClient("127.0.0.1", 26070, 20250918, block_frames=320)
+    async for block in client:          # np.ndarray (int16 또는 float32)
+        ...
+    await client.close()
+
+    # 또는 콜백 (동기 / 코루틴 모두 가능)
+    await client.run(lambda block: ...)
+
+- 접속 → PING(v1/v2) / FORMAT / CODEC 요청을 한 번에 보내고, ACK 는 오디오 프레임 사이에서 처리.
+- 끊기면 지수 backoff (+ 무작위 흔들림) 로 재접속. 접속 성공 시 backoff 초기화.
+  resume=True (v2+) 면 재접속 때 서버 history 에서 마지막 seq 다음부터 replay 요청 → 끊긴 구간 복구
+  (서버가 history 를 켜 둔 경우. 복구분이 한꺼번에 오므로 max_buffer_blocks 를 넉넉히).
+  replay_ms 를 주면 첫 접속 때 최근 replay_ms 부터 받음.
+  설정 오류(코덱 / 포맷 거부)는 재접속하지 않고 iterator 에서 예외로 올림.
+- 수신은 FrameDecoder (큰 블록 단위 + memoryview), 디코딩은 np.frombuffer view.
+  수신 버퍼는 재사용되므로 jitter 버퍼에 넣을 때 청크당 한 번만 복사.
+- block_frames 를 주면 고정 크기 블록으로 잘라서 내줌 (청크 안에 들어가면 view, 걸치면 이어 붙임).
+  시작할 때와 재접속 직후에는 jitter_blocks 만큼 먼저 쌓은 뒤 내주기 시작.
+  max_buffer_blocks 를 넘으면 오래된 샘플부터 버림.
+- 모노는 (frames,), 다채널은 (frames, channels) 배열.
+- version=3 (기본) 이면 서버 무음 게이트 구간은 무음 프레임으로 받아 0 블록으로 펼침.
+  이전 서버가 버전을 거부하면 v3 → v2 → v1 순으로 낮춰서 다시 접속 (status_cb("downgrade", 버전)).
+- stream 을 주면 기본 스트림 대신 서버의 이름 붙은 스트림(장치별 캡처 등)을 받음
+  (PCM16 모노, fmt / replay 와 같이 못 씀).
+- subscribe 를 주면 구독 모드 (v2+): 연결 하나로 여러 스트림을 받고, 실행 중에
+  await client.subscribe(name) / unsubscribe(name) 로 바꿈. 스트림별 블록은 client.blocks(name),
+  빈 이름("")은 기본 스트림 = async for block in client.
+
+    async with AudioStreamClient(host, port, check, subscribe=["room1", "room2"]) as c:
+        async for block in c.blocks("room1"):
+            ...
+"""
+
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Optional, Sequence, Set
+
+import numpy as np
+
+from audio_codec import CODEC_PCM16, decode
+from audio_format import FORMAT_REQUEST, SAMPLE_F32, OutputFormat
+from frame_parser import READ_SIZE, FrameDecoder, FrameError
+
+REQUEST_AUDIO = 0x01
+REQUEST_CODEC = 0x02
+REQUEST_FORMAT = 0x03
+REQUEST_STATS = 0x04
+REQUEST_REPLAY = 0x05
+REQUEST_STREAM = 0x06
+REQUEST_SUBSCRIBE = 0x07
+REQUEST_PING = 99
+REQUEST_PING_V2 = 100
+REQUEST_AUDIO_V2 = 0x11
+REQUEST_SILENCE = 0x12
+REQUEST_STREAM_AUDIO = 0x13
+REQUEST_STREAM_SILENCE = 0x14
+
+AUDIO_EXT_V2 = struct.Struct("<qqi")   # seq, capture_ns, sample_rate
+PING_V2_ACK_BODY = struct.Struct("<Bq")   # status, server_monotonic_ns
+SILENCE_BODY = struct.Struct("<qqii")     # seq, capture_ns, sample_rate, frames
+REPLAY_REQUEST = struct.Struct("<iq")     # mode, value
+REPLAY_ACK_BODY = struct.Struct("<Bqi")   # status, start_seq, chunks
+REPLAY_FROM_SEQ = 0
+REPLAY_LAST_MS = 1
+SUBSCRIBE_ACK_BODY = struct.Struct("<BBH")   # status, op, stream_id (+ UTF-8 이름)
+STREAM_EXT = struct.Struct("<Hqqi")          # stream_id, seq, capture_ns, sample_rate
+STREAM_SILENCE_BODY = struct.Struct("<Hqqii")
+SUBSCRIBE_ADD = 0
+SUBSCRIBE_REMOVE = 1
+
+# 서버 → 클라 프레임: ACK 는 본문 길이 고정, 오디오 / stats 는 <i size 가 붙음
+SERVER_BODY_SIZES = {
+    REQUEST_PING: 1,
+    REQUEST_CODEC: 1,
+    REQUEST_FORMAT: 1,
+    REQUEST_PING_V2: PING_V2_ACK_BODY.size,
+}
+SERVER_SIZED = (
+    REQUEST_AUDIO,
+    REQUEST_AUDIO_V2,
+    REQUEST_SILENCE,
+    REQUEST_STATS,
+    REQUEST_REPLAY,
+    REQUEST_STREAM,
+    REQUEST_SUBSCRIBE,
+    REQUEST_STREAM_AUDIO,
+    REQUEST_STREAM_SILENCE,
+)
+_PLAIN_AUDIO = (REQUEST_AUDIO, REQUEST_AUDIO_V2, REQUEST_SILENCE)
+
+DEFAULT_SAMPLE_RATE = 16000   # 포맷 구독을 안 하면 서버 기본 스트림 (16 kHz 모노)
+
+
+class ServerRejected(Exception):
+    """서버가 코덱 / 포맷 / 버전 요청을 거부 (재접속해도 같은 결과)."""
+
+
+class _VersionRejected(Exception):
+    """서버가 PING_V2 버전을 거부 → 한 단계 낮춰서 바로 재접속."""
+
+
+class _BlockBuffer:
+    """디코딩된 청크 FIFO. 고정 크기 블록을 가능한 한 view 로 꺼냄."""
+
+    def __init__(self) -> None:
+        self._chunks: deque = deque()
+        self._offset = 0      # 첫 청크에서 이미 꺼낸 프레임 수
+        self.frames = 0
+
+    def push(self, arr: np.ndarray) -> None:
+        if len(arr):
+            self._chunks.append(arr)
+            self.frames += len(arr)
+
+    def pop(self, n: int) -> np.ndarray:
+        """n 프레임 (n <= frames)."""
+        first = self._chunks[0]
+        avail = len(first) - self._offset
+        if avail >= n:
+            out = first[self._offset : self._offset + n]
+            self._consume(n)
+            return out
+        parts = []
+        need = n
+        while need:
+            first = self._chunks[0]
+            take = min(need, len(first) - self._offset)
+            parts.append(first[self._offset : self._offset + take])
+            self._consume(take)
+            need -= take
+        return np.concatenate(parts)
+
+    def pop_chunk(self) -> np.ndarray:
+        """남은 첫 청크 통째로 (block_frames 없음 모드)."""
+        first = self._chunks[0]
+        return self.pop(len(first) - self._offset)
+
+    def drop(self, n: int) -> None:
+        while n and self._chunks:
+            take = min(n, len(self._chunks[0]) - self._offset)
+            self._consume(take)
+            n -= take
+
+    def _consume(self, n: int) -> None:
+        self._offset += n
+        self.frames -= n
+        if self._offset >= len(self._chunks[0]):
+            self._chunks.popleft()
+            self._offset = 0
+
+
+class _StreamState:
+    """스트림 1개의 수신 버퍼 / 재생 대기 / seq 상태."""
+
+    def __init__(self) -> None:
+        self.buf = _BlockBuffer()
+        self.priming = True
+        self.last_seq: Optional[int] = None   # 구독 모드에서만 사용 (기본 모드는 client.last_seq)
+        self.lost = 0
+
+
+class AudioStreamClient:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        checkcode: int,
+        codec: int = CODEC_PCM16,
+        fmt: Optional[OutputFormat] = None,
+        version: int = 3,
+        dtype=np.int16,
+        block_frames: Optional[int] = None,
+        jitter_blocks: int = 2,
+        max_buffer_blocks: int = 50,
+        reconnect: bool = True,
+        resume: bool = True,
+        replay_ms: Optional[int] = None,
+        stream: Optional[str] = None,
+        subscribe: Optional[Sequence[str]] = None,
+        backoff_min: float = 0.5,
+        backoff_max: float = 10.0,
+        connect_timeout: float = 5.0,
+        status_cb: Optional[Callable[[str, object], None]] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.checkcode = checkcode
+        self.codec = codec
+        self.fmt = fmt
+        self.version = version
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.int16), np.dtype(np.float32)):
+            raise ValueError(f"unsupported dtype: {self.dtype}")
+        self.block_frames = block_frames
+        self.jitter_blocks = max(0, jitter_blocks)
+        self.max_buffer_blocks = max(1, max_buffer_blocks)
+        self.reconnect = reconnect
+        self.resume = resume
+        self.replay_ms = replay_ms
+        self.replayed = 0          # 서버가 replay 로 보내 준 청크 수 (ACK 기준)
+        self._await_replay = False
+        if stream is not None and fmt is not None:
+            raise ValueError("stream and fmt are exclusive")
+        self.stream = stream
+        self._await_stream = False
+        if subscribe is not None and (fmt is not None or stream is not None or version < 2):
+            raise ValueError("subscribe needs version >= 2 and no fmt / stream")
+        # 구독 모드: 원하는 스트림 이름 (재접속 때 다시 구독), 현재 연결의 stream_id → 이름
+        self.subscriptions: Optional[Set[str]] = None if subscribe is None else set(subscribe)
+        self.stream_ids: Dict[int, str] = {}
+        self._streams: Dict[str, _StreamState] = {}
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.status_cb = status_cb or (lambda tag, payload=None: None)
+
+        self.sample_rate = fmt.sample_rate if fmt else DEFAULT_SAMPLE_RATE
+        self.channels = fmt.channels if fmt else 1
+
+        self._main = _StreamState()   # 기본 모드의 스트림 / 구독 모드의 기본 스트림("")
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._error: Optional[BaseException] = None
+        self._done = False
+        self._closing = False
+
+        # 상태 / 통계
+        self.connected = False
+        self.connects = 0
+        self.chunks = 0
+        self.lost = 0              # v2 seq 점프로 확인한 드롭 청크 수
+        self.silent_chunks = 0     # v3 무음 프레임 (0 으로 채운 청크) 수
+        self.overflow_frames = 0   # 버퍼 초과로 버린 프레임
+        self.clock_offset_ns: Optional[int] = None   # 서버 monotonic ≈ 로컬 + offset
+        self.last_seq: Optional[int] = None
+        self.last_capture_ns: Optional[int] = None
+
+    # ---------- 수명 ----------
+    def start(self) -> None:
+        """수신 태스크 시작 (async for / run 에서 자동 호출)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._receive_loop())
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._writer is not None:
+            self._writer.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self._done = True
+        self._event.set()
+
+    async def __aenter__(self) -> "AudioStreamClient":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    # ---------- 소비 ----------
+    def __aiter__(self) -> "AudioStreamClient":
+        self.start()
+        return self
+
+    async def __anext__(self) -> np.ndarray:
+        block = await self._next_block(self._main)
+        if block is None:
+            raise StopAsyncIteration
+        return block
+
+    async def blocks(self, name: str) -> AsyncIterator[np.ndarray]:
+        """구독 모드에서 스트림 1개의 블록 ("" = 기본 스트림). 구독 해제돼도 끝나지 않고 대기."""
+        self.start()
+        st = self._state(name)
+        while True:
+            block = await self._next_block(st)
+            if block is None:
+                return
+            yield block
+
+    async def _next_block(self, st: _StreamState) -> Optional[np.ndarray]:
+        buf = st.buf
+        while True:
+            if self._error is not None:
+                err, self._error = self._error, None
+                raise err
+            need = self.block_frames or 1
+            target = need * max(1, self.jitter_blocks) if st.priming else need
+            if buf.frames >= target and buf.frames >= need:
+                st.priming = False
+                return buf.pop(self.block_frames) if self.block_frames else buf.pop_chunk()
+            if self._done:
+                if buf.frames:
+                    # 마지막 자투리 (block_frames 보다 짧을 수 있음)
+                    return buf.pop(buf.frames)
+                return None
+            self._event.clear()
+            await self._event.wait()
+
+    def _state(self, name: str) -> _StreamState:
+        if not name:
+            return self._main
+        st = self._streams.get(name)
+        if st is None:
+            st = self._streams[name] = _StreamState()
+        return st
+
+    # ---------- 구독 모드 ----------
+    async def subscribe(self, name: str) -> None:
+        """스트림 구독 추가 ("" = 기본 스트림). 연결 중이면 바로, 아니면 다음 접속 때 요청."""
+        await self._send_subscribe(SUBSCRIBE_ADD, name)
+
+    async def unsubscribe(self, name: str) -> None:
+        await self._send_subscribe(SUBSCRIBE_REMOVE, name)
+
+    async def _send_subscribe(self, op: int, name: str) -> None:
+        if self.subscriptions is None:
+            raise ValueError("client was not created with subscribe=...")
+        if op == SUBSCRIBE_ADD:
+            self.subscriptions.add(name)
+        else:
+            self.subscriptions.discard(name)
+        writer = self._writer
+        if writer is not None:
+            writer.write(self._subscribe_frame(op, name))
+            await writer.drain()
+
+    def _subscribe_frame(self, op: int, name: str) -> bytes:
+        raw = name.encode("utf-8")
+        return struct.pack("<iiiB", self.checkcode, REQUEST_SUBSCRIBE, 1 + len(raw), op) + raw
+
+    async def run(self, callback: Callable[[np.ndarray], object]) -> None:
+        """블록마다 callback 호출 (코루틴이면 await). 스트림이 끝나면 반환."""
+        async for block in self:
+            r = callback(block)
+            if asyncio.iscoroutine(r):
+                await r
+
+    # ---------- 수신 ----------
+    async def _receive_loop(self) -> None:
+        delay = self.backoff_min
+        try:
+            while not self._closing:
+                try:
+                    await self._session()
+                    delay = self.backoff_min
+                except ServerRejected as e:
+                    self._error = e
+                    break
+                except _VersionRejected:
+                    self.version -= 1
+                    self.status_cb("downgrade", self.version)
+                    continue
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                    self.status_cb("disconnected", f"{type(e).__name__}: {e}")
+                finally:
+                    if self.connected:
+                        # 한 번이라도 붙었으면 backoff 처음부터
+                        delay = self.backoff_min
+                    self.connected = False
+                if self._closing or not self.reconnect:
+                    break
+                wait = delay * (0.5 + random.random())
+                self.status_cb("reconnect", round(wait, 2))
+                await asyncio.sleep(wait)
+                delay = min(self.backoff_max, delay * 2)
+        finally:
+            self._done = True
+            self._event.set()
+
+    async def _session(self) -> None:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.connect_timeout
+        )
+        self._writer = writer
+        try:
+            await self._handshake_and_read(reader, writer)
+        finally:
+            self._writer = None
+            writer.close()
+
+    async def _handshake_and_read(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        check = self.checkcode
+        if self.version >= 2:
+            writer.write(struct.pack("<iii", check, REQUEST_PING_V2, self.version))
+        else:
+            writer.write(struct.pack("<ii", check, REQUEST_PING))
+        if self.stream is not None:
+            name = self.stream.encode("utf-8")
+            writer.write(struct.pack("<iii", check, REQUEST_STREAM, len(name)) + name)
+        if self.subscriptions is not None:
+            # 구독 모드: ACK 가 오기 전의 기본 스트림 프레임은 버림 (_on_frame)
+            self.stream_ids.clear()
+            for name in sorted(self.subscriptions):
+                writer.write(self._subscribe_frame(SUBSCRIBE_ADD, name))
+        if self.fmt is not None:
+            writer.write(struct.pack("<ii", check, REQUEST_FORMAT) + FORMAT_REQUEST.pack(*self.fmt))
+        if self.codec != CODEC_PCM16:
+            writer.write(struct.pack("<iii", check, REQUEST_CODEC, self.codec))
+        replay = self._replay_request()
+        if replay is not None:
+            writer.write(
+                struct.pack("<iii", check, REQUEST_REPLAY, REPLAY_REQUEST.size)
+                + REPLAY_REQUEST.pack(*replay)
+            )
+        # ACK 전에 도착하는 라이브 프레임은 replay 구간과 겹치므로 버림
+        self._await_replay = replay is not None
+        # STREAM ACK 전 프레임은 기본 스트림
+        self._await_stream = self.stream is not None
+        t_ping = time.monotonic_ns()
+        await writer.drain()
+
+        if replay is None:
+            # 이어받지 않으면 seq 도 새로 시작
+            self.last_seq = None
+        decoder = FrameDecoder(check, SERVER_BODY_SIZES, SERVER_SIZED)
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                raise ConnectionError("connection closed by server")
+            decoder.feed(data)
+            try:
+                for cmd, body in decoder.frames():
+                    self._on_frame(cmd, body, t_ping)
+            except FrameError as e:
+                raise ConnectionError(str(e)) from e
+
+    def _replay_request(self):
+        """이번 접속에서 보낼 replay (mode, value). 없으면 None."""
+        if self.version < 2 or self.fmt is not None or self.stream is not None:
+            return None
+        if self.connects == 0:
+            return None if self.replay_ms is None else (REPLAY_LAST_MS, self.replay_ms)
+        if self.resume and self.last_seq is not None:
+            return (REPLAY_FROM_SEQ, self.last_seq + 1)
+        return None
+
+    def _on_frame(self, cmd: int, body: memoryview, t_ping: int) -> None:
+        if cmd in (REQUEST_STREAM_AUDIO, REQUEST_STREAM_SILENCE):
+            self._on_stream_frame(cmd, body)
+            return
+        if self.subscriptions is not None and cmd in _PLAIN_AUDIO:
+            return
+        if (self._await_replay or self._await_stream) and cmd in (REQUEST_AUDIO, REQUEST_AUDIO_V2, REQUEST_SILENCE):
+            return
+        if cmd == REQUEST_AUDIO_V2:
+            seq, capture_ns, _rate = AUDIO_EXT_V2.unpack_from(body, 0)
+            self._on_seq(seq, capture_ns)
+            self._on_payload(body[AUDIO_EXT_V2.size :])
+        elif cmd == REQUEST_SILENCE:
+            seq, capture_ns, _rate, frames = SILENCE_BODY.unpack(body)
+            self._on_seq(seq, capture_ns)
+            self.silent_chunks += 1
+            shape = (frames, self.channels) if self.channels > 1 else (frames,)
+            self._push(np.zeros(shape, dtype=self.dtype))
+        elif cmd == REQUEST_AUDIO:
+            self._on_payload(body)
+        elif cmd == REQUEST_PING_V2:
+            status, server_ns = PING_V2_ACK_BODY.unpack(body)
+            if status != 0:
+                # 구독 모드는 v2 가 최소
+                if self.version > 2 or (self.version == 2 and self.subscriptions is None):
+                    raise _VersionRejected(self.version)
+                raise ServerRejected(f"protocol v{self.version} rejected")
+            self.clock_offset_ns = server_ns - (t_ping + time.monotonic_ns()) // 2
+            self._on_connected()
+        elif cmd == REQUEST_REPLAY:
+            self._await_replay = False
+            status, start, chunks = REPLAY_ACK_BODY.unpack_from(body, 0)
+            if status == 0:
+                self.replayed += chunks
+                if self.last_seq is not None and start > self.last_seq + 1:
+                    # history 에 남아 있지 않은 구간
+                    self.lost += start - self.last_seq - 1
+                self.last_seq = start - 1
+                self.status_cb("replay", (start, chunks))
+            else:
+                # history 없음: 라이브부터 (다음 프레임에서 seq 점프로 손실 집계)
+                self.status_cb("replay", None)
+        elif cmd == REQUEST_SUBSCRIBE:
+            self._on_subscribe_ack(body)
+        elif cmd == REQUEST_STREAM:
+            self._await_stream = False
+            if body[0] != 0:
+                raise ServerRejected(f"stream {self.stream!r} rejected")
+        elif cmd in (REQUEST_PING, REQUEST_CODEC, REQUEST_FORMAT):
+            if body[0] != 0:
+                raise ServerRejected(f"cmd={cmd} rejected (status={body[0]})")
+            if cmd == REQUEST_PING:
+                self._on_connected()
+        # REQUEST_STATS 등 나머지는 무시
+
+    def _on_seq(self, seq: int, capture_ns: int) -> None:
+        if self.last_seq is not None and seq > self.last_seq + 1:
+            self.lost += seq - self.last_seq - 1
+        self.last_seq = seq
+        self.last_capture_ns = capture_ns
+
+    def _on_subscribe_ack(self, body: memoryview) -> None:
+        status, op, stream_id = SUBSCRIBE_ACK_BODY.unpack_from(body, 0)
+        name = bytes(body[SUBSCRIBE_ACK_BODY.size :]).decode("utf-8", "replace")
+        if status != 0:
+            # 없는 스트림 등: 다른 구독은 그대로 두고 원하는 목록에서만 뺌
+            self.subscriptions.discard(name)
+            self.status_cb("subscribe_rejected", name)
+        elif op == SUBSCRIBE_ADD:
+            self.stream_ids[stream_id] = name
+            self.status_cb("subscribed", (name, stream_id))
+        else:
+            # 클라가 해제했거나, 서버에서 스트림이 없어짐
+            self.stream_ids.pop(stream_id, None)
+            self.subscriptions.discard(name)
+            self.status_cb("unsubscribed", name)
+
+    def _on_stream_frame(self, cmd: int, body: memoryview) -> None:
+        stream_id = STREAM_EXT.unpack_from(body, 0)[0]
+        name = self.stream_ids.get(stream_id)
+        if name is None:
+            # 구독 해제 직후 / ACK 전 프레임
+            return
+        st = self._state(name)
+        if cmd == REQUEST_STREAM_AUDIO:
+            _sid, seq, _capture_ns, _rate = STREAM_EXT.unpack_from(body, 0)
+            self._on_stream_seq(st, seq)
+            self._push(self._decode(body[STREAM_EXT.size :]), st)
+        else:
+            _sid, seq, _capture_ns, _rate, frames = STREAM_SILENCE_BODY.unpack(body)
+            self._on_stream_seq(st, seq)
+            self.silent_chunks += 1
+            self._push(np.zeros(frames, dtype=self.dtype), st)
+
+    def _on_stream_seq(self, st: _StreamState, seq: int) -> None:
+        if st.last_seq is not None and seq > st.last_seq + 1:
+            st.lost += seq - st.last_seq - 1
+            self.lost += seq - st.last_seq - 1
+        st.last_seq = seq
+
+    def _on_connected(self) -> None:
+        if not self.connected:
+            self.connected = True
+            self.connects += 1
+            # 재접속 직후 들쭉날쭉한 도착을 흡수하도록 다시 채운 뒤 재개
+            for st in (self._main, *self._streams.values()):
+                st.priming = True
+                st.last_seq = None
+            self.status_cb("connected", self.connects)
+
+    def _on_payload(self, payload) -> None:
+        arr = self._decode(payload)
+        if self.channels > 1:
+            arr = arr.reshape(-1, self.channels)
+        self._push(arr)
+
+    def _push(self, arr: np.ndarray, st: Optional[_StreamState] = None) -> None:
+        self.chunks += 1
+        buf = (st or self._main).buf
+        buf.push(arr)
+        limit = (self.block_frames or len(arr)) * self.max_buffer_blocks
+        if buf.frames > limit:
+            over = buf.frames - limit
+            buf.drop(over)
+            self.overflow_frames += over
+        self._event.set()
+
+    def _decode(self, payload) -> np.ndarray:
+        # payload 는 수신 버퍼의 view (다음 수신 때 덮어씀) → 버퍼에 넣을 배열은 한 번만 복사
+        if self.fmt is not None and self.fmt.sample_format == SAMPLE_F32:
+            arr = np.frombuffer(payload, dtype=np.float32)
+            if self.dtype == np.float32:
+                return arr.copy()
+            return (np.clip(arr, -1.0, 1.0) * 32767.0).astype(np.int16)
+        # pcm16 은 view, mulaw / adpcm 은 디코더가 새 배열 생성
+        arr = decode(self.codec, payload)
+        if self.dtype == np.int16:
+            return arr.copy() if self.codec == CODEC_PCM16 else arr
+        return arr.astype(np.float32) * (1.0 / 32768.0)
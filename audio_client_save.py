@@ -2,26 +2,64 @@
 """
 Loopback Audio Server 테스트용 클라이언트
 
-- 서버에 접속해서 PING(99) 전송
+- 서버에 접속해서 PING(99) 전송 (PROTOCOL_VERSION>=2 면 PING_V2(100)으로 버전 협상,
+  이후 v2 헤더의 seq / 캡처 시각으로 드롭 수와 지연 히스토그램을 종료 시 출력.
+  3 이면 서버 무음 게이트 구간에 오는 무음 프레임(0x12)을 0 으로 펼쳐서 저장.
+  이전 서버가 버전을 거부하면 v3 → v2 → v1 순으로 낮춰서 다시 핑)
+- 필요하면 cmd=3(REQUEST_FORMAT)으로 출력 포맷 구독 (예: 48000:2:s16)
+- 필요하면 cmd=2(REQUEST_CODEC)로 압축 코덱 선택 (pcm16 / mulaw / adpcm)
 - 서버가 push 해주는 cmd=1(REQUEST_AUDIO) 오디오 패킷을 계속 받아서
-  로컬 WAV 파일로 저장하는 예제
+  (디코딩 후) 로컬 WAV 파일로 저장하는 예제
+- 저장은 SegmentedRecorder: 수신 루프는 메모리에 모으기만 하고 writer 스레드가 기록,
+  SEGMENT_SECONDS 마다 파일 분할 + <이름>.index.json (세그먼트 시작 시각 / 바이트 오프셋)
+- udp 모드: 서버의 UDP 멀티캐스트를 받아 조각 재조립 → 재정렬 → 손실 은닉 후 저장
+  (TCP 는 시계 오프셋 추정용 PING_V2 에만 잠깐 사용)
 
 환경:
   uv add numpy  (numpy는 꼭 필요하진 않지만, 후처리용으로 쓰고 싶으면)
 
 사용법:
-  python audio_client_save.py
+  python audio_client_save.py [pcm16|mulaw|adpcm] [rate:channels:s16|f32]
+  python audio_client_save.py udp [group:port]
 """
 
 import asyncio
 import struct
-import wave
 import signal
 import sys
+import time
 from typing import Optional
 
+import numpy as np
+
+from audio_codec import CODEC_IDS, CODEC_PCM16, decode
+from audio_client import SERVER_BODY_SIZES, SERVER_SIZED
+from audio_format import FORMAT_REQUEST, SAMPLE_F32, SAMPLE_FORMATS, OutputFormat
+from frame_parser import READ_SIZE, FrameDecoder
+from segment_recorder import SegmentedRecorder
+from udp_transport import (
+    DEFAULT_GROUP,
+    DEFAULT_JITTER_CHUNKS,
+    DEFAULT_UDP_PORT,
+    JitterBuffer,
+    Reassembler,
+    open_multicast_socket,
+)
+
 REQUEST_AUDIO = 0x01
+REQUEST_CODEC = 0x02
+REQUEST_FORMAT = 0x03
 REQUEST_PING = 99
+REQUEST_PING_V2 = 100
+REQUEST_AUDIO_V2 = 0x11
+REQUEST_SILENCE = 0x12
+
+# v2 프레임 확장 헤더 (seq, capture_ns, sample_rate) / v2 핑 ACK 본문 (status, server_ns)
+# 프레임별 본문 길이 표는 라이브러리 클라이언트(audio_client)와 공유
+AUDIO_EXT_V2 = struct.Struct("<qqi")
+PING_V2_ACK_BODY = struct.Struct("<Bq")
+# v3 무음 프레임 본문 (seq, capture_ns, sample_rate, frames)
+SILENCE_BODY = struct.Struct("<qqii")
 
 # ---- 서버 접속 설정 ----
 HOST = "127.0.0.1"
@@ -33,12 +71,93 @@ OUTPUT_WAV = "capture_from_server.wav"
 WAV_CHANNELS = 1       # mono
 WAV_SAMPLERATE = 16000 # 서버쪽에서 16kHz PCM16 보내는 것으로 가정
 WAV_SAMPWIDTH = 2      # 16bit = 2 bytes
+AUDIO_CODEC = "pcm16"  # 전송 코덱 (pcm16 / mulaw / adpcm)
+PROTOCOL_VERSION = 3   # 2 = seq / 캡처 시각 헤더 사용 (드롭 / 지연 측정), 3 = + 무음 프레임
+SEGMENT_SECONDS = 600  # 이 길이마다 새 WAV 파일 (0 = 분할 없이 파일 1개)
+
+# 캡처 → 수신 지연 히스토그램 구간 (ms)
+LATENCY_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000)
 
 
 class GracefulExit(Exception):
     pass
 
 
+class StreamStats:
+    """v2 헤더 기반 드롭(seq 점프) / 캡처→수신 지연 집계."""
+
+    def __init__(self, clock_offset_ns: int = 0) -> None:
+        # 서버 monotonic ≈ 로컬 monotonic + offset
+        self.clock_offset_ns = clock_offset_ns
+        self.expected_seq: Optional[int] = None
+        self.gaps = 0
+        self.lost = 0
+        self.hist = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.max_ms = 0.0
+
+    def add(self, seq: int, capture_ns: int, recv_ns: int) -> None:
+        if self.expected_seq is not None and seq > self.expected_seq:
+            self.gaps += 1
+            self.lost += seq - self.expected_seq
+        self.expected_seq = seq + 1
+        self.add_latency(capture_ns, recv_ns)
+
+    def add_latency(self, capture_ns: int, recv_ns: int) -> None:
+        ms = (recv_ns + self.clock_offset_ns - capture_ns) / 1e6
+        self.max_ms = max(self.max_ms, ms)
+        for i, edge in enumerate(LATENCY_BUCKETS_MS):
+            if ms < edge:
+                self.hist[i] += 1
+                break
+        else:
+            self.hist[-1] += 1
+
+    def report(self) -> str:
+        total = sum(self.hist) or 1
+        lines = [f"[CLIENT] gaps={self.gaps} lost_chunks={self.lost} max_latency={self.max_ms:.1f}ms"]
+        lo = 0
+        for i, n in enumerate(self.hist):
+            hi = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+            label = f"{lo:>4}-{hi:<4}ms" if hi is not None else f"{lo:>4}+    ms"
+            lines.append(f"  {label} {n:7d} {'#' * int(40 * n / total)}")
+            lo = hi
+        return "\n".join(lines)
+
+
+def _finish_recording(rec: SegmentedRecorder) -> None:
+    """writer 스레드 정리 + 저장 결과 출력."""
+    rec.close()
+    seconds = rec.total_bytes / (rec.sample_rate * rec.frame_bytes)
+    files = [s["file"] for s in rec.segments]
+    names = files[0] if len(files) == 1 else f"{files[0]} .. {files[-1]}" if files else "-"
+    print(
+        f"[CLIENT] done. saved {len(files)} file(s) '{names}' "
+        f"({rec.total_bytes} bytes, ~{seconds:0.1f} sec), index '{rec.index_path}'"
+    )
+    if rec.dropped_bytes:
+        print(f"[CLIENT] disk too slow, dropped {rec.dropped_bytes} bytes")
+    if rec.error is not None:
+        print(f"[CLIENT] write error: {rec.error}")
+
+
+async def _read_ack(
+    reader: asyncio.StreamReader, decoder: FrameDecoder, ack_cmd: int
+) -> bytes:
+    """
+    ack_cmd 의 ACK 본문을 읽어 반환 (헤더 제외).
+    서버는 접속 즉시 오디오를 밀어주므로, 그 사이 도착한 오디오 프레임은 건너뜀.
+    ACK 뒤에 같이 받은 프레임은 decoder 에 남아서 수신 루프에서 이어 처리.
+    """
+    while True:
+        for cmd, body in decoder.frames():
+            if cmd == ack_cmd:
+                return bytes(body)
+        data = await reader.read(READ_SIZE)
+        if not data:
+            raise asyncio.IncompleteReadError(b"", None)
+        decoder.feed(data)
+
+
 def _setup_signal():
     """Ctrl+C (SIGINT) 에서 깔끔하게 빠지도록 설정"""
     loop = asyncio.get_event_loop()
@@ -59,82 +178,128 @@ async def audio_client_save(
     port: int,
     checkcode: int,
     out_wav_path: str,
+    codec: int = CODEC_PCM16,
+    fmt: Optional[OutputFormat] = None,
+    version: int = PROTOCOL_VERSION,
 ) -> None:
     print(f"[CLIENT] connect to {host}:{port} (checkcode={checkcode}) ...")
 
     reader: Optional[asyncio.StreamReader] = None
     writer: Optional[asyncio.StreamWriter] = None
 
-    # WAV 파일 열기
-    wf = wave.open(out_wav_path, "wb")
-    wf.setnchannels(WAV_CHANNELS)
-    wf.setsampwidth(WAV_SAMPWIDTH)
-    wf.setframerate(WAV_SAMPLERATE)
-
-    total_bytes = 0
+    # 녹음기 (f32 는 int16 으로 변환해서 저장)
+    channels = fmt.channels if fmt else WAV_CHANNELS
+    samplerate = fmt.sample_rate if fmt else WAV_SAMPLERATE
+    rec = SegmentedRecorder(
+        out_wav_path, samplerate, channels, WAV_SAMPWIDTH, SEGMENT_SECONDS
+    )
+    rec.start()
+    stats: Optional[StreamStats] = None
 
     try:
         reader, writer = await asyncio.open_connection(host, port)
         print("[CLIENT] connected")
+        decoder = FrameDecoder(checkcode, SERVER_BODY_SIZES, SERVER_SIZED)
 
         # ---- 1) PING 보내기 ----
-        ping_packet = struct.pack("<ii", checkcode, REQUEST_PING)
-        writer.write(ping_packet)
-        await writer.drain()
-        print("[CLIENT] ping sent")
-
-        # ACK 읽기 ( <iiB = checkcode, cmd(=99), status )
-        ack = await reader.readexactly(9)
-        recv_checkcode, cmd, status = struct.unpack("<iiB", ack)
-
-        if recv_checkcode != checkcode or cmd != REQUEST_PING or status != 0:
-            print(
-                f"[CLIENT] ping ACK invalid: check={recv_checkcode}, cmd={cmd}, status={status}"
-            )
+        while version >= 2:
+            # v2 핑: 버전 협상 + 서버 시계 오프셋 추정
+            ping_packet = struct.pack("<iii", checkcode, REQUEST_PING_V2, version)
+            t_send = time.monotonic_ns()
+            writer.write(ping_packet)
+            await writer.drain()
+            print(f"[CLIENT] ping(v{version}) sent")
+            ack = await _read_ack(reader, decoder, REQUEST_PING_V2)
+            t_recv = time.monotonic_ns()
+            status, server_ns = PING_V2_ACK_BODY.unpack(ack)
+            if status == 0:
+                stats = StreamStats(server_ns - (t_send + t_recv) // 2)
+                break
+            # 이전 서버가 모르는 버전 → 한 단계 낮춰서 다시 (v3 → v2 → v1)
+            print(f"[CLIENT] protocol v{version} rejected, retry with v{version - 1}")
+            version -= 1
+        if version < 2:
+            ping_packet = struct.pack("<ii", checkcode, REQUEST_PING)
+            writer.write(ping_packet)
+            await writer.drain()
+            print("[CLIENT] ping sent")
+
+            # ACK 읽기 ( <iiB = checkcode, cmd(=99), status )
+            # checkcode 가 다르면 decoder 가 FrameError 를 냄
+            status = (await _read_ack(reader, decoder, REQUEST_PING))[0]
+
+        if status != 0:
+            print(f"[CLIENT] ping ACK invalid: status={status}")
         else:
             print("[CLIENT] ping OK")
 
+        # ---- 1-1) 포맷 구독 (기본 16kHz 모노면 생략) ----
+        if fmt is not None:
+            writer.write(
+                struct.pack("<ii", checkcode, REQUEST_FORMAT)
+                + FORMAT_REQUEST.pack(*fmt)
+            )
+            await writer.drain()
+            status = (await _read_ack(reader, decoder, REQUEST_FORMAT))[0]
+            if status != 0:
+                print(f"[CLIENT] format {fmt} rejected (status={status})")
+                return
+            print(f"[CLIENT] format={fmt} OK")
+
+        # ---- 1-2) 코덱 선택 (pcm16 이면 생략) ----
+        if codec != CODEC_PCM16:
+            writer.write(struct.pack("<iii", checkcode, REQUEST_CODEC, codec))
+            await writer.drain()
+            status = (await _read_ack(reader, decoder, REQUEST_CODEC))[0]
+            if status != 0:
+                print(f"[CLIENT] codec {codec} rejected (status={status})")
+                return
+            print(f"[CLIENT] codec={codec} OK")
+
         print(
             "[CLIENT] waiting for audio packets... "
             "(Ctrl+C to stop, file will be saved on exit)"
         )
 
         # ---- 2) 오디오 패킷 수신 루프 ----
+        # 큰 블록으로 읽어서 decoder 가 완성된 프레임을 꺼냄 (모르는 cmd 는 size 만큼 건너뜀)
+        bytes_per_sec = samplerate * channels * WAV_SAMPWIDTH
+        zeros = b""   # 무음 프레임용 (청크 길이가 같으면 재사용)
         while True:
-            # header: <ii = (checkcode, cmd)
-            header = await reader.readexactly(8)
-            h_check, cmd = struct.unpack("<ii", header)
-
-            if h_check != checkcode:
-                print(f"[CLIENT] invalid checkcode in header: {h_check}")
-                # 계속 받을지, 끊을지 선택 – 여기선 끊자
-                break
-
-            if cmd != REQUEST_AUDIO:
-                # 다른 커맨드는 일단 무시
-                print(f"[CLIENT] unknown cmd={cmd}, ignore payload")
-                # 만약 서버가 이런 패킷에 size+data 를 붙였다면
-                # size만큼 스킵해야 하지만,
-                # 현재 프로토콜에서는 cmd=1에만 data가 붙는다고 가정.
-                continue
-
-            # size: <i
-            size_raw = await reader.readexactly(4)
-            (size,) = struct.unpack("<i", size_raw)
-
-            if size <= 0:
-                print(f"[CLIENT] invalid audio size={size}, skip")
-                continue
-
-            data = await reader.readexactly(size)
-            wf.writeframesraw(data)
-            total_bytes += len(data)
-
-            # 너무 자주 출력하면 시끄러우니까 대략적인 통계만
-            if total_bytes % (16000 * 2 * 5) < size:
-                # 대략 5초마다 한번
-                seconds = total_bytes / (WAV_SAMPLERATE * WAV_SAMPWIDTH)
-                print(f"[CLIENT] received ~{seconds:5.1f} sec audio")
+            for cmd, data in decoder.frames():
+                if cmd == REQUEST_SILENCE:
+                    # 무음 게이트 구간: 저장 포맷(int16) 기준 0 으로 채움
+                    seq, capture_ns, _rate, frames = SILENCE_BODY.unpack(data)
+                    stats.add(seq, capture_ns, time.monotonic_ns())
+                    nbytes = frames * channels * WAV_SAMPWIDTH
+                    if len(zeros) != nbytes:
+                        zeros = bytes(nbytes)
+                    data = zeros
+                elif cmd in (REQUEST_AUDIO, REQUEST_AUDIO_V2):
+                    if cmd == REQUEST_AUDIO_V2:
+                        seq, capture_ns, _rate = AUDIO_EXT_V2.unpack_from(data, 0)
+                        stats.add(seq, capture_ns, time.monotonic_ns())
+                        data = data[AUDIO_EXT_V2.size :]
+                    if fmt is not None and fmt.sample_format == SAMPLE_F32:
+                        f32 = np.frombuffer(data, dtype=np.float32)
+                        data = (np.clip(f32, -1.0, 1.0) * 32767.0).astype(np.int16).tobytes()
+                    elif codec != CODEC_PCM16:
+                        data = decode(codec, data).tobytes()
+                else:
+                    continue
+                # data 가 수신 버퍼 view 여도 rec.write 가 배치 버퍼로 복사
+                rec.write(data)
+
+                # 너무 자주 출력하면 시끄러우니까 대략적인 통계만
+                if rec.total_bytes % (bytes_per_sec * 5) < len(data):
+                    # 대략 5초마다 한번
+                    seconds = rec.total_bytes / bytes_per_sec
+                    print(f"[CLIENT] received ~{seconds:5.1f} sec audio")
+
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", None)
+            decoder.feed(chunk)
 
     except GracefulExit:
         print("\n[CLIENT] Ctrl+C detected, stopping...")
@@ -143,12 +308,6 @@ async def audio_client_save(
     except Exception as e:
         print(f"[CLIENT] error: {e}")
     finally:
-        # WAV 파일 닫기
-        try:
-            wf.close()
-        except Exception:
-            pass
-
         if writer is not None:
             try:
                 writer.close()
@@ -156,17 +315,126 @@ async def audio_client_save(
             except Exception:
                 pass
 
-        seconds = total_bytes / (WAV_SAMPLERATE * WAV_SAMPWIDTH) if total_bytes else 0
+        if stats is not None:
+            print(stats.report())
+
+        # 남은 배치 기록 + 마지막 세그먼트 헤더 / 인덱스 확정
+        _finish_recording(rec)
+
+
+async def _clock_offset(host: str, port: int, checkcode: int) -> Optional[int]:
+    """TCP PING_V2 한 번으로 서버 시계 오프셋 추정 (실패하면 None)."""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout=2.0
+        )
+        t_send = time.monotonic_ns()
+        writer.write(struct.pack("<iii", checkcode, REQUEST_PING_V2, 2))
+        await writer.drain()
+        decoder = FrameDecoder(checkcode, SERVER_BODY_SIZES, SERVER_SIZED)
+        ack = await asyncio.wait_for(
+            _read_ack(reader, decoder, REQUEST_PING_V2), timeout=2.0
+        )
+        t_recv = time.monotonic_ns()
+        status, server_ns = PING_V2_ACK_BODY.unpack(ack)
+        if status != 0:
+            return None
+        return server_ns - (t_send + t_recv) // 2
+    except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class _DatagramQueue(asyncio.DatagramProtocol):
+    def __init__(self, q: asyncio.Queue) -> None:
+        self.q = q
+
+    def datagram_received(self, data, addr) -> None:
+        self.q.put_nowait(data)
+
+
+async def audio_client_udp(
+    host: str,
+    port: int,
+    checkcode: int,
+    out_wav_path: str,
+    group: str = DEFAULT_GROUP,
+    udp_port: int = DEFAULT_UDP_PORT,
+    jitter: int = DEFAULT_JITTER_CHUNKS,
+) -> None:
+    """멀티캐스트 수신 → 재조립 → 재정렬 / 손실 은닉 → WAV (16 kHz 모노 기본 스트림)."""
+    offset = await _clock_offset(host, port, checkcode)
+    stats = StreamStats(offset) if offset is not None else None
+    print(
+        f"[CLIENT] udp {group}:{udp_port}, jitter={jitter} chunks, "
+        + ("clock offset ok" if stats else "no TCP control (latency not measured)")
+    )
+
+    rec = SegmentedRecorder(
+        out_wav_path, WAV_SAMPLERATE, WAV_CHANNELS, WAV_SAMPWIDTH, SEGMENT_SECONDS
+    )
+    rec.start()
+
+    loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _DatagramQueue(q), sock=open_multicast_socket(group, udp_port)
+    )
+    reasm = Reassembler(checkcode)
+    jb = JitterBuffer(jitter)
+    try:
+        while True:
+            chunk = reasm.feed(await q.get())
+            if chunk is None:
+                continue
+            seq, codec, capture_ns, _rate, payload = chunk
+            if stats is not None:
+                stats.add_latency(capture_ns, time.monotonic_ns())
+            for _, pcm, _concealed in jb.push(seq, decode(codec, payload)):
+                rec.write(pcm.tobytes())
+    except GracefulExit:
+        print("\n[CLIENT] Ctrl+C detected, stopping...")
+    finally:
+        transport.close()
         print(
-            f"[CLIENT] done. saved '{out_wav_path}' "
-            f"({total_bytes} bytes, ~{seconds:0.1f} sec)"
+            f"[CLIENT] udp received={jb.received} concealed={jb.concealed} "
+            f"reordered={jb.reordered} late={jb.late} incomplete={reasm.incomplete}"
         )
+        if stats is not None:
+            print(stats.report())
+        _finish_recording(rec)
+
+
+def _parse_format(text: str) -> OutputFormat:
+    """'48000:2:s16' → OutputFormat"""
+    rate, channels, name = text.split(":")
+    sample_formats = {v[0]: k for k, v in SAMPLE_FORMATS.items()}
+    return OutputFormat(int(rate), int(channels), sample_formats[name])
 
 
 def main():
     _setup_signal()
+    if len(sys.argv) > 1 and sys.argv[1] == "udp":
+        group, _, udp_port = (
+            sys.argv[2] if len(sys.argv) > 2 else f"{DEFAULT_GROUP}:{DEFAULT_UDP_PORT}"
+        ).partition(":")
+        try:
+            asyncio.run(
+                audio_client_udp(
+                    HOST, PORT, CHECKCODE, OUTPUT_WAV, group,
+                    int(udp_port or DEFAULT_UDP_PORT),
+                )
+            )
+        except GracefulExit:
+            print("[CLIENT] exited")
+        return
+    codec = CODEC_IDS[sys.argv[1] if len(sys.argv) > 1 else AUDIO_CODEC]
+    fmt = _parse_format(sys.argv[2]) if len(sys.argv) > 2 else None
     try:
-        asyncio.run(audio_client_save(HOST, PORT, CHECKCODE, OUTPUT_WAV))
+        asyncio.run(audio_client_save(HOST, PORT, CHECKCODE, OUTPUT_WAV, codec, fmt))
     except GracefulExit:
         # 여기까지 올 일은 거의 없지만, 혹시 모를 cleanup
         print("[CLIENT] exited")
@@ -0,0 +1,212 @@
+# audio_codec.py
+"""
+오디오 푸시 스트림용 압축 코덱.
+
+- CODEC_PCM16 : 무압축 PCM16 (기본, 기존 프로토콜과 동일)
+- CODEC_MULAW : G.711 mu-law, 2:1 (NumPy 벡터화)
+- CODEC_ADPCM : IMA-ADPCM, 약 4:1
+    청크 1개 = 독립 블록 (헤더에 predictor / step index 포함).
+    중간에 접속하거나 청크가 드롭돼도 바로 디코딩 가능.
+    ADPCM 은 샘플 간 의존성이 있어 완전 벡터화가 불가능하므로
+    테이블 기반 루프로 처리 (청크당 1회만 인코딩해서 모든 클라가 공유).
+"""
+
+import struct
+
+import numpy as np
+
+CODEC_PCM16 = 0
+CODEC_MULAW = 1
+CODEC_ADPCM = 2
+
+CODEC_NAMES = {
+    CODEC_PCM16: "pcm16",
+    CODEC_MULAW: "mulaw",
+    CODEC_ADPCM: "adpcm",
+}
+CODEC_IDS = {v: k for k, v in CODEC_NAMES.items()}
+
+# ---------- mu-law (G.711) ----------
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def mulaw_encode(pcm: np.ndarray) -> np.ndarray:
+    """int16 → mu-law uint8 (벡터화)."""
+    x = pcm.astype(np.int32)
+    sign = np.where(x < 0, 0x80, 0).astype(np.int32)
+    x = np.minimum(np.abs(x), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.frexp(x)[1] - 8
+    np.clip(exponent, 0, 7, out=exponent)
+    mantissa = (x >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def _mulaw_table() -> np.ndarray:
+    code = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (code >> 4) & 0x07
+    mantissa = code & 0x0F
+    sample = (((mantissa << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+    return np.where(code & 0x80, -sample, sample).astype(np.int16)
+
+
+_MULAW_DECODE = _mulaw_table()
+
+
+def mulaw_decode(codes) -> np.ndarray:
+    """mu-law uint8 → int16 (256 엔트리 LUT)."""
+    return _MULAW_DECODE[np.frombuffer(codes, dtype=np.uint8)]
+
+
+# ---------- IMA-ADPCM ----------
+ADPCM_HEADER = struct.Struct("<hBxH")   # predictor, step index, pad, nsamples
+
+_INDEX_TABLE = (-1, -1, -1, -1, 2, 4, 6, 8) * 2
+_STEP_TABLE = (
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41,
+    45, 50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190,
+    209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724,
+    796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272,
+    2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132,
+    7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+    20350, 22385, 24623, 27086, 29794, 32767,
+)
+
+
+class ImaAdpcmEncoder:
+    """
+    IMA-ADPCM 블록 인코더.
+    step index 는 청크 사이에 이어 가고(음질), 블록 헤더에도 기록(독립 디코딩).
+    """
+
+    def __init__(self) -> None:
+        self.index = 0
+
+    def encode(self, pcm: np.ndarray) -> bytes:
+        samples = pcm.tolist()
+        n = len(samples)
+        predictor = samples[0] if n else 0
+        index = self.index
+        header = ADPCM_HEADER.pack(predictor, index, n)
+
+        steps = _STEP_TABLE
+        index_table = _INDEX_TABLE
+        codes = bytearray(n)
+        for i, s in enumerate(samples):
+            step = steps[index]
+            diff = s - predictor
+            code = 0
+            if diff < 0:
+                code = 8
+                diff = -diff
+            vpdiff = step >> 3
+            if diff >= step:
+                code |= 4
+                diff -= step
+                vpdiff += step
+            step >>= 1
+            if diff >= step:
+                code |= 2
+                diff -= step
+                vpdiff += step
+            step >>= 1
+            if diff >= step:
+                code |= 1
+                vpdiff += step
+
+            if code & 8:
+                predictor -= vpdiff
+                if predictor < -32768:
+                    predictor = -32768
+            else:
+                predictor += vpdiff
+                if predictor > 32767:
+                    predictor = 32767
+            index += index_table[code]
+            if index < 0:
+                index = 0
+            elif index > 88:
+                index = 88
+            codes[i] = code
+
+        self.index = index
+        # 2 샘플 → 1 바이트 (low nibble 먼저)
+        nib = np.frombuffer(codes, dtype=np.uint8)
+        if n & 1:
+            nib = np.append(nib, np.uint8(0))
+        packed = nib[0::2] | (nib[1::2] << 4)
+        return header + packed.tobytes()
+
+
+def adpcm_decode(block) -> np.ndarray:
+    """IMA-ADPCM 블록 1개 → int16."""
+    predictor, index, n = ADPCM_HEADER.unpack_from(block, 0)
+    packed = np.frombuffer(block, dtype=np.uint8, offset=ADPCM_HEADER.size)
+    nib = np.empty(len(packed) * 2, dtype=np.uint8)
+    nib[0::2] = packed & 0x0F
+    nib[1::2] = packed >> 4
+
+    steps = _STEP_TABLE
+    index_table = _INDEX_TABLE
+    out = np.empty(n, dtype=np.int16)
+    for i, code in enumerate(nib[:n].tolist()):
+        step = steps[index]
+        vpdiff = step >> 3
+        if code & 4:
+            vpdiff += step
+        if code & 2:
+            vpdiff += step >> 1
+        if code & 1:
+            vpdiff += step >> 2
+        if code & 8:
+            predictor = max(-32768, predictor - vpdiff)
+        else:
+            predictor = min(32767, predictor + vpdiff)
+        index = min(88, max(0, index + index_table[code]))
+        out[i] = predictor
+    return out
+
+
+# ---------- 공통 ----------
+class ChunkEncoder:
+    """
+    PCM16 청크 → 코덱별 페이로드.
+    코덱별 인코더 상태를 들고 있으므로 서버에 하나만 두고
+    청크당 코덱마다 한 번만 호출.
+    """
+
+    def __init__(self) -> None:
+        self._adpcm = ImaAdpcmEncoder()
+
+    def encode(self, codec: int, pcm16) -> bytes:
+        if codec == CODEC_PCM16:
+            return pcm16
+        samples = np.frombuffer(pcm16, dtype=np.int16)
+        if codec == CODEC_MULAW:
+            return mulaw_encode(samples).tobytes()
+        if codec == CODEC_ADPCM:
+            return self._adpcm.encode(samples)
+        raise ValueError(f"unknown codec: {codec}")
+
+
+def payload_samples(codec: int, payload) -> int:
+    """페이로드를 디코딩하지 않고 샘플 수만 계산 (PCM16 기준 모노 샘플)."""
+    if codec == CODEC_PCM16:
+        return len(payload) // 2
+    if codec == CODEC_MULAW:
+        return len(payload)
+    if codec == CODEC_ADPCM:
+        return ADPCM_HEADER.unpack_from(payload, 0)[2] if len(payload) >= ADPCM_HEADER.size else 0
+    raise ValueError(f"unknown codec: {codec}")
+
+
+def decode(codec: int, payload) -> np.ndarray:
+    """코덱 페이로드 → int16 배열."""
+    if codec == CODEC_PCM16:
+        return np.frombuffer(payload, dtype=np.int16)
+    if codec == CODEC_MULAW:
+        return mulaw_decode(payload)
+    if codec == CODEC_ADPCM:
+        return adpcm_decode(payload)
+    raise ValueError(f"unknown codec: {codec}")
+
@@ -0,0 +1,202 @@
+# audio_format.py
+"""
+구독별 출력 포맷 (샘플레이트, 채널 수, 샘플 포맷).
+
+- FormatHub 는 캡처 스레드에서 청크마다 한 번 호출되어,
+  현재 구독 중인 포맷마다 딱 한 번씩 변환해서 포맷별 PcmRing 에 기록.
+  구독자가 1명이든 1000명이든 변환 비용은 포맷 수에만 비례.
+- 구독자가 0 이 된 포맷은 바로 지우지 않고 linger 초 뒤에 정리
+  (짧은 재접속 시 리샘플러 상태 유지).
+"""
+
+import struct
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from ring_buffer import PcmRing
+from utils import StreamResampler
+
+SAMPLE_S16 = 0   # int16 little-endian, interleaved
+SAMPLE_F32 = 1   # float32 little-endian, interleaved
+SAMPLE_FORMATS = {SAMPLE_S16: ("s16", 2), SAMPLE_F32: ("f32", 4)}
+
+# 포맷 요청 페이로드 (sample_rate, channels, sample_format)
+FORMAT_REQUEST = struct.Struct("<iBB")
+
+DEFAULT_LINGER = 5.0
+
+
+class OutputFormat(NamedTuple):
+    sample_rate: int
+    channels: int
+    sample_format: int = SAMPLE_S16
+
+    @property
+    def sample_width(self) -> int:
+        return SAMPLE_FORMATS[self.sample_format][1]
+
+    def validate(self) -> None:
+        if not (1000 <= self.sample_rate <= 192000):
+            raise ValueError(f"invalid sample_rate: {self.sample_rate}")
+        if not (1 <= self.channels <= 8):
+            raise ValueError(f"invalid channels: {self.channels}")
+        if self.sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"invalid sample_format: {self.sample_format}")
+
+    def __str__(self) -> str:
+        name = SAMPLE_FORMATS.get(self.sample_format, ("?",))[0]
+        return f"{self.sample_rate}Hz/{self.channels}ch/{name}"
+
+
+class FormatConverter:
+    """캡처 청크 (float32, in_sr) → OutputFormat 1개. 채널별 스트리밍 리샘플러 유지."""
+
+    def __init__(self, in_sr: int, fmt: OutputFormat, max_chunk: int = 1024) -> None:
+        self.fmt = fmt
+        self.resamplers = [
+            StreamResampler(in_sr, fmt.sample_rate, max_chunk)
+            for _ in range(fmt.channels)
+        ]
+        self._mono = np.zeros(max_chunk, dtype=np.float32)
+        self._scratch = np.zeros(0, dtype=np.float32)
+
+    def max_out_bytes(self, n: int) -> int:
+        rs = self.resamplers[0]
+        return ((n * rs.up) // rs.down + 1) * self.fmt.channels * self.fmt.sample_width
+
+    def _channel(self, chunk: np.ndarray, ch: int) -> np.ndarray:
+        """출력 채널 ch 에 해당하는 입력 (float32 1차원)."""
+        in_ch = 1 if chunk.ndim == 1 else chunk.shape[1]
+        if chunk.ndim == 1:
+            return chunk
+        if self.fmt.channels == in_ch:
+            return chunk[:, ch]
+        if in_ch == 1:
+            return chunk[:, 0]
+        # 채널 수가 다르면 모노 믹스다운을 모든 출력 채널에 공유
+        n = chunk.shape[0]
+        if len(self._mono) < n:
+            self._mono = np.zeros(n, dtype=np.float32)
+        mono = self._mono[:n]
+        np.mean(chunk, axis=1, out=mono)
+        return mono
+
+    def convert(self, chunk: np.ndarray, out: np.ndarray) -> int:
+        """out (uint8 슬롯) 에 interleaved 로 기록. 기록한 바이트 수 반환."""
+        channels = self.fmt.channels
+        if self.fmt.sample_format == SAMPLE_S16:
+            dst = out.view(np.int16)
+        else:
+            dst = out.view(np.float32)
+
+        frames = 0
+        for ch, rs in enumerate(self.resamplers):
+            res = rs.process(self._channel(chunk, ch))
+            frames = len(res)
+            col = dst[ch : frames * channels : channels]
+            if self.fmt.sample_format == SAMPLE_S16:
+                # passthrough 면 res 가 입력 청크 자체이므로 scratch 에서 스케일
+                if len(self._scratch) < frames:
+                    self._scratch = np.zeros(frames, dtype=np.float32)
+                tmp = self._scratch[:frames]
+                np.clip(res, -1.0, 1.0, out=tmp)
+                tmp *= 32767.0
+                np.copyto(col, tmp, casting="unsafe")
+            else:
+                np.copyto(col, res)
+        return frames * channels * self.fmt.sample_width
+
+
+class _FormatEntry:
+    def __init__(self, converter: FormatConverter, ring: PcmRing) -> None:
+        self.converter = converter
+        self.ring = ring
+        self.refs = 0
+        self.idle_since: Optional[float] = None
+
+
+class FormatHub:
+    """
+    구독 포맷 관리 + 청크당 포맷별 1회 변환.
+    - subscribe / unsubscribe : 서버 스레드에서 호출
+    - process                : 캡처 스레드에서 청크마다 호출
+    """
+
+    def __init__(
+        self,
+        in_sr: int,
+        max_chunk: int = 1024,
+        slots: int = 256,
+        linger: float = DEFAULT_LINGER,
+    ) -> None:
+        self.in_sr = in_sr
+        self.max_chunk = max_chunk
+        self.slots = slots
+        self.linger = linger
+        self._lock = threading.Lock()
+        self._entries: Dict[OutputFormat, _FormatEntry] = {}
+
+    @property
+    def formats(self):
+        return list(self._entries)
+
+    def subscribe(self, fmt: OutputFormat) -> PcmRing:
+        """포맷 구독. 처음 요청된 포맷이면 변환기 + 링 생성."""
+        fmt.validate()
+        with self._lock:
+            entry = self._entries.get(fmt)
+            if entry is None:
+                conv = FormatConverter(self.in_sr, fmt, self.max_chunk)
+                ring = PcmRing(
+                    self.slots, conv.max_out_bytes(self.max_chunk), fmt.sample_rate
+                )
+                entry = _FormatEntry(conv, ring)
+                # copy-on-write: 캡처 스레드는 락 없이 스냅샷을 순회
+                entries = dict(self._entries)
+                entries[fmt] = entry
+                self._entries = entries
+            entry.refs += 1
+            entry.idle_since = None
+            return entry.ring
+
+    def unsubscribe(self, fmt: OutputFormat) -> None:
+        with self._lock:
+            entry = self._entries.get(fmt)
+            if entry is None:
+                return
+            entry.refs = max(0, entry.refs - 1)
+            if entry.refs == 0:
+                entry.idle_since = time.monotonic()
+
+    def process(
+        self, chunk: np.ndarray, stamp_ns: Optional[int] = None, flags: int = 0
+    ) -> None:
+        """캡처 청크 1개를 구독 중인 모든 포맷으로 1회씩 변환 (flags 는 기본 스트림과 동일하게)."""
+        entries = self._entries
+        if not entries:
+            return
+        now = time.monotonic()
+        expired = []
+        for fmt, entry in entries.items():
+            if entry.refs == 0 and entry.idle_since is not None:
+                if now - entry.idle_since > self.linger:
+                    expired.append(fmt)
+                continue
+            conv = entry.converter
+            slot = entry.ring.claim(conv.max_out_bytes(chunk.shape[0]))
+            # 무음 청크도 변환은 계속 (리샘플러 필터 상태 유지)
+            entry.ring.commit(conv.convert(chunk, slot), stamp_ns, flags)
+        if expired:
+            self._expire(expired)
+
+    def _expire(self, fmts) -> None:
+        with self._lock:
+            entries = dict(self._entries)
+            for fmt in fmts:
+                entry = entries.get(fmt)
+                if entry is not None and entry.refs == 0:
+                    del entries[fmt]
+            self._entries = entries
@@ -1,20 +1,104 @@
 # audio_module.py
 import threading
 import queue
-from typing import Optional, Callable
+import time
+from typing import Optional, Callable, Union
 
-from utils import float32_to_pcm16_resampled, dbfs_from_chunk
+import numpy as np
+
+from audio_format import FormatHub
+from latency import ChunkTuner, chunk_frames, get_profile, resample_step
+from level_meter import LevelMeter
+from metrics import Gauge, PipelineMetrics
+from ring_buffer import FLAG_SILENT, PcmRing
+from utils import Pcm16Encoder, StreamResampler
 
 DEFAULT_SAMPLE_RATE = 48000   # loopback 캡처
 DEFAULT_TARGET_SR = 16000     # 네트워크 전송용
 DEFAULT_CHUNK = 1024
+DEFAULT_SILENCE_DB = -60.0     # 이보다 조용하면 무음
+DEFAULT_HANGOVER_SEC = 0.5     # 무음이 이만큼 이어져야 게이트를 닫음
+
+
+def max_chunk_frames(
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    target_sr: int = DEFAULT_TARGET_SR,
+    chunk: int = DEFAULT_CHUNK,
+    latency_profile: Optional[str] = None,
+    adaptive: bool = False,
+) -> int:
+    """AudioCapture 가 같은 설정으로 쓰게 될 최대 입력 청크 (프레임)."""
+    if latency_profile is None and not adaptive:
+        return chunk
+    profile = get_profile(latency_profile or "normal")
+    step = resample_step(sample_rate, target_sr)
+    if adaptive:
+        return ChunkTuner(profile, sample_rate, step).max_chunk
+    return chunk_frames(profile.chunk_ms, sample_rate, step)
+
+
+def capture_slot_bytes(
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    target_sr: int = DEFAULT_TARGET_SR,
+    chunk: int = DEFAULT_CHUNK,
+    latency_profile: Optional[str] = None,
+    adaptive: bool = False,
+) -> int:
+    """
+    그 설정의 청크 1개가 링에서 claim 하는 최대 바이트 (Pcm16Encoder.max_out_bytes 와 같은 값).
+    고정 슬롯 공유 링(SharedPcmRing)을 캡처보다 먼저 만들 때 slot_bytes 로 사용.
+    """
+    frames = max_chunk_frames(sample_rate, target_sr, chunk, latency_profile, adaptive)
+    return ((frames * target_sr) // sample_rate + 1) * 2
+
+
+class SilenceGate:
+    """
+    청크 dBFS 기준 무음 게이트.
+    - threshold_db 이상인 청크가 오면 즉시 열고,
+      threshold_db 미만이 hangover_sec 동안 이어지면 닫음 (말 끝 / 잔향이 잘리지 않도록).
+    - update() 가 True 면 무음 청크 (링에 FLAG_SILENT 로 기록).
+    """
+
+    def __init__(
+        self,
+        threshold_db: float = DEFAULT_SILENCE_DB,
+        hangover_sec: float = DEFAULT_HANGOVER_SEC,
+    ) -> None:
+        self.threshold_db = threshold_db
+        self.hangover_sec = hangover_sec
+        self.quiet_sec = 0.0
+        self.closed = False
+
+    def update(self, dbfs: float, seconds: float) -> bool:
+        if dbfs >= self.threshold_db:
+            self.quiet_sec = 0.0
+            self.closed = False
+        else:
+            self.quiet_sec += seconds
+            if self.quiet_sec >= self.hangover_sec:
+                self.closed = True
+        return self.closed
+
+    def reset(self) -> None:
+        self.quiet_sec = 0.0
+        self.closed = False
 
 
 class AudioCapture:
     """
     Loopback 캡처 전용 스레드.
-    - 계속 캡처해서 send_queue 로 PCM 바이트 밀어넣는 역할.
-    - 필요하면 level_callback 으로 dBFS 모니터링 가능.
+    - 계속 캡처해서 PCM16 청크를 내보내는 역할.
+      send_queue 가 PcmRing 이면 링 슬롯에 바로 인코딩 (할당/복사 없음),
+      queue.Queue 면 PCM16 memoryview 를 put_nowait.
+    - 레벨(RMS / 피크 / 단기)은 self.meter (LevelMeter) 슬롯에만 갱신.
+      UI / 지표가 각자 주기로 meter.read() (청크마다 콜백 / 큐 작업 없음).
+    - metrics 가 있으면 청크 수 / 변환 시간 / 큐 드롭을 기록.
+    - latency_profile (low / normal / bulk) 를 주면 청크 크기를 프로파일에서 정하고,
+      adaptive=True 면 ChunkTuner 가 클라이언트 수 / drain / 큐 깊이를 보고 실행 중에 조정
+      (리샘플러 / 인코더는 최대 청크 기준으로 한 번만 잡아 두고 상태 유지).
+    - silence_gate 가 있으면 이미 계산한 dBFS 로 무음 청크를 판정해 링에 FLAG_SILENT 표시
+      (PcmRing 출력일 때만. 서버가 v3 클라이언트에 PCM 대신 무음 프레임 전송).
     """
 
     def __init__(
@@ -22,51 +106,145 @@ class AudioCapture:
         sample_rate: int = DEFAULT_SAMPLE_RATE,
         target_sr: int = DEFAULT_TARGET_SR,
         chunk: int = DEFAULT_CHUNK,
-        level_callback: Optional[Callable[[float], None]] = None,
+        level_meter: Optional[LevelMeter] = None,
         error_callback: Optional[Callable[[Exception], None]] = None,
+        format_hub: Optional[FormatHub] = None,
+        metrics: Optional[PipelineMetrics] = None,
+        silence_gate: Optional[SilenceGate] = None,
+        latency_profile: Optional[str] = None,
+        adaptive: bool = False,
     ) -> None:
         self.sample_rate = sample_rate
         self.target_sr = target_sr
         self.chunk = chunk
-        self.level_callback = level_callback
+        self.meter = level_meter or LevelMeter()
         self.error_callback = error_callback
+        # 구독별 추가 출력 포맷 (없으면 기본 target_sr 모노만)
+        self.format_hub = format_hub
+        self.metrics = metrics
+        self.silence_gate = silence_gate
+
+        self.tuner: Optional[ChunkTuner] = None
+        self.blocksize: Optional[int] = None   # 장치 버퍼 크기 (프로파일 지정 시)
+        max_chunk = chunk
+        if latency_profile is not None or adaptive:
+            profile = get_profile(latency_profile or "normal")
+            step = resample_step(sample_rate, target_sr)
+            if adaptive:
+                self.tuner = ChunkTuner(profile, sample_rate, step, metrics)
+                self.chunk = self.tuner.chunk
+                max_chunk = self.tuner.max_chunk
+                self.blocksize = self.tuner.min_chunk
+            else:
+                self.chunk = max_chunk = chunk_frames(profile.chunk_ms, sample_rate, step)
+                self.blocksize = self.chunk
+        if metrics is not None:
+            r = metrics.registry
+            r.register(
+                Gauge("audiomi_capture_chunk_frames", "capture chunk size (frames)", lambda: self.chunk)
+            )
+            # 수집 시점에 미터 슬롯을 읽음
+            r.register(
+                Gauge("audiomi_level_rms_dbfs", "capture RMS level", lambda: self.meter.read().rms_db)
+            )
+            r.register(
+                Gauge("audiomi_level_peak_dbfs", "capture peak hold", lambda: self.meter.read().peak_db)
+            )
+            r.register(
+                Gauge(
+                    "audiomi_level_short_dbfs",
+                    "capture short-term level (unweighted)",
+                    lambda: self.meter.read().short_db,
+                )
+            )
+
+        # 리샘플러는 한 번만 만들고 필터 상태를 청크 사이에 유지
+        self.resampler = StreamResampler(sample_rate, target_sr, max_chunk=max_chunk)
+        # 믹스다운 / 레벨 / PCM16 변환을 한 번에 처리 (링 슬롯도 최대 청크 기준으로 claim)
+        self.encoder = Pcm16Encoder(
+            sample_rate, target_sr, max_chunk=max_chunk, resampler=self.resampler
+        )
 
         self._stop_event = threading.Event()
         self._thread: Optional[threading.Thread] = None
 
-    def start(self, mic, send_queue: queue.Queue) -> None:
+    def start(self, mic, send_queue: Union[PcmRing, queue.Queue]) -> None:
         """캡처 스레드 시작."""
         if self._thread and self._thread.is_alive():
             return
         self._stop_event.clear()
+        self.resampler.reset()
+        self.meter.reset()
+        if self.silence_gate is not None:
+            self.silence_gate.reset()
+        # 큐에 쌓인 view 가 덮어써지지 않도록 출력 버퍼를 큐 깊이보다 넉넉히
+        if isinstance(send_queue, queue.Queue) and send_queue.maxsize > 0:
+            self.encoder.reserve_pool(send_queue.maxsize + 2)
+        if isinstance(send_queue, PcmRing):
+            send_queue.sample_rate = self.target_sr
         self._thread = threading.Thread(
             target=self._capture_worker, args=(mic, send_queue), daemon=True
         )
         self._thread.start()
 
-    def _capture_worker(self, mic, send_queue: queue.Queue) -> None:
+    def _capture_worker(
+        self, mic, send_queue: Union[PcmRing, queue.Queue]
+    ) -> None:
+        ring = send_queue if isinstance(send_queue, PcmRing) else None
+        metrics = self.metrics
+        gate = self.silence_gate
+        tuner = self.tuner
+        meter = self.meter
+        chunk_sec = self.chunk / self.sample_rate
+        rec_kwargs = {} if self.blocksize is None else {"blocksize": self.blocksize}
         try:
-            with mic.recorder(samplerate=self.sample_rate) as rec:
+            with mic.recorder(samplerate=self.sample_rate, **rec_kwargs) as rec:
                 while not self._stop_event.is_set():
                     data = rec.record(numframes=self.chunk)
+                    # 캡처 시각 (청크 마지막 샘플 수신 시점, v2 헤더용)
+                    stamp_ns = time.monotonic_ns()
+                    t0 = time.perf_counter()
 
-                    # dBFS 모니터링 콜백
-                    if self.level_callback is not None:
+                    if ring is not None:
+                        slot = ring.claim(self.encoder.max_out_bytes)
+                        pcm = self.encoder.encode(data, out=slot.view(np.int16))
+                    else:
+                        pcm = self.encoder.encode(data)
+
+                    # 레벨 슬롯 갱신 (encode 에서 같이 계산된 값)
+                    meter.update(self.encoder.last_rms, self.encoder.last_peak, chunk_sec)
+
+                    flags = 0
+                    if gate is not None and gate.update(self.encoder.last_dbfs, chunk_sec):
+                        flags = FLAG_SILENT
+                        if metrics is not None:
+                            metrics.silent_chunks.inc()
+
+                    # 서버 전송용 링/큐로 PCM16 (target_sr) 넣기
+                    if ring is not None:
+                        ring.commit(len(pcm), stamp_ns, flags)
+                    else:
                         try:
-                            db = dbfs_from_chunk(data)
-                            self.level_callback(db)
-                        except Exception:
-                            pass
-
-                    # 서버 전송용 큐로 PCM16 (target_sr) 넣기
-                    try:
-                        pcm = float32_to_pcm16_resampled(
-                            data, self.sample_rate, self.target_sr
-                        )
-                        send_queue.put_nowait(pcm)
-                    except queue.Full:
-                        # 버퍼가 가득 찼으면 과감히 버려도 됨
-                        pass
+                            send_queue.put_nowait(pcm)
+                        except queue.Full:
+                            # 버퍼가 가득 찼으면 과감히 버려도 됨
+                            if metrics is not None:
+                                metrics.send_drops.inc()
+
+                    # 구독 중인 추가 포맷마다 1회씩 변환 (기본 스트림 commit 이후)
+                    if self.format_hub is not None:
+                        self.format_hub.process(data, stamp_ns, flags)
+
+                    # record() 대기 시간은 빼고, 인코딩 + 포맷 변환만 측정
+                    if metrics is not None:
+                        metrics.observe_chunk(time.perf_counter() - t0)
+
+                    # 청크 크기 조정은 청크 경계에서만 (리샘플러 상태는 그대로 이어짐)
+                    if tuner is not None:
+                        new_chunk = tuner.update()
+                        if new_chunk is not None:
+                            self.chunk = new_chunk
+                            chunk_sec = new_chunk / self.sample_rate
         except Exception as e:
             if self.error_callback is not None:
                 self.error_callback(e)
@@ -0,0 +1,257 @@
+# audio_sources.py
+"""
+장치 없이 캡처 파이프라인을 돌리기 위한 가상 오디오 소스.
+
+soundcard 마이크와 같은 인터페이스를 흉내 냄:
+
+    with src.recorder(samplerate=48000) as rec:
+        data = rec.record(numframes=1024)   # float32 (numframes, channels)
+
+- SyntheticSource : sine / noise / silence 생성기
+- FileSource      : WAV 또는 raw PCM 파일 재생 (반복 재생 옵션)
+- realtime=True 면 실제 장치처럼 샘플레이트에 맞춰 페이싱,
+  False 면 가능한 한 빨리 (벤치마크 / 헤드리스 테스트용).
+"""
+
+import os
+import time
+import wave
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+from utils import StreamResampler
+
+
+class _Pacer:
+    """생성한 프레임 수 기준으로 실시간 속도에 맞춰 sleep."""
+
+    def __init__(self, samplerate: int, realtime: bool) -> None:
+        self.samplerate = samplerate
+        self.realtime = realtime
+        self.frames = 0
+        self._t0 = time.monotonic()
+
+    def advance(self, numframes: int) -> None:
+        self.frames += numframes
+        if not self.realtime:
+            return
+        due = self._t0 + self.frames / self.samplerate
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+# ---------- 신호 생성기 ----------
+class _SyntheticRecorder:
+    def __init__(self, src: "SyntheticSource", samplerate: int) -> None:
+        self.src = src
+        self.samplerate = samplerate
+        self._pacer = _Pacer(samplerate, src.realtime)
+        self._phase = 0.0
+        self._rng = np.random.default_rng(src.seed)
+
+    def record(self, numframes: int) -> np.ndarray:
+        src = self.src
+        if src.kind == "sine":
+            step = 2.0 * np.pi * src.frequency / self.samplerate
+            t = self._phase + step * np.arange(numframes)
+            mono = (np.sin(t) * src.amplitude).astype(np.float32)
+            self._phase = float((self._phase + step * numframes) % (2.0 * np.pi))
+        elif src.kind == "noise":
+            mono = (
+                self._rng.uniform(-1.0, 1.0, numframes) * src.amplitude
+            ).astype(np.float32)
+        else:
+            mono = np.zeros(numframes, dtype=np.float32)
+
+        self._pacer.advance(numframes)
+        return np.repeat(mono[:, None], src.channels, axis=1)
+
+
+class SyntheticSource:
+    """sine / noise / silence 가상 마이크."""
+
+    KINDS = ("sine", "noise", "silence")
+
+    def __init__(
+        self,
+        kind: str = "sine",
+        frequency: float = 440.0,
+        amplitude: float = 0.5,
+        channels: int = 2,
+        realtime: bool = True,
+        seed: Optional[int] = None,
+    ) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown synthetic kind: {kind}")
+        self.kind = kind
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.channels = channels
+        self.realtime = realtime
+        self.seed = seed
+        self.name = f"{kind}" + (f" {frequency:g}Hz" if kind == "sine" else "")
+
+    @contextmanager
+    def recorder(self, samplerate: int, **kwargs):
+        yield _SyntheticRecorder(self, samplerate)
+
+
+# ---------- 파일 재생 ----------
+_RAW_DTYPES = {"s16": np.int16, "f32": np.float32}
+
+
+class _FileRecorder:
+    BLOCK = 4096
+
+    def __init__(self, src: "FileSource", samplerate: int) -> None:
+        self.src = src
+        self.samplerate = samplerate
+        self._pacer = _Pacer(samplerate, src.realtime)
+        self._fp = None
+        self._wav: Optional[wave.Wave_read] = None
+        self._open()
+        self._resamplers = None
+        if self.file_sr != samplerate:
+            self._resamplers = [
+                StreamResampler(self.file_sr, samplerate, self.BLOCK)
+                for _ in range(self.channels)
+            ]
+        self._pending = np.zeros((0, self.channels), dtype=np.float32)
+        self._eof = False
+
+    def _open(self) -> None:
+        src = self.src
+        if src.raw is None:
+            self._wav = wave.open(src.path, "rb")
+            if self._wav.getsampwidth() != 2:
+                raise ValueError("only 16-bit PCM WAV is supported")
+            self.file_sr = self._wav.getframerate()
+            self.channels = self._wav.getnchannels()
+            self._dtype = np.int16
+            frames = self._wav.getnframes()
+        else:
+            self.file_sr, self.channels, dtype_name = src.raw
+            self._dtype = _RAW_DTYPES[dtype_name]
+            self._fp = open(src.path, "rb")
+            frame_bytes = self.channels * np.dtype(self._dtype).itemsize
+            frames = os.fstat(self._fp.fileno()).st_size // frame_bytes
+        if frames == 0:
+            # loop 재생이면 rewind 만 반복하며 멈추지 않으므로 여기서 거부
+            self.close()
+            raise ValueError(f"empty audio file: {src.path}")
+
+    def _rewind(self) -> None:
+        if self._wav is not None:
+            self._wav.rewind()
+        else:
+            self._fp.seek(0)
+
+    def _read_block(self) -> Optional[np.ndarray]:
+        n = self.BLOCK
+        if self._wav is not None:
+            raw = self._wav.readframes(n)
+        else:
+            raw = self._fp.read(n * self.channels * np.dtype(self._dtype).itemsize)
+        if not raw:
+            return None
+        data = np.frombuffer(raw, dtype=self._dtype)
+        data = data[: len(data) - len(data) % self.channels].reshape(-1, self.channels)
+        if not len(data):
+            # 프레임 1개도 안 되는 꼬리
+            return None
+        if self._dtype == np.int16:
+            block = data.astype(np.float32) / 32768.0
+        else:
+            block = data.astype(np.float32)
+
+        if self._resamplers is not None:
+            cols = [rs.process(block[:, ch]) for ch, rs in enumerate(self._resamplers)]
+            block = np.stack(cols, axis=1)
+        return block
+
+    def record(self, numframes: int) -> np.ndarray:
+        rewound = False
+        while len(self._pending) < numframes:
+            block = self._read_block()
+            if block is None:
+                if not self.src.loop:
+                    if len(self._pending) == 0:
+                        raise EOFError(f"end of file: {self.src.path}")
+                    pad = np.zeros(
+                        (numframes - len(self._pending), self.channels), np.float32
+                    )
+                    block = pad
+                else:
+                    if rewound:
+                        # rewind 직후에도 읽을 것이 없음 (파일이 비었거나 잘림)
+                        raise EOFError(f"no audio data after rewind: {self.src.path}")
+                    self._rewind()
+                    rewound = True
+                    continue
+            rewound = False
+            self._pending = np.concatenate([self._pending, block])
+
+        out = self._pending[:numframes]
+        self._pending = self._pending[numframes:]
+        self._pacer.advance(numframes)
+        return out
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+        if self._fp is not None:
+            self._fp.close()
+
+
+class FileSource:
+    """
+    WAV (PCM16) 또는 raw PCM 파일을 마이크처럼 재생.
+    raw 파일은 raw=(sample_rate, channels, "s16" | "f32") 로 포맷 지정.
+    파일 샘플레이트가 요청과 다르면 StreamResampler 로 변환.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        loop: bool = True,
+        realtime: bool = True,
+        raw: Optional[tuple] = None,
+    ) -> None:
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.raw = raw
+        self.name = f"file {path}"
+
+    @contextmanager
+    def recorder(self, samplerate: int, **kwargs):
+        rec = _FileRecorder(self, samplerate)
+        try:
+            yield rec
+        finally:
+            rec.close()
+
+
+def open_source(spec: str, realtime: bool = True):
+    """
+    문자열 스펙으로 가상 소스 생성.
+      sine[:freq]  noise  silence
+      wav:path
+      raw:path:rate:channels:s16|f32
+    """
+    kind, _, rest = spec.partition(":")
+    if kind == "sine":
+        return SyntheticSource("sine", float(rest or 440.0), realtime=realtime)
+    if kind in ("noise", "silence"):
+        return SyntheticSource(kind, realtime=realtime)
+    if kind == "wav":
+        return FileSource(rest, realtime=realtime)
+    if kind == "raw":
+        path, rate, channels, dtype_name = rest.rsplit(":", 3)
+        return FileSource(
+            path, realtime=realtime, raw=(int(rate), int(channels), dtype_name)
+        )
+    raise ValueError(f"unknown source spec: {spec}")
@@ -0,0 +1,136 @@
+# bench_frames.py
+"""
+수신 경로 프레임 파싱 마이크로벤치마크 (frames/s)
+
+같은 v2 오디오 프레임 스트림을 StreamReader 에 넣고 방식별로 끝까지 파싱:
+    readexactly x3 : 헤더 8 + size 4 + 본문 (프레임마다 bytes 3개 + unpack 2번, 기존 방식)
+    FrameDecoder   : read(64 KiB) → feed → frames() (memoryview)
+    decoder only   : 소켓 / StreamReader 없이 get_buffer / buffer_updated 로 직접 채움
+- 중간중간 모르는 cmd (size 포함) 를 섞어서 건너뛰기 비용도 포함
+
+사용법:
+  python bench_frames.py [--frames 200000] [--payload 2048] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import statistics
+import struct
+import time
+
+from frame_parser import READ_SIZE, FrameDecoder
+
+CHECKCODE = 20250918
+REQUEST_AUDIO_V2 = 0x11
+UNKNOWN_CMD = 0x7F
+UNKNOWN_EVERY = 100   # 이 간격마다 모르는 프레임 1개
+
+HEADER_V2 = struct.Struct("<iiiqqi")
+EXT_V2 = struct.Struct("<qqi")
+
+
+def _build_stream(frames: int, payload: int) -> bytes:
+    body = bytes(payload)
+    out = bytearray()
+    for seq in range(frames):
+        out += HEADER_V2.pack(
+            CHECKCODE, REQUEST_AUDIO_V2, EXT_V2.size + payload, seq, seq * 1000, 16000
+        )
+        out += body
+        if seq % UNKNOWN_EVERY == 0:
+            out += struct.pack("<iii", CHECKCODE, UNKNOWN_CMD, 16) + bytes(16)
+    return bytes(out)
+
+
+def _reader(stream: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader(limit=len(stream) + 1)
+    reader.feed_data(stream)
+    reader.feed_eof()
+    return reader
+
+
+async def _readexactly(stream: bytes) -> int:
+    reader = _reader(stream)
+    n = 0
+    try:
+        while True:
+            header = await reader.readexactly(8)
+            _, cmd = struct.unpack("<ii", header)
+            (size,) = struct.unpack("<i", await reader.readexactly(4))
+            data = await reader.readexactly(size)
+            if cmd == REQUEST_AUDIO_V2:
+                EXT_V2.unpack_from(data, 0)
+                n += 1
+    except asyncio.IncompleteReadError:
+        return n
+
+
+async def _decoder(stream: bytes) -> int:
+    reader = _reader(stream)
+    dec = FrameDecoder(CHECKCODE, sized=(REQUEST_AUDIO_V2,))
+    n = 0
+    while True:
+        data = await reader.read(READ_SIZE)
+        if not data:
+            return n
+        dec.feed(data)
+        for cmd, body in dec.frames():
+            EXT_V2.unpack_from(body, 0)
+            n += 1
+
+
+def _decoder_only(stream: bytes) -> int:
+    dec = FrameDecoder(CHECKCODE, sized=(REQUEST_AUDIO_V2,))
+    src = memoryview(stream)
+    n = 0
+    pos = 0
+    while pos < len(src):
+        buf = dec.get_buffer(READ_SIZE)
+        k = min(READ_SIZE, len(src) - pos)
+        buf[:k] = src[pos : pos + k]
+        dec.buffer_updated(k)
+        pos += k
+        for cmd, body in dec.frames():
+            EXT_V2.unpack_from(body, 0)
+            n += 1
+    return n
+
+
+def _time(fn, stream: bytes) -> tuple:
+    t0 = time.perf_counter()
+    n = fn(stream)
+    return n, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="frame parser microbenchmark")
+    ap.add_argument("--frames", type=int, default=200000)
+    ap.add_argument("--payload", type=int, default=2048, help="오디오 본문 바이트 (기본 1024 프레임 pcm16)")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    stream = _build_stream(args.frames, args.payload)
+    cases = (
+        ("readexactly x3", lambda s: asyncio.run(_readexactly(s))),
+        ("FrameDecoder", lambda s: asyncio.run(_decoder(s))),
+        ("decoder only", _decoder_only),
+    )
+    print(
+        f"{args.frames} frames x {args.payload} B payload "
+        f"({len(stream) / 1e6:.1f} MB), runs={args.runs} (median)"
+    )
+    for name, fn in cases:
+        results = [_time(fn, stream) for _ in range(args.runs)]
+        n = results[0][0]
+        if n != args.frames:
+            print(f"  {name:15s}: error (parsed {n} frames)")
+            continue
+        sec = statistics.median(t for _, t in results)
+        print(
+            f"  {name:15s}: {n / sec / 1e3:9.1f} k frames/s"
+            f"  {len(stream) / sec / 1e9:6.2f} GB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
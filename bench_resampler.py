@@ -0,0 +1,63 @@
+# bench_resampler.py
+"""
+리샘플러 벤치마크
+
+- 기존 float32_to_pcm16_resampled (청크마다 resample_poly),
+  StreamResampler 를 쓰는 경로, Pcm16Encoder (1-pass 변환) 의
+  초당 처리 청크 수 비교
+- 장치 없이 랜덤 스테레오 청크로 측정
+
+사용법:
+  python bench_resampler.py [in_sr] [out_sr] [chunk]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from utils import Pcm16Encoder, StreamResampler, float32_to_pcm16_resampled
+
+
+def _bench(fn, chunks, seconds: float = 2.0) -> float:
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        for c in chunks:
+            fn(c)
+        n += len(chunks)
+        dt = time.perf_counter() - t0
+        if dt >= seconds:
+            return n / dt
+
+
+def main():
+    in_sr = int(sys.argv[1]) if len(sys.argv) > 1 else 48000
+    out_sr = int(sys.argv[2]) if len(sys.argv) > 2 else 16000
+    chunk = int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+
+    rng = np.random.default_rng(0)
+    chunks = [
+        (rng.standard_normal((chunk, 2)) * 0.2).astype(np.float32)
+        for _ in range(64)
+    ]
+
+    rs = StreamResampler(in_sr, out_sr, max_chunk=chunk)
+
+    old = _bench(lambda c: float32_to_pcm16_resampled(c, in_sr, out_sr), chunks)
+    new = _bench(
+        lambda c: float32_to_pcm16_resampled(c, in_sr, out_sr, resampler=rs),
+        chunks,
+    )
+    enc = Pcm16Encoder(in_sr, out_sr, max_chunk=chunk)
+    fused = _bench(enc.encode, chunks)
+
+    realtime = in_sr / chunk
+    print(f"[BENCH] {in_sr} -> {out_sr} Hz, chunk={chunk} (realtime {realtime:.1f} chunks/s)")
+    print(f"  resample_poly   : {old:10.1f} chunks/s")
+    print(f"  StreamResampler : {new:10.1f} chunks/s  (x{new / old:.2f})")
+    print(f"  Pcm16Encoder    : {fused:10.1f} chunks/s  (x{fused / old:.2f})")
+
+
+if __name__ == "__main__":
+    main()
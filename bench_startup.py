@@ -0,0 +1,133 @@
+# bench_startup.py
+"""
+시작 시간 벤치마크 (GUI 진입점 vs 헤드리스 진입점)
+
+- 매 측정마다 새 인터프리터를 띄워서 wall time 을 재고 중앙값 출력
+    baseline      : python -c pass
+    gui import    : import main            (tkinter / dotenv / ... )
+    gui + devices : import main, soundcard (App 이 시작하자마자 장치 목록을 읽음)
+    cli import    : import server_cli
+    cli listen    : server_cli.py --source silence 실행 → TCP 접속 가능해질 때까지
+- --importtime 이면 경로별 import 상위 모듈 (python -X importtime) 도 출력
+- 설치 안 된 모듈 (예: 헤드리스 리눅스의 soundcard) 이 있으면 해당 항목은 error 로 표시
+
+사용법:
+  python bench_startup.py [--runs 5] [--importtime]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SNIPPETS = {
+    "baseline": "pass",
+    "gui import": "import main",
+    "gui + devices": "import main, soundcard",
+    "cli import": "import server_cli",
+}
+
+
+def _time_snippet(code: str) -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True
+    )
+    dt = time.perf_counter() - t0
+    if proc.returncode != 0:
+        last = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        raise RuntimeError(last)
+    return dt
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _time_cli_listen(timeout: float = 20.0) -> float:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable, os.path.join(HERE, "server_cli.py"),
+            "--source", "silence", "--host", "127.0.0.1", "--port", str(port),
+            "--metrics-port", "0", "--quiet",
+        ],
+        cwd=HERE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.05):
+                    return time.perf_counter() - t0
+            except OSError:
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError(proc.stderr.read().decode().strip().splitlines()[-1])
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError("timeout")
+            time.sleep(0.002)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def _importtime(code: str, top: int = 8) -> list:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # 진입 모듈이 직접 import 한 모듈만 (들여쓰기 3칸 = 깊이 1)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1 and cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="startup time: GUI vs headless")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--importtime", action="store_true")
+    args = ap.parse_args()
+
+    cases = [(name, lambda c=code: _time_snippet(c)) for name, code in SNIPPETS.items()]
+    cases.append(("cli listen", _time_cli_listen))
+
+    print(f"python {sys.version.split()[0]}, runs={args.runs} (median / min)")
+    for name, fn in cases:
+        try:
+            times = [fn() for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"  {name:14s}: error ({e})")
+            continue
+        print(
+            f"  {name:14s}: {statistics.median(times) * 1000:8.1f} ms"
+            f"  / {min(times) * 1000:8.1f} ms"
+        )
+
+    if args.importtime:
+        for name in ("gui import", "cli import"):
+            print(f"\n[{name}] top imports (cumulative us)")
+            for us, mod in _importtime(SNIPPETS[name]):
+                print(f"  {us:9d}  {mod}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# frame_parser.py
+"""
+스트리밍 프레임 디코더 (서버 / 클라이언트 공용).
+
+프레임 = <ii (checkcode, cmd) + 본문.
+- fixed 에 있는 cmd      : 본문 길이가 정해진 프레임 (ACK, 요청 등)
+- 그 밖의 cmd            : <i size + size 바이트 (오디오, stats ...)
+  sized 에 없는 cmd 는 size 만큼 건너뛰고 skipped 로 집계 → 모르는 명령이 와도 동기 유지.
+
+큰 블록 단위로 재사용 bytearray 에 받아 두고, 완성된 프레임을 memoryview 로 꺼냄
+(프레임마다 bytes 할당 / readexactly 호출 없음).
+
+    dec = FrameDecoder(checkcode, fixed={99: 1}, sized={1})
+    while True:
+        data = await reader.read(READ_SIZE)
+        if not data: break
+        dec.feed(data)                  # 또는 get_buffer() / buffer_updated() (BufferedProtocol)
+        for cmd, body in dec.frames():
+            ...                         # body 는 다음 feed() / get_buffer() 전까지만 유효
+
+frames() 를 중간에 빠져나와도 남은 프레임은 버퍼에 그대로 있어서 다음 frames() 에서 이어짐.
+"""
+
+import struct
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+FRAME_HEADER = struct.Struct("<ii")   # checkcode, cmd
+SIZE_FIELD = struct.Struct("<i")
+
+READ_SIZE = 64 * 1024
+DEFAULT_CAPACITY = 256 * 1024
+MAX_FRAME = 16 * 1024 * 1024   # size 필드가 이보다 크면 깨진 스트림으로 간주
+
+
+class FrameError(ValueError):
+    """checkcode 불일치 / 비정상 size (스트림 동기를 잃음 → 연결 종료)."""
+
+
+class FrameDecoder:
+    def __init__(
+        self,
+        checkcode: int,
+        fixed: Optional[Dict[int, int]] = None,
+        sized: Iterable[int] = (),
+        capacity: int = DEFAULT_CAPACITY,
+        max_frame: int = MAX_FRAME,
+    ) -> None:
+        self.checkcode = checkcode
+        self.fixed = dict(fixed or {})
+        self.sized = frozenset(sized)
+        self.max_frame = max_frame
+        self._buf = bytearray(max(capacity, FRAME_HEADER.size + SIZE_FIELD.size))
+        self._view = memoryview(self._buf)
+        self._start = 0   # 아직 꺼내지 않은 첫 바이트
+        self._end = 0     # 받은 데이터 끝
+
+        self.parsed = 0
+        self.skipped = 0
+
+    @property
+    def buffered(self) -> int:
+        return self._end - self._start
+
+    # ---------- 입력 ----------
+    def get_buffer(self, min_free: int = READ_SIZE) -> memoryview:
+        """
+        min_free 바이트 이상 쓸 수 있는 빈 영역 (recv_into / BufferedProtocol 용).
+        필요하면 남은 데이터를 앞으로 당기고, 그래도 모자라면 더 큰 버퍼로 교체.
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+        if len(self._buf) - self._end < min_free:
+            n = self._end - self._start
+            if n + min_free > len(self._buf):
+                # 크기 변경은 export 된 view 가 있으면 불가 → 새 버퍼로 교체
+                new = bytearray(max(len(self._buf) * 2, n + min_free))
+                new[:n] = self._view[self._start : self._end]
+                self._buf = new
+                self._view = memoryview(new)
+            else:
+                self._view[:n] = self._view[self._start : self._end]
+            self._start, self._end = 0, n
+        return self._view[self._end :]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._end += nbytes
+
+    def feed(self, data) -> None:
+        n = len(data)
+        self.get_buffer(n)[:n] = data
+        self._end += n
+
+    # ---------- 파싱 ----------
+    def frames(self) -> Iterator[Tuple[int, memoryview]]:
+        """버퍼에 완성된 프레임 (cmd, body) 를 차례로. 덜 온 프레임은 남겨 둠."""
+        view = self._view
+        fixed = self.fixed
+        header_size = FRAME_HEADER.size
+        while True:
+            start = self._start
+            avail = self._end - start
+            if avail < header_size:
+                return
+            check, cmd = FRAME_HEADER.unpack_from(view, start)
+            if check != self.checkcode:
+                raise FrameError(f"invalid checkcode: {check}")
+            size = fixed.get(cmd)
+            head = header_size
+            if size is None:
+                if avail < header_size + SIZE_FIELD.size:
+                    return
+                (size,) = SIZE_FIELD.unpack_from(view, start + header_size)
+                if size < 0 or size > self.max_frame:
+                    raise FrameError(f"invalid size: {size} (cmd={cmd})")
+                head += SIZE_FIELD.size
+                known = cmd in self.sized
+            else:
+                known = True
+            end = start + head + size
+            if end > self._end:
+                return
+            self._start = end
+            if not known:
+                self.skipped += 1
+                continue
+            self.parsed += 1
+            yield cmd, view[start + head : end]
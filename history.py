@@ -0,0 +1,113 @@
+# history.py
+"""
+서버 기본 스트림의 최근 청크 보관 (재접속 / 되감기 replay 용).
+
+- 청크(PCM16, 기본 스트림)를 seq / 캡처 시각 / 플래그와 함께 보관.
+  max_seconds (캡처 시각 기준) 또는 max_bytes 를 넘으면 오래된 것부터 버림.
+- seq 와 캡처 시각은 단조 증가 → bisect 로 조회.
+- 서버 이벤트 루프 스레드에서만 append / 조회 (락 없음).
+- 저장은 PCM 원본, 코덱 인코딩은 replay 하는 세션 코덱으로 그때그때.
+
+    hist = ChunkHistory(max_seconds=300)
+    hist.append(seq, stamp_ns, pcm16, flags)
+    entry = hist.entry_from(hist.seq_for_time(now_ns - 10e9))   # 최근 10초
+"""
+
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+DEFAULT_HISTORY_SECONDS = 300.0
+DEFAULT_HISTORY_BYTES = 64 * 1024 * 1024   # 16 kHz PCM16 모노 기준 ~35분
+
+# (seq, stamp_ns, flags, data)
+HistoryEntry = Tuple[int, int, int, bytes]
+
+_COMPACT_MIN = 1024   # 앞쪽 빈 칸이 이만큼 + 절반 이상이면 리스트 정리
+
+
+class ChunkHistory:
+    def __init__(
+        self,
+        max_seconds: float = DEFAULT_HISTORY_SECONDS,
+        max_bytes: int = DEFAULT_HISTORY_BYTES,
+    ) -> None:
+        self.max_ns = int(max_seconds * 1e9)
+        self.max_bytes = max_bytes
+        self.sample_rate = 0   # 청크 샘플레이트 (replay 프레임 헤더용)
+        # 병렬 리스트, [_head:] 만 유효 (앞에서 버릴 때 O(1))
+        self._seqs: List[int] = []
+        self._stamps: List[int] = []
+        self._flags: List[int] = []
+        self._data: List[bytes] = []
+        self._head = 0
+        self.bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._seqs) - self._head
+
+    @property
+    def first_seq(self) -> Optional[int]:
+        return self._seqs[self._head] if len(self) else None
+
+    @property
+    def last_seq(self) -> Optional[int]:
+        return self._seqs[-1] if len(self) else None
+
+    @property
+    def seconds(self) -> float:
+        """보관 중인 구간 길이 (캡처 시각 기준)."""
+        if not len(self):
+            return 0.0
+        return (self._stamps[-1] - self._stamps[self._head]) / 1e9
+
+    def append(self, seq: int, stamp_ns: int, data, flags: int = 0) -> None:
+        """청크 1개 추가 (data 는 복사해서 보관)."""
+        if len(self) and seq <= self._seqs[-1]:
+            # 입력이 재시작됨 (캡처 재시작 등) → 이전 기록은 seq 가 섞이므로 비움
+            self.clear()
+        chunk = bytes(data)
+        self._seqs.append(seq)
+        self._stamps.append(stamp_ns)
+        self._flags.append(flags)
+        self._data.append(chunk)
+        self.bytes += len(chunk)
+        self._evict()
+
+    def _evict(self) -> None:
+        newest = self._stamps[-1]
+        while len(self) > 1 and (
+            self.bytes > self.max_bytes or newest - self._stamps[self._head] > self.max_ns
+        ):
+            self.bytes -= len(self._data[self._head])
+            self._data[self._head] = b""
+            self._head += 1
+            self.evicted += 1
+        if self._head >= _COMPACT_MIN and self._head * 2 >= len(self._seqs):
+            h = self._head
+            del self._seqs[:h], self._stamps[:h], self._flags[:h], self._data[:h]
+            self._head = 0
+
+    def clear(self) -> None:
+        self._seqs.clear()
+        self._stamps.clear()
+        self._flags.clear()
+        self._data.clear()
+        self._head = 0
+        self.bytes = 0
+
+    def seq_for_time(self, stamp_ns: int) -> Optional[int]:
+        """캡처 시각이 stamp_ns 이상인 첫 청크의 seq (보관 구간보다 이르면 가장 오래된 청크)."""
+        if not len(self):
+            return None
+        i = bisect_left(self._stamps, stamp_ns, self._head)
+        return self._seqs[min(i, len(self._seqs) - 1)]
+
+    def entry_from(self, seq: int) -> Optional[HistoryEntry]:
+        """seq 이상인 첫 청크 (이미 버려진 seq 면 가장 오래된 청크). 없으면 None."""
+        if not len(self):
+            return None
+        i = bisect_left(self._seqs, seq, self._head)
+        if i >= len(self._seqs):
+            return None
+        return self._seqs[i], self._stamps[i], self._flags[i], self._data[i]
@@ -0,0 +1,156 @@
+# latency.py
+"""
+캡처 청크 크기 (= 홉당 지연) 프로파일 + 실행 중 자동 조정.
+
+    low    : ~5 ms 청크   (대화형, 패킷 수 4배)
+    normal : ~21 ms 청크  (기존 1024 프레임 @48k)
+    bulk   : ~85 ms 청크  (청취자가 아주 많을 때 패킷 / syscall 수 절감)
+
+ChunkTuner (adaptive):
+- interval 마다 metrics 에서 클라이언트 수 / drain 대기 / 송신 큐 깊이를 읽어 청크 크기를 정함.
+  · drain 평균이 청크 길이의 절반을 넘거나 큐가 밀리면 → 2배 (상한 max_ms)
+  · 아니면 클라이언트 수 기준 목표 (clients_per_step 명마다 2배) 로,
+    줄일 때는 calm_windows 번 연속 여유가 있을 때만 절반씩 (출렁임 방지)
+- 청크는 리샘플 비율의 배수로 맞춰 출력 샘플 수가 매번 같게 유지.
+- 리샘플러는 스트리밍(위상 / 필터 꼬리 보존)이라 청크 크기가 바뀌어도 출력은 연속.
+
+    tuner = ChunkTuner(PROFILES["normal"], 48000, step=3, metrics=metrics)
+    AudioCapture(latency_profile="normal", adaptive=True, metrics=metrics)
+"""
+
+import math
+import time
+from typing import NamedTuple, Optional
+
+from metrics import PipelineMetrics
+
+DEFAULT_PROFILE = "normal"
+DEFAULT_TUNE_INTERVAL = 1.0
+DEFAULT_CLIENTS_PER_STEP = 16
+DEPTH_LIMIT = 2          # 송신 큐(링 커서)에 이만큼 밀리면 압박
+DRAIN_RATIO = 0.5        # drain 평균 > 청크 길이 * 이 비율이면 압박
+CALM_WINDOWS = 3
+
+
+class LatencyProfile(NamedTuple):
+    chunk_ms: float   # 시작 청크 길이
+    min_ms: float     # adaptive 하한
+    max_ms: float     # adaptive 상한
+
+
+PROFILES = {
+    "low": LatencyProfile(5.0, 2.5, 10.0),
+    "normal": LatencyProfile(21.3, 5.0, 42.7),
+    "bulk": LatencyProfile(85.3, 21.3, 170.7),
+}
+
+
+def get_profile(name: str) -> LatencyProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"unknown latency profile: {name} ({', '.join(PROFILES)})")
+
+
+def chunk_frames(ms: float, sample_rate: int, step: int = 1) -> int:
+    """ms → 프레임 수 (step 의 배수, 최소 step)."""
+    frames = int(round(ms * sample_rate / 1000.0 / step)) * step
+    return max(step, frames)
+
+
+def resample_step(in_sr: int, out_sr: int) -> int:
+    """in_sr → out_sr 에서 출력 샘플 수가 정수가 되는 최소 입력 프레임 단위."""
+    return in_sr // math.gcd(in_sr, out_sr)
+
+
+class ChunkTuner:
+    """캡처 스레드에서 청크마다 update() 호출. 바꿀 때만 새 청크 크기 반환."""
+
+    def __init__(
+        self,
+        profile: LatencyProfile,
+        sample_rate: int,
+        step: int = 1,
+        metrics: Optional[PipelineMetrics] = None,
+        interval: float = DEFAULT_TUNE_INTERVAL,
+        clients_per_step: int = DEFAULT_CLIENTS_PER_STEP,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.step = step
+        self.metrics = metrics
+        self.interval = interval
+        self.clients_per_step = max(1, clients_per_step)
+        self.min_chunk = chunk_frames(profile.min_ms, sample_rate, step)
+        self.max_chunk = max(self.min_chunk, chunk_frames(profile.max_ms, sample_rate, step))
+        self.chunk = min(
+            self.max_chunk, max(self.min_chunk, chunk_frames(profile.chunk_ms, sample_rate, step))
+        )
+        self.changes = 0
+        self._calm = 0
+        self._t = time.monotonic()
+        self._drain = (0.0, 0)   # 직전 창의 (sum, count)
+
+    def _gauge(self, *names: str) -> float:
+        registry = self.metrics.registry
+        for name in names:
+            m = registry.get(name)
+            if m is not None:
+                v = m.get()
+                return 0.0 if v != v else float(v)   # NaN → 0
+        return 0.0
+
+    def _drain_avg(self) -> float:
+        """직전 창의 drain 평균. 샤딩 모드면 워커 합계(cluster), 아니면 자체 histogram."""
+        registry = self.metrics.registry
+        if registry.get("audiomi_cluster_drain_count") is not None:
+            s = self._gauge("audiomi_cluster_drain_seconds")
+            n = self._gauge("audiomi_cluster_drain_count")
+        else:
+            hist = self.metrics.drain_seconds
+            s, n = hist.sum, hist.count
+        ps, pn = self._drain
+        self._drain = (s, n)
+        return (s - ps) / (n - pn) if n > pn else 0.0
+
+    def target(self, clients: float) -> int:
+        """클라이언트 수만 봤을 때의 목표 청크."""
+        k = max(0, math.ceil(math.log2(max(clients, 1) / self.clients_per_step)))
+        return min(self.max_chunk, self.min_chunk << k)
+
+    def update(self) -> Optional[int]:
+        if self.metrics is None:
+            return None
+        now = time.monotonic()
+        if now - self._t < self.interval:
+            return None
+        self._t = now
+
+        # 샤딩 모드면 부모 레지스트리에는 cluster 합계만 있음 (큐 깊이는 가장 밀린 워커 기준)
+        clients = self._gauge("audiomi_cluster_clients", "audiomi_clients")
+        depth = self._gauge("audiomi_cluster_send_queue_depth_max", "audiomi_send_queue_depth")
+        drain = self._drain_avg()
+        chunk_sec = self.chunk / self.sample_rate
+
+        new = self.chunk
+        if drain > chunk_sec * DRAIN_RATIO or depth >= DEPTH_LIMIT:
+            self._calm = 0
+            new = min(self.max_chunk, self.chunk * 2)
+        else:
+            goal = self.target(clients)
+            if goal > self.chunk:
+                self._calm = 0
+                new = min(goal, self.chunk * 2)
+            elif goal < self.chunk:
+                self._calm += 1
+                if self._calm >= CALM_WINDOWS:
+                    self._calm = 0
+                    new = max(goal, self.chunk // 2)
+            else:
+                self._calm = 0
+
+        new = max(self.min_chunk, (new // self.step) * self.step)
+        if new == self.chunk:
+            return None
+        self.chunk = new
+        self.changes += 1
+        return new
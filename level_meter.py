@@ -0,0 +1,75 @@
+# level_meter.py
+"""
+캡처 레벨 미터 (RMS / 피크 / 단기 레벨).
+
+- 캡처 스레드는 청크마다 update() 로 값 몇 개만 갱신하고, 결과를 튜플 하나로 만들어
+  _slot 에 통째로 바꿔 끼움 (참조 대입 1번 → 읽는 쪽은 락 없이 항상 일관된 값을 봄).
+- UI / 지표는 각자 주기로 read() – 청크마다 콜백 / 큐 작업 없음, 읽는 빈도와 무관.
+- 값 (선형 → read() 에서 dBFS):
+    rms   : 평균 제곱의 지수 이동 평균 (rms_tau 초, VU 미터 비슷한 반응)
+    peak  : 즉시 올라가고 peak_release dB/s 로 내려가는 피크 홀드
+    short : short_tau 초 평균 제곱 (K-weighting 없는 단기 레벨, EBU R128 short-term 3 s 근사)
+
+    meter = LevelMeter()
+    AudioCapture(level_meter=meter)
+    level = meter.read()   # LevelReading(rms_db, peak_db, short_db, age)
+"""
+
+import math
+import time
+from typing import NamedTuple
+
+DEFAULT_RMS_TAU = 0.3
+DEFAULT_SHORT_TAU = 3.0
+DEFAULT_PEAK_RELEASE = 20.0   # dB/s
+DBFS_FLOOR = -120.0
+
+
+class LevelReading(NamedTuple):
+    rms_db: float
+    peak_db: float
+    short_db: float
+    age: float        # 마지막 update 이후 경과 시간(초), 갱신 전이면 inf
+
+
+def _db(power: float) -> float:
+    return max(DBFS_FLOOR, 10.0 * math.log10(power)) if power > 0 else DBFS_FLOOR
+
+
+class LevelMeter:
+    """쓰는 쪽은 캡처 스레드 1개, 읽는 쪽은 여러 스레드."""
+
+    def __init__(
+        self,
+        rms_tau: float = DEFAULT_RMS_TAU,
+        short_tau: float = DEFAULT_SHORT_TAU,
+        peak_release: float = DEFAULT_PEAK_RELEASE,
+    ) -> None:
+        self.rms_tau = rms_tau
+        self.short_tau = short_tau
+        self.peak_release = peak_release
+        # 캡처 스레드 상태
+        self._ms = 0.0
+        self._short = 0.0
+        self._peak = 0.0
+        # (rms 평균 제곱, 피크, 단기 평균 제곱, 갱신 시각) – 통째로 교체
+        self._slot = (0.0, 0.0, 0.0, None)
+
+    def reset(self) -> None:
+        self._ms = self._short = self._peak = 0.0
+        self._slot = (0.0, 0.0, 0.0, None)
+
+    def update(self, rms: float, peak: float, seconds: float) -> None:
+        """(캡처 스레드) 청크 1개의 RMS / 피크 (선형, 0~1) 와 청크 길이(초)."""
+        ms = rms * rms
+        self._ms += (1.0 - math.exp(-seconds / self.rms_tau)) * (ms - self._ms)
+        self._short += (1.0 - math.exp(-seconds / self.short_tau)) * (ms - self._short)
+        held = self._peak * 10.0 ** (-self.peak_release * seconds / 20.0)
+        self._peak = peak if peak > held else held
+        self._slot = (self._ms, self._peak, self._short, time.monotonic())
+
+    def read(self) -> LevelReading:
+        """현재 값 (아무 스레드 / 아무 주기)."""
+        ms, peak, short, stamp = self._slot
+        age = math.inf if stamp is None else time.monotonic() - stamp
+        return LevelReading(_db(ms), _db(peak * peak), _db(short), age)
@@ -0,0 +1,292 @@
+# load_client.py
+"""
+NetAudioServer 부하 테스트 클라이언트
+
+- N 개의 asyncio 연결을 열고 각각 PING(99) 핸드셰이크
+- cmd=1 오디오 스트림을 계속 소비하면서
+  총 처리량, 클라이언트별 지연(lag), 패킷 간격(jitter) 분위수,
+  끊김 수, CPU 사용량을 집계
+- --v2 면 PING_V2(100)로 협상하고 seq 점프(드롭)와 캡처→수신 지연 분위수도 집계
+- 결과는 JSON 으로 출력 (서버 변경 전후 비교용)
+
+사용법:
+  python load_client.py --clients 500 --duration 30 [--host 127.0.0.1] [--port 26070]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from audio_codec import CODEC_IDS, CODEC_PCM16, payload_samples
+
+REQUEST_AUDIO = 0x01
+REQUEST_CODEC = 0x02
+REQUEST_PING = 99
+REQUEST_PING_V2 = 100
+REQUEST_AUDIO_V2 = 0x11
+
+AUDIO_EXT_V2 = struct.Struct("<qqi")   # seq, capture_ns, sample_rate
+
+# 패킷 간격 히스토그램: 0.1 ms 단위, 최대 2초 (초과분은 마지막 bin)
+GAP_BIN_MS = 0.1
+GAP_BINS = 20001
+
+
+class ClientStats:
+    def __init__(self) -> None:
+        self.connected = False
+        self.disconnected = False
+        self.error: Optional[str] = None
+        self.packets = 0
+        self.bytes = 0
+        self.samples = 0   # 첫 패킷 이후 받은 오디오 샘플 수 (코덱과 무관하게 lag 계산)
+        self.first_t: Optional[float] = None
+        self.last_t: Optional[float] = None
+        self.max_lag = float("-inf")   # 부호 있는 값 (음수 = 실시간보다 앞섬)
+        # v2 전용
+        self.clock_offset_ns = 0
+        self.expected_seq: Optional[int] = None
+        self.seq_gaps = 0
+        self.lost = 0
+
+    def lag(self, sample_rate: float) -> float:
+        """첫 패킷 이후 경과 시간 - 그 뒤로 받은 오디오 길이 (초, 첫 패킷 수신 시각이 기준점)."""
+        if self.first_t is None or self.last_t is None:
+            return 0.0
+        return (self.last_t - self.first_t) - self.samples / sample_rate
+
+
+async def _client(
+    args,
+    stats: ClientStats,
+    gaps: np.ndarray,
+    latency: np.ndarray,
+    stop: asyncio.Event,
+) -> None:
+    writer = None
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        t_ping = time.monotonic_ns()
+        if args.v2:
+            writer.write(struct.pack("<iii", args.checkcode, REQUEST_PING_V2, 2))
+        else:
+            writer.write(struct.pack("<ii", args.checkcode, REQUEST_PING))
+        codec = CODEC_IDS[args.codec]
+        if codec != CODEC_PCM16:
+            writer.write(struct.pack("<iii", args.checkcode, REQUEST_CODEC, codec))
+        await writer.drain()
+
+        # 서버는 접속 즉시 오디오를 밀어주므로 ACK 와 오디오 프레임이 섞여 옴.
+        # ACK(<iiB) 는 cmd 로 구분해서 처리.
+        pending_acks = 1 if codec == CODEC_PCM16 else 2
+        sample_rate = args.sample_rate
+        while not stop.is_set():
+            check, cmd = struct.unpack("<ii", await reader.readexactly(8))
+            if check != args.checkcode:
+                raise RuntimeError(f"invalid checkcode: {check}")
+
+            if cmd in (REQUEST_PING, REQUEST_CODEC):
+                (status,) = await reader.readexactly(1)
+                if status != 0:
+                    raise RuntimeError(f"cmd={cmd} rejected (status={status})")
+                pending_acks -= 1
+                stats.connected = pending_acks == 0
+                continue
+
+            if cmd == REQUEST_PING_V2:
+                status, server_ns = struct.unpack("<Bq", await reader.readexactly(9))
+                if status != 0:
+                    raise RuntimeError(f"cmd={cmd} rejected (status={status})")
+                # 서버 monotonic ≈ 로컬 + offset (rtt 중간 시점 기준)
+                stats.clock_offset_ns = server_ns - (t_ping + time.monotonic_ns()) // 2
+                pending_acks -= 1
+                stats.connected = pending_acks == 0
+                continue
+
+            (size,) = struct.unpack("<i", await reader.readexactly(4))
+            payload = await reader.readexactly(size) if size > 0 else b""
+            if cmd not in (REQUEST_AUDIO, REQUEST_AUDIO_V2) or not stats.connected:
+                continue
+
+            if cmd == REQUEST_AUDIO_V2:
+                seq, capture_ns, _rate = AUDIO_EXT_V2.unpack_from(payload, 0)
+                ms = (time.monotonic_ns() + stats.clock_offset_ns - capture_ns) / 1e6
+                latency[min(max(0, int(ms / GAP_BIN_MS)), GAP_BINS - 1)] += 1
+                if stats.expected_seq is not None and seq > stats.expected_seq:
+                    stats.seq_gaps += 1
+                    stats.lost += seq - stats.expected_seq
+                stats.expected_seq = seq + 1
+                payload = payload[AUDIO_EXT_V2.size :]
+
+            now = time.monotonic()
+            stats.packets += 1
+            stats.bytes += len(payload)
+            if stats.last_t is None:
+                # 첫 패킷은 기준점 (경과 0): 그 오디오 길이까지 세면 lag 가 청크 1개만큼 작게 나옴
+                stats.first_t = stats.last_t = now
+                continue
+            b = int((now - stats.last_t) * 1000.0 / GAP_BIN_MS)
+            gaps[min(b, GAP_BINS - 1)] += 1
+            stats.last_t = now
+            stats.samples += payload_samples(codec, payload)
+            lag = stats.lag(sample_rate)
+            if lag > stats.max_lag:
+                stats.max_lag = lag
+    except asyncio.CancelledError:
+        pass
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+        stats.disconnected = True
+        stats.error = type(e).__name__
+    except Exception as e:
+        stats.disconnected = True
+        stats.error = f"{type(e).__name__}: {e}"
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _percentiles(hist: np.ndarray, qs) -> dict:
+    total = int(hist.sum())
+    if total == 0:
+        return {f"p{q:g}": None for q in qs}
+    cdf = np.cumsum(hist)
+    out = {}
+    for q in qs:
+        b = int(np.searchsorted(cdf, total * q / 100.0))
+        out[f"p{q:g}"] = round(b * GAP_BIN_MS, 2)
+    return out
+
+
+def _server_cpu_seconds(pid: Optional[int]) -> Optional[float]:
+    """(Linux) /proc 에서 서버 프로세스 CPU 시간 조회."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        return (int(fields[11]) + int(fields[12])) / ticks
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _raise_fd_limit(n: int) -> None:
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = min(hard, max(soft, n + 256))
+    if want > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+
+async def run_load(args) -> dict:
+    _raise_fd_limit(args.clients)
+    stop = asyncio.Event()
+    gaps = np.zeros(GAP_BINS, dtype=np.int64)
+    latency = np.zeros(GAP_BINS, dtype=np.int64)
+    stats: List[ClientStats] = [ClientStats() for _ in range(args.clients)]
+
+    cpu0 = time.process_time()
+    srv_cpu0 = _server_cpu_seconds(args.server_pid)
+    t0 = time.monotonic()
+
+    # 접속은 ramp 초에 걸쳐 고르게 (루프가 밀려도 총 ramp 시간은 유지)
+    tasks = []
+    for i, st in enumerate(stats):
+        tasks.append(asyncio.create_task(_client(args, st, gaps, latency, stop)))
+        delay = t0 + args.ramp * (i + 1) / args.clients - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    ramp_done = time.monotonic()
+
+    await asyncio.sleep(max(0.0, args.duration - (ramp_done - t0)))
+    stop.set()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    wall = time.monotonic() - t0
+    cpu = time.process_time() - cpu0
+    srv_cpu1 = _server_cpu_seconds(args.server_pid)
+
+    lags = np.array([s.max_lag for s in stats if s.connected and s.packets > 1] or [0.0])
+    total_bytes = sum(s.bytes for s in stats)
+    errors = {}
+    for s in stats:
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+
+    result = {
+        "clients": args.clients,
+        "connected": sum(s.connected for s in stats),
+        "disconnects": sum(s.disconnected for s in stats),
+        "errors": errors,
+        "duration_s": round(wall, 3),
+        "packets": sum(s.packets for s in stats),
+        "throughput_mbps": round(total_bytes * 8 / wall / 1e6, 3),
+        "bytes_total": total_bytes,
+        "gap_ms": _percentiles(gaps, (50, 90, 99, 99.9, 100)),
+        "max_lag_ms": {
+            "p50": round(float(np.percentile(lags, 50)) * 1000, 2),
+            "p99": round(float(np.percentile(lags, 99)) * 1000, 2),
+            "max": round(float(lags.max()) * 1000, 2),
+        },
+        "cpu": {
+            "client_percent": round(cpu / wall * 100, 1),
+            "server_percent": (
+                round((srv_cpu1 - srv_cpu0) / wall * 100, 1)
+                if srv_cpu0 is not None and srv_cpu1 is not None
+                else None
+            ),
+        },
+    }
+    if args.v2:
+        result["v2"] = {
+            "seq_gaps": sum(s.seq_gaps for s in stats),
+            "lost_chunks": sum(s.lost for s in stats),
+            "capture_latency_ms": _percentiles(latency, (50, 90, 99, 99.9, 100)),
+        }
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="NetAudioServer load generator")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=26070)
+    ap.add_argument("--checkcode", type=int, default=20250918)
+    ap.add_argument("--clients", type=int, default=100)
+    ap.add_argument("--duration", type=float, default=10.0, help="측정 시간(초)")
+    ap.add_argument("--ramp", type=float, default=1.0, help="전체 접속에 걸리는 시간(초)")
+    ap.add_argument("--codec", default="pcm16", choices=sorted(CODEC_IDS))
+    ap.add_argument(
+        "--sample-rate",
+        type=float,
+        default=16000,
+        help="lag 계산용 스트림 샘플레이트 (기본 16 kHz 모노, 코덱과 무관)",
+    )
+    ap.add_argument(
+        "--v2", action="store_true", help="v2 프레임으로 협상 (드롭 / 캡처 지연 측정)"
+    )
+    ap.add_argument("--server-pid", type=int, default=None, help="(Linux) 서버 CPU 측정")
+    ap.add_argument("--out", default=None, help="JSON 저장 경로 (기본 stdout)")
+    args = ap.parse_args()
+
+    result = asyncio.run(run_load(args))
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,21 +11,28 @@
 #########################################################
 
 from dotenv import load_dotenv
+import multiprocessing
 import os
 
 import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-from audio_module import AudioCapture
+from audio_module import AudioCapture, DEFAULT_SAMPLE_RATE, DEFAULT_HANGOVER_SEC, SilenceGate, capture_slot_bytes
+from audio_format import FormatHub
 from utils import list_loopback_mics, dbfs_from_chunk  # ✅ 올바른 위치
 from net_server import NetAudioServer
+from mp_server import ShardedAudioServer
+from metrics import DEFAULT_METRICS_PORT, MetricsHttpServer, PipelineMetrics
+from ring_buffer import DEFAULT_SLOT_BYTES, PcmRing
+from archive import DEFAULT_SEGMENT_SECONDS, ArchiveTap
+from multi_capture import MultiCapture
+from udp_transport import DEFAULT_UDP_PORT, MulticastSender
 
 from etc import resource_path, get_base_dir
 
 class App(tk.Tk):
     DBFS_FLOOR = -60.0
-    RMS_SMOOTH = 0.2
     __VERSION__ = "0.1.2"
 
     def __init__(self):
@@ -41,6 +48,27 @@ class App(tk.Tk):
         self.default_host = os.getenv("HOST", "0.0.0.0")
         self.default_port = os.getenv("PORT", "26070")
         self.default_checkcode = os.getenv("CHECKCODE", "20250918")
+        # Prometheus /metrics 포트 (0 이면 비활성, 127.0.0.1 에서만 listen)
+        self.metrics_port = int(os.getenv("METRICS_PORT", str(DEFAULT_METRICS_PORT)))
+        # UDP 멀티캐스트 송출 ("group:port", 비우면 TCP 만)
+        self.multicast = os.getenv("MULTICAST", "").strip()
+        # 송신 워커 프로세스 수 (0 이면 단일 프로세스, SO_REUSEPORT 필요)
+        self.workers = int(os.getenv("WORKERS", "0"))
+        # 무음 게이트 (dBFS, 비우면 끔) / 닫기 전 유지 시간(초)
+        self.silence_db = os.getenv("SILENCE_DB", "").strip()
+        self.silence_hangover = float(os.getenv("SILENCE_HANGOVER", str(DEFAULT_HANGOVER_SEC)))
+        # replay 용 기본 스트림 보관 시간(초, 0 = 끔)
+        self.history_seconds = float(os.getenv("HISTORY_SECONDS", "0"))
+        # 서버 내장 아카이브 (비우면 끔)
+        self.archive_dir = os.getenv("ARCHIVE_DIR", "").strip()
+        self.archive_segment = float(
+            os.getenv("ARCHIVE_SEGMENT_SECONDS", str(DEFAULT_SEGMENT_SECONDS))
+        )
+        # 청크 크기 프로파일 (low / normal / bulk, 비우면 기존 1024 프레임) / 자동 조정
+        self.latency_profile = os.getenv("LATENCY_PROFILE", "").strip() or None
+        self.adaptive_chunk = os.getenv("ADAPTIVE_CHUNK", "0").strip() not in ("", "0")
+        # 여러 장치 동시 캡처 ("이름=장치;장치2", 이름 일부 일치). 주면 콤보박스 대신 믹스 + 장치별 스트림
+        self.devices = [d.strip() for d in os.getenv("DEVICES", "").split(";") if d.strip()]
         
         
         self.title(f"Loopback Audio Server v{self.__VERSION__} LE")
@@ -48,12 +76,15 @@ class App(tk.Tk):
         # 큐: UI 갱신용
         self.ui_q = queue.Queue(maxsize=200)
 
-        # 오디오 데이터 전송용 큐
-        self.send_q = queue.Queue(maxsize=200)
+        # 오디오 데이터 전송용 링버퍼 (캡처 1 → 소비자 N, 시퀀스 번호 부여)
+        self.send_q = PcmRing(slots=256)
 
         self.mics = []
         self.audio_capture = None
         self.server = None
+        self.metrics_http = None
+        self.sharded = None
+        self.archive = None
 
         self.current_dbfs = self.DBFS_FLOOR
 
@@ -98,9 +129,6 @@ class App(tk.Tk):
     def _log(self, tag: str, payload=None):
         self._post_ui(("server_event", tag, payload))
 
-    def _on_audio_level(self, db: float):
-        self._post_ui(("level", db))
-
     def _on_audio_error(self, e: Exception):
         self._post_ui(("error", f"[AUDIO] {e}"))
 
@@ -190,17 +218,45 @@ class App(tk.Tk):
             self.cmb_devices.current(0)
             self._log(f"Loopback 장치 {len(self.mics)}개 발견")
 
+    def _pick_devices(self):
+        """DEVICES → (스트림 이름, 장치) 리스트. 이름이 없으면 src0, src1, ..."""
+        sources = []
+        for i, spec in enumerate(self.devices):
+            name, sep, part = spec.partition("=")
+            if not sep:
+                name, part = f"src{i}", spec
+            mic = next((m for m in self.mics if part.lower() in m.name.lower()), None)
+            if mic is None:
+                raise ValueError(f"장치를 찾을 수 없습니다: {part}")
+            name = name.strip()
+            if any(name == n for n, _ in sources):
+                raise ValueError(f"스트림 이름이 중복됩니다: {name}")
+            sources.append((name, mic))
+        return sources
+
     # ---------- UI 이벤트 ----------
     def _start(self):
         if not self.mics:
             messagebox.showerror("장치", "Loopback 장치를 찾을 수 없습니다.")
             return
 
-        idx = self.cmb_devices.current()
-        if idx < 0 or idx >= len(self.mics):
-            messagebox.showerror("장치", "Loopback 장치를 선택하세요.")
-            return
-        mic = self.mics[idx]
+        sources = None
+        if self.devices:
+            try:
+                sources = self._pick_devices()
+            except ValueError as e:
+                messagebox.showerror("장치", str(e))
+                return
+            if self.workers > 0:
+                messagebox.showerror("장치", "DEVICES 는 WORKERS 와 같이 쓸 수 없습니다.")
+                return
+            mic = sources[0][1]
+        else:
+            idx = self.cmb_devices.current()
+            if idx < 0 or idx >= len(self.mics):
+                messagebox.showerror("장치", "Loopback 장치를 선택하세요.")
+                return
+            mic = self.mics[idx]
 
         host = self.ent_host.get().strip()
         try:
@@ -210,29 +266,136 @@ class App(tk.Tk):
             messagebox.showerror("설정", "Port/Checkcode 는 정수여야 합니다.")
             return
 
+        # 캡처 / 서버 공용 지표
+        metrics = PipelineMetrics()
+        silence_gate = (
+            SilenceGate(float(self.silence_db), self.silence_hangover)
+            if self.silence_db
+            else None
+        )
+
+        multicast = None
+        if self.multicast:
+            group, _, mc_port = self.multicast.partition(":")
+            multicast = MulticastSender(
+                checkcode, group, int(mc_port or DEFAULT_UDP_PORT)
+            )
+
+        if self.workers > 0:
+            # 워커 프로세스 N 개가 공유 메모리 링을 읽어 송신 (포맷 구독은 미지원)
+            try:
+                self.sharded = ShardedAudioServer(
+                    checkcode,
+                    host,
+                    port,
+                    workers=self.workers,
+                    status_cb=self._log,
+                    metrics=metrics,
+                    multicast=multicast,
+                    history_seconds=self.history_seconds,
+                    # 공유 링 슬롯은 고정 크기 → 프로파일 / adaptive 최대 청크가 들어가도록
+                    slot_bytes=max(
+                        DEFAULT_SLOT_BYTES,
+                        capture_slot_bytes(
+                            latency_profile=self.latency_profile, adaptive=self.adaptive_chunk
+                        ),
+                    ),
+                )
+            except RuntimeError as e:
+                messagebox.showerror("서버", str(e))
+                return
+            self.server = self.sharded
+            send_q = self.sharded.ring
+            format_hub = None
+        elif sources:
+            # 기본 스트림 = 믹스, 장치별 링은 이름 붙은 스트림 (포맷 구독은 단일 장치에서만)
+            multi = MultiCapture(
+                sources,
+                error_callback=self._on_audio_error,
+                metrics=metrics,
+                silence_gate=silence_gate,
+                latency_profile=self.latency_profile,
+                adaptive=self.adaptive_chunk,
+            )
+            send_q = multi.ring
+            format_hub = None
+            self.server = NetAudioServer(
+                send_queue=send_q,
+                checkcode=checkcode,
+                host=host,
+                port=port,
+                status_cb=self._log,
+                metrics=metrics,
+                multicast=multicast,
+                history_seconds=self.history_seconds,
+                streams=multi.streams,
+            )
+        else:
+            send_q = self.send_q
+            # 구독별 출력 포맷 (클라가 요청한 포맷만 청크당 1회 변환)
+            format_hub = FormatHub(DEFAULT_SAMPLE_RATE)
+            self.server = NetAudioServer(
+                send_queue=send_q,
+                checkcode=checkcode,
+                host=host,
+                port=port,
+                status_cb=self._log,
+                format_hub=format_hub,
+                metrics=metrics,
+                multicast=multicast,
+                history_seconds=self.history_seconds,
+            )
+
         # 오디오 캡처 시작
-        self.audio_capture = AudioCapture(
-            level_callback=self._on_audio_level,
+        self.audio_capture = multi if sources else AudioCapture(
             error_callback=self._on_audio_error,
+            format_hub=format_hub,
+            metrics=metrics,
+            silence_gate=silence_gate,
+            latency_profile=self.latency_profile,
+            adaptive=self.adaptive_chunk,
         )
-        self.audio_capture.start(mic, self.send_q)
-        self._log(f"[AUDIO] capture started on '{mic.name}'")
+        if self.archive_dir:
+            # 캡처보다 먼저 커서를 잡아서 첫 청크부터 기록
+            self.archive = ArchiveTap(
+                send_q,
+                self.archive_dir,
+                segment_seconds=self.archive_segment,
+                status_cb=self._log,
+                metrics=metrics,
+            )
+            self.archive.start()
+        if sources:
+            self.audio_capture.start()
+            names = ", ".join(f"{name}='{m.name}'" for name, m in sources)
+            self._log(f"[AUDIO] mixing {len(sources)} devices: {names}")
+        else:
+            self.audio_capture.start(mic, send_q)
+            self._log(f"[AUDIO] capture started on '{mic.name}'")
 
         # 서버 시작
-        self.server = NetAudioServer(
-            send_queue=self.send_q,
-            checkcode=checkcode,
-            host=host,
-            port=port,
-            status_cb=self._log,
-        )
         self.server.start()
         self._log(f"[SERVER] start listen on {host}:{port}, checkcode={checkcode}")
 
+        if self.metrics_port:
+            try:
+                self.metrics_http = MetricsHttpServer(
+                    metrics.registry, port=self.metrics_port
+                )
+                self.metrics_http.start()
+                self._log(f"[METRICS] http://127.0.0.1:{self.metrics_port}/metrics")
+            except OSError as e:
+                self.metrics_http = None
+                self._log(f"[METRICS] disabled: {e}")
+
         self.btn_start.config(state="disabled")
         self.btn_stop.config(state="normal")
 
     def _stop(self):
+        if self.metrics_http:
+            self.metrics_http.stop()
+            self.metrics_http = None
+
         if self.server:
             self.server.stop()
             self.server = None
@@ -243,6 +406,15 @@ class App(tk.Tk):
             self.audio_capture = None
             self._log("[AUDIO] capture stopped")
 
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+
+        if self.sharded:
+            # 캡처가 멈춘 뒤에 공유 메모리 해제
+            self.sharded.close()
+            self.sharded = None
+
         self.btn_start.config(state="normal")
         self.btn_stop.config(state="disabled")
 
@@ -252,8 +424,6 @@ class App(tk.Tk):
 
     # ---------- UI 틱 ----------
     def _ui_tick(self):
-        got_level = False
-
         while True:
             try:
                 item = self.ui_q.get_nowait()
@@ -271,13 +441,6 @@ class App(tk.Tk):
                     self.statusbar.config(text=msg)
                 print(msg)
 
-            elif tag == "level":
-                _, db = item
-                self.current_dbfs = (
-                    self.RMS_SMOOTH * self.current_dbfs
-                    + (1.0 - self.RMS_SMOOTH) * db
-                )
-                got_level = True
             elif tag == "server_event":
                 _, ev_tag, payload = item
                 if ev_tag == "status":
@@ -298,15 +461,20 @@ class App(tk.Tk):
                 self._stop()
                 break
 
-        if got_level and self.pbar and self.lbl_db:
+        # 레벨은 큐를 거치지 않고 틱마다 미터 슬롯을 직접 읽음 (스무딩은 미터가 처리)
+        if self.audio_capture and self.pbar and self.lbl_db:
+            level = self.audio_capture.meter.read()
+            self.current_dbfs = level.rms_db
             pct = self._dbfs_to_percent(self.current_dbfs)
             self.pbar["value"] = pct
             self.lbl_db.config(
-                text=f"RMS: {self.current_dbfs:6.1f} dBFS ({pct:3d}%)"
+                text=f"RMS: {self.current_dbfs:6.1f} dBFS ({pct:3d}%)  Peak: {level.peak_db:6.1f}"
             )
 
         self.after(33, self._ui_tick)
 
 
 if __name__ == "__main__":
+    # PyInstaller 실행 파일에서 워커 프로세스(spawn) 지원
+    multiprocessing.freeze_support()
     App().mainloop()
\ No newline at end of file
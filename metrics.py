@@ -0,0 +1,341 @@
+# metrics.py
+"""
+캡처 / 브로드캐스트 파이프라인 실시간 지표.
+
+- Counter / Gauge / Histogram : 외부 의존성 없는 최소 구현.
+  각 지표는 한 스레드에서만 갱신 (캡처 스레드 또는 서버 루프) → 락 없음.
+- Registry.render()   : Prometheus text format (0.0.4)
+- Registry.snapshot() : JSON 직렬화용 dict (TCP stats 커맨드)
+- MetricsHttpServer   : 로컬 HTTP 엔드포인트 (/metrics, /stats)
+
+    metrics = PipelineMetrics()
+    AudioCapture(metrics=metrics); NetAudioServer(..., metrics=metrics)
+    MetricsHttpServer(metrics.registry, port=9108).start()
+"""
+
+import bisect
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_METRICS_PORT = 9108
+
+# 청크 처리 시간용 (초). 1024 프레임 @48k = 21 ms 가 실시간 한계
+CONVERT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.021)
+# drain 대기 시간용 (초)
+DRAIN_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# (labels, value)
+Sample = Tuple[Dict[str, str], float]
+
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        yield self.name, {}, self.value
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """값을 직접 set 하거나, fn 을 주면 수집 시점에 호출."""
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help: str, fn: Optional[Callable[[], float]] = None
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        self.fn = fn
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def get(self) -> float:
+        if self.fn is not None:
+            try:
+                return self.fn()
+            except Exception:
+                return float("nan")
+        return self.value
+
+    def samples(self):
+        yield self.name, {}, self.get()
+
+    def snapshot(self):
+        return self.get()
+
+
+class LabeledGauge:
+    """라벨별 값 목록을 fn 이 수집 시점에 반환 (예: 클라이언트별 송신 바이트)."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], List[Sample]],
+        kind: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        try:
+            items = self.fn()
+        except Exception:
+            items = []
+        for labels, v in items:
+            yield self.name, labels, v
+
+    def snapshot(self):
+        return [dict(labels, value=v) for _, labels, v in self.samples()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...]) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # 마지막 칸은 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def samples(self):
+        acc = 0
+        counts = list(self.counts)
+        for edge, n in zip(self.buckets + (float("inf"),), counts):
+            acc += n
+            yield self.name + "_bucket", {"le": _fmt_value(edge)}, acc
+        yield self.name + "_sum", {}, self.sum
+        yield self.name + "_count", {}, self.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """버킷 상한 기준 근사 분위수 (+Inf 칸이면 None)."""
+        total = self.count
+        if total == 0:
+            return None
+        want = total * q
+        acc = 0
+        for i, n in enumerate(self.counts):
+            acc += n
+            if acc >= want:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, labels, v in m.samples():
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(v)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.snapshot() for m in metrics}
+
+
+class PipelineMetrics:
+    """
+    캡처 → 서버 파이프라인 지표 묶음.
+    - 캡처 스레드   : chunks, convert_seconds, send_drops, chunks_per_second, silent_chunks
+    - 서버 루프     : bytes_sent, drain_seconds, 수집 시점 gauge (큐 깊이, 밀린 클라 등)
+    """
+
+    def __init__(self, registry: Optional[Registry] = None) -> None:
+        self.registry = registry or Registry()
+        r = self.registry
+        self.started = time.monotonic()
+
+        self.chunks = r.register(
+            Counter("audiomi_capture_chunks_total", "captured chunks")
+        )
+        self.chunks_per_second = r.register(
+            Gauge("audiomi_capture_chunks_per_second", "capture rate (1s window)")
+        )
+        self.convert_seconds = r.register(
+            Histogram(
+                "audiomi_convert_seconds",
+                "encode + format conversion time per chunk",
+                CONVERT_BUCKETS,
+            )
+        )
+        self.send_drops = r.register(
+            Counter(
+                "audiomi_send_queue_drops_total",
+                "chunks dropped between capture and broadcast (queue full / ring overrun)",
+            )
+        )
+        self.silent_chunks = r.register(
+            Counter("audiomi_silent_chunks_total", "chunks gated as silence (FLAG_SILENT)")
+        )
+        self.bytes_sent = r.register(
+            Counter("audiomi_bytes_sent_total", "bytes written to all clients")
+        )
+        self.drain_seconds = r.register(
+            Histogram(
+                "audiomi_drain_seconds", "writer.drain() wait per write", DRAIN_BUCKETS
+            )
+        )
+        r.register(
+            Gauge(
+                "audiomi_uptime_seconds",
+                "seconds since metrics start",
+                lambda: round(time.monotonic() - self.started, 3),
+            )
+        )
+
+        self._rate_t = time.monotonic()
+        self._rate_n = 0
+
+    def observe_chunk(self, seconds: float) -> None:
+        """(캡처 스레드) 청크 1개 처리 완료."""
+        self.chunks.inc()
+        self.convert_seconds.observe(seconds)
+        now = time.monotonic()
+        if now - self._rate_t >= 1.0:
+            n = self.chunks.value
+            self.chunks_per_second.set(round((n - self._rate_n) / (now - self._rate_t), 2))
+            self._rate_t = now
+            self._rate_n = n
+
+    def snapshot_json(self) -> bytes:
+        return json.dumps(self.registry.snapshot()).encode("utf-8")
+
+
+def _make_handler(registry: Registry):
+    # http.server 는 email / http.client 까지 끌고 와서 무거우므로 엔드포인트를 열 때만 로드
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = registry.render().encode("utf-8")
+                ctype = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/stats":
+                body = json.dumps(registry.snapshot()).encode("utf-8")
+                ctype = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class MetricsHttpServer:
+    """/metrics (Prometheus) 와 /stats (JSON) 를 내보내는 HTTP 서버 스레드."""
+
+    def __init__(
+        self,
+        registry: Registry,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_METRICS_PORT,
+    ) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._httpd is not None:
+            return
+        from http.server import ThreadingHTTPServer
+
+        self._httpd = ThreadingHTTPServer(
+            (self.host, self.port), _make_handler(self.registry)
+        )
+        self._httpd.daemon_threads = True
+        # port=0 이면 OS 가 고른 포트
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
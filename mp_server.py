@@ -0,0 +1,338 @@
+# mp_server.py
+"""
+멀티 프로세스 샤딩 서버.
+
+NetAudioServer 는 asyncio 루프 1개(코어 1개)에서 모든 클라이언트 소켓에 쓰므로,
+청취자가 아주 많으면 한 코어의 write 처리량이 한계가 된다.
+
+ShardedAudioServer:
+- 캡처 프로세스(현재 프로세스)가 SharedPcmRing (shared_memory) 에 PCM16 청크를 기록.
+- N 개 워커 프로세스가 각자 NetAudioServer 를 SO_REUSEPORT 로 같은 포트에 열고,
+  커널이 접속을 워커들에 분산. 워커는 공유 링을 커서로 읽어 자기 클라이언트에만 전송.
+- 워커별 지표는 공유 메모리 WorkerStatsTable 에 주기적으로 기록 →
+  부모 / 모든 워커가 합산값(audiomi_cluster_*)을 볼 수 있음 (HTTP /metrics, TCP stats).
+- 워커 로그(status_cb)는 multiprocessing.Queue 로 부모에 모아서 전달.
+
+제약: SO_REUSEPORT 가 있는 플랫폼(Linux / BSD / macOS)만. 포맷 구독(format_hub)은 미지원,
+multicast 는 워커 0 만 송출. history_seconds(replay) 는 워커마다 따로 보관 (메모리 x 워커 수).
+
+    server = ShardedAudioServer(checkcode, "0.0.0.0", 26070, workers=4)
+    server.start()
+    capture.start(mic, server.ring)
+    ...
+    server.stop(); capture.stop(); server.close()
+"""
+
+import multiprocessing as mp
+import queue
+import signal
+import socket
+import threading
+import time
+from contextlib import suppress
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from metrics import Gauge, LabeledGauge, PipelineMetrics, Registry
+from net_server import NetAudioServer
+from ring_buffer import DEFAULT_SLOT_BYTES, DEFAULT_SLOTS, SharedPcmRing, _attach_shm
+
+STAT_FIELDS = (
+    "pid",
+    "clients",
+    "clients_behind",
+    "bytes_sent",
+    "send_drops",
+    "drain_count",
+    "drain_seconds",
+    "send_queue_depth",
+)
+_F = {name: i for i, name in enumerate(STAT_FIELDS)}
+
+PUBLISH_INTERVAL = 0.5   # 워커 → 공유 지표 테이블 갱신 주기(초)
+STOP_POLL = 0.1          # 워커가 정지 플래그를 확인하는 주기(초)
+
+
+class WorkerStatsTable:
+    """워커별 지표 한 줄씩 (float64[workers, fields]) 을 공유 메모리에 보관."""
+
+    def __init__(self, workers: int = 1, name: Optional[str] = None) -> None:
+        shape = (workers, len(STAT_FIELDS))
+        if name is None:
+            self.owner = True
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=int(np.prod(shape)) * 8
+            )
+        else:
+            self.owner = False
+            self._shm = _attach_shm(name)
+            shape = (self._shm.size // (8 * len(STAT_FIELDS)), len(STAT_FIELDS))
+        self.rows = np.ndarray(shape, dtype=np.float64, buffer=self._shm.buf)
+        if self.owner:
+            self.rows[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def workers(self) -> int:
+        return self.rows.shape[0]
+
+    def publish(self, index: int, metrics: PipelineMetrics) -> None:
+        """(워커) 자기 NetAudioServer 지표를 index 줄에 기록."""
+        r = metrics.registry
+        row = self.rows[index]
+        row[_F["pid"]] = mp.current_process().pid or 0
+        row[_F["clients"]] = r.get("audiomi_clients").get()
+        row[_F["clients_behind"]] = r.get("audiomi_clients_behind").get()
+        row[_F["bytes_sent"]] = metrics.bytes_sent.value
+        row[_F["send_drops"]] = metrics.send_drops.value
+        row[_F["drain_count"]] = metrics.drain_seconds.count
+        row[_F["drain_seconds"]] = metrics.drain_seconds.sum
+        row[_F["send_queue_depth"]] = r.get("audiomi_send_queue_depth").get()
+
+    def clear(self, index: int) -> None:
+        self.rows[index] = 0
+
+    def total(self, field: str) -> float:
+        return float(self.rows[:, _F[field]].sum())
+
+    def column(self, field: str) -> List[float]:
+        return self.rows[:, _F[field]].tolist()
+
+    def close(self) -> None:
+        shm, self._shm = self._shm, None
+        if shm is None:
+            return
+        self.rows = None
+        with suppress(BufferError):
+            shm.close()
+        if self.owner:
+            with suppress(FileNotFoundError):
+                shm.unlink()
+
+
+def register_cluster_metrics(registry: Registry, table: WorkerStatsTable) -> None:
+    """전체 워커 합산 지표 등록 (부모 / 워커 공통)."""
+    for field, help in (
+        ("clients", "connected clients (all workers)"),
+        ("clients_behind", "clients behind (all workers)"),
+        ("bytes_sent", "bytes sent (all workers)"),
+        ("send_drops", "ring overruns (all workers)"),
+        ("drain_count", "writer.drain() calls (all workers)"),
+        ("drain_seconds", "total writer.drain() wait seconds (all workers)"),
+        ("send_queue_depth", "ring chunks not yet fanned out (sum over workers)"),
+    ):
+        registry.register(
+            Gauge(f"audiomi_cluster_{field}", help, lambda f=field: table.total(f))
+        )
+    registry.register(
+        Gauge(
+            "audiomi_cluster_drain_seconds_avg",
+            "mean writer.drain() wait (all workers)",
+            lambda: table.total("drain_seconds") / max(1.0, table.total("drain_count")),
+        )
+    )
+    registry.register(
+        Gauge(
+            "audiomi_cluster_send_queue_depth_max",
+            "ring chunks not yet fanned out (most behind worker)",
+            lambda: max(table.column("send_queue_depth"), default=0.0),
+        )
+    )
+    registry.register(
+        LabeledGauge(
+            "audiomi_worker_clients",
+            "connected clients per worker",
+            lambda: [
+                ({"worker": str(i), "pid": str(int(pid))}, n)
+                for i, (pid, n) in enumerate(
+                    zip(table.column("pid"), table.column("clients"))
+                )
+            ],
+        )
+    )
+
+
+def _worker_main(
+    index: int,
+    ring_name: str,
+    stats_name: str,
+    log_q,
+    stop_flag,
+    server_kwargs: dict,
+) -> None:
+    """워커 프로세스 진입점 (spawn)."""
+    # Ctrl+C 는 부모가 받아서 정지 플래그로 알림. SIGTERM (systemd / docker / timeout 이
+    # 프로세스 그룹 전체에 보냄) 은 로컬 플래그만 세우고 아래 finally 로 정상 정리
+    terminated = []
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.append(signum))
+
+    ring = SharedPcmRing.attach(ring_name)
+    table = WorkerStatsTable(name=stats_name)
+
+    def status_cb(tag: str, payload=None) -> None:
+        if tag == "client_count":
+            # 클라이언트 수는 부모가 테이블 합계로 보고
+            return
+        with suppress(Exception):
+            log_q.put_nowait((index, tag, payload))
+
+    metrics = PipelineMetrics()
+    register_cluster_metrics(metrics.registry, table)
+    server = NetAudioServer(
+        ring, status_cb=status_cb, metrics=metrics, reuse_port=True, **server_kwargs
+    )
+    server.start()
+    try:
+        next_publish = 0.0
+        while not stop_flag.value and not terminated:
+            now = time.monotonic()
+            if now >= next_publish:
+                table.publish(index, metrics)
+                next_publish = now + PUBLISH_INTERVAL
+            time.sleep(STOP_POLL)
+    finally:
+        server.stop()
+        table.clear(index)
+        table.close()
+        ring.close()
+
+
+class ShardedAudioServer:
+    """
+    NetAudioServer N 개를 워커 프로세스로 띄우는 서버.
+    start / stop 은 NetAudioServer 와 같고, 캡처는 self.ring 에 기록.
+    공유 메모리는 캡처까지 멈춘 뒤 close() 로 해제.
+    """
+
+    def __init__(
+        self,
+        checkcode: int,
+        host: str = "0.0.0.0",
+        port: int = 26070,
+        workers: int = 2,
+        status_cb: Optional[Callable[[str, object], None]] = None,
+        metrics: Optional[PipelineMetrics] = None,
+        slots: int = DEFAULT_SLOTS,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        **server_kwargs,
+    ) -> None:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+        if server_kwargs.get("format_hub") is not None:
+            raise ValueError("format_hub is not supported with worker processes")
+        self.checkcode = checkcode
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.status_cb = status_cb or (lambda tag, payload=None: None)
+        self.server_kwargs = server_kwargs
+
+        self.ring = SharedPcmRing(slots, slot_bytes)
+        self._table = WorkerStatsTable(self.workers)
+        self.metrics = metrics or PipelineMetrics()
+        register_cluster_metrics(self.metrics.registry, self._table)
+
+        self._ctx = mp.get_context("spawn")
+        self._procs: List[Optional[mp.Process]] = [None] * self.workers
+        self._log_q = None
+        # 정지 플래그: 락 없는 공유 메모리 byte. mp.Event 는 대기 중 죽은 워커가
+        # 내부 Condition 을 망가뜨려 set() 이 영원히 막힐 수 있어서 쓰지 않음
+        self._stop_flag = None
+        self._relay: Optional[threading.Thread] = None
+        self._running = False
+
+    def _log(self, tag: str, payload=None) -> None:
+        self.status_cb(tag, payload)
+
+    def _spawn(self, index: int) -> None:
+        kwargs = dict(self.server_kwargs, checkcode=self.checkcode, host=self.host, port=self.port)
+        if index != 0:
+            # 멀티캐스트는 워커 0 만 (중복 송출 방지)
+            kwargs.pop("multicast", None)
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.ring.name, self._table.name, self._log_q, self._stop_flag, kwargs),
+            name=f"audiomi-worker-{index}",
+            daemon=True,
+        )
+        proc.start()
+        self._procs[index] = proc
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._log_q = self._ctx.Queue(1000)
+        self._stop_flag = self._ctx.RawValue("b", 0)
+        for i in range(self.workers):
+            self._spawn(i)
+        self._log(f"[SERVER] {self.workers} workers on {self.host}:{self.port} (SO_REUSEPORT)")
+        self._relay = threading.Thread(target=self._relay_loop, daemon=True)
+        self._relay.start()
+
+    def _relay_loop(self) -> None:
+        """워커 로그 전달 + 클라이언트 수 합산 보고 + 죽은 워커 재시작."""
+        last_clients = -1
+        last_check = time.monotonic()
+        while self._running:
+            try:
+                index, tag, payload = self._log_q.get(timeout=0.2)
+                if tag == "status" and isinstance(payload, str):
+                    payload = f"[W{index}] {payload}"
+                self._log(tag, payload)
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+
+            clients = int(self._table.total("clients"))
+            if clients != last_clients:
+                last_clients = clients
+                self._log("client_count", clients)
+
+            now = time.monotonic()
+            if now - last_check >= 1.0:
+                last_check = now
+                for i, proc in enumerate(self._procs):
+                    if self._running and proc is not None and not proc.is_alive():
+                        self._log("status", f"[SERVER] worker {i} exited ({proc.exitcode}), restarting")
+                        self._table.clear(i)
+                        self._spawn(i)
+
+    def stop(self) -> None:
+        """워커 종료. 공유 링은 캡처가 아직 쓸 수 있으므로 close() 전까지 유지."""
+        if not self._running:
+            return
+        self._running = False
+        self._stop_flag.value = 1
+        # relay 가 도중에 워커를 재시작하지 않도록 먼저 끝냄
+        if self._relay is not None:
+            self._relay.join(timeout=1.0)
+            self._relay = None
+        for proc in self._procs:
+            if proc is None:
+                continue
+            proc.join(timeout=3.0)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=1.0)
+            if proc.is_alive():
+                proc.kill()
+                proc.join(timeout=1.0)
+        self._procs = [None] * self.workers
+        with suppress(Exception):
+            self._log_q.close()
+        self._log("client_count", 0)
+        self._log("[SERVER] stopped")
+
+    def close(self) -> None:
+        """공유 메모리 해제 (stop + 캡처 정지 이후)."""
+        self.stop()
+        self.ring.close()
+        self._table.close()
@@ -0,0 +1,424 @@
+# multi_capture.py
+"""
+여러 장치 동시 캡처 + 샘플 정렬 믹스.
+
+- 장치마다 AudioCapture 1개 (캡처 스레드 1개) → 장치별 PcmRing (PCM16 모노, target_sr).
+  이 링들이 그대로 소스별 스트림 (NetAudioServer(streams=...) 로 이름을 붙여 제공).
+- StreamMixer 스레드가 장치 링을 각자 커서로 읽어 소스별 FIFO 에 모으고,
+  캡처 시각(stamp) 기준으로 block_frames 씩 잘라 (소스 수, block) 행렬 → gains 내적 1번으로 믹스.
+- 장치 시계 차이:
+  · 처음 / 끊겼다 이어질 때는 캡처 시각에 맞춰 정렬 (늦게 시작한 소스는 앞을 0 으로)
+  · 청크 캡처 시각 ↔ 누적 샘플 수를 DRIFT_WINDOW 동안 선형 회귀 → 소스 rate 비율 추정.
+    믹스는 그 비율로 소수 위치를 읽어 선형 보간 (리샘플링) 하므로 샘플을 버리거나 끼우지 않음
+  · 회귀선과 읽기 위치의 위상 오차가 DRIFT_TOLERANCE (캡처 시각 흔들림보다 충분히 큼) 를 넘으면
+    재생 속도를 최대 DRIFT_MAX_SLEW 만큼 바꿔 DRIFT_SLEW 초에 걸쳐 흡수 (drift_fixes 로 집계)
+  · 어떤 소스가 MAX_WAIT 넘게 늦으면 기다리지 않고 그 부분은 0 으로 믹스 (late_frames)
+- 믹스 결과는 self.ring (기본 스트림). 모든 소스가 무음 게이트에 걸려 있으면 FLAG_SILENT.
+
+    multi = MultiCapture([("desk", mic0), ("room", mic1)], metrics=metrics)
+    server = NetAudioServer(multi.ring, checkcode, streams=multi.streams)
+    multi.start()
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from audio_module import DEFAULT_TARGET_SR, AudioCapture, SilenceGate
+from level_meter import LevelMeter
+from metrics import Gauge, LabeledGauge, PipelineMetrics
+from ring_buffer import FLAG_SILENT, PcmRing
+
+DEFAULT_MIX_BLOCK = 320        # 20 ms @ 16 kHz
+DEFAULT_SLOTS = 256
+FIFO_SECONDS = 2.0             # 소스별 FIFO 용량
+MAX_WAIT = 0.06                # 늦은 소스를 기다리는 최대 시간(초)
+STALE_SECONDS = 0.5            # 이만큼 청크가 없으면 소스를 쉬는 것으로 보고 기다리지 않음
+DRIFT_WINDOW = 5.0             # rate 비율 회귀 창 (초)
+DRIFT_MIN_SPAN = 2.0           # 창이 이만큼 차기 전에는 명목 rate 로 보고 위상만 맞춤 (초)
+DRIFT_MAX_RATIO = 0.01         # 추정 rate 비율 한계 (±1%, 넘으면 측정 이상으로 보고 자름)
+DRIFT_TOLERANCE = 0.008        # 위상 오차가 이보다 크면 보정 시작 (초)
+DRIFT_SLEW = 2.0               # 위상 오차를 흡수하는 시간 상수 (초)
+DRIFT_MAX_SLEW = 0.005         # 보정 중 재생 속도 변화 한계 (±0.5%)
+RESYNC_SECONDS = 0.2           # 오차가 이보다 크면 (장치 끊김 등) 바로 캡처 시각으로 재정렬
+
+
+class _SourceFifo:
+    """
+    소스 1개: 링 커서 + int16 FIFO + 회귀선 (누적 샘플 번호 → 캡처 시각) + 소수 읽기 위치.
+    샘플 번호는 소스가 낸 샘플의 누적 인덱스 (buf[start] = base, buf[end] = total).
+    """
+
+    def __init__(self, name: str, ring: PcmRing, sample_rate: int) -> None:
+        self.name = name
+        self.ring = ring
+        self.rate = sample_rate
+        self.cursor = ring.cursor()
+        self.buf = np.zeros(int(FIFO_SECONDS * sample_rate), dtype=np.int16)
+        self._xp = np.arange(len(self.buf), dtype=np.float64)
+        self.start = 0
+        self.end = 0
+        self.base = 0
+        self.total = 0
+        self.pos: Optional[float] = None      # 다음 출력 샘플이 읽을 샘플 번호 (소수)
+        self.t_pos = 0.0                      # pos 에 해당하는 출력 시각 (monotonic ns)
+        self.ratio = 1.0                      # 추정 소스 rate / 명목 rate
+        self.step = 1.0                       # 출력 샘플 1개당 읽는 소스 샘플 수 (보정 포함)
+        self.correcting = False
+        self.arrived = 0.0                    # 마지막 청크 수신 시각 (monotonic ns)
+        self.silent = False
+        self._hist: Deque[Tuple[int, float]] = deque()   # (청크 첫 샘플 번호, 캡처 시각)
+        self._fit: Optional[Tuple[float, float, float]] = None   # (샘플 번호, 시각, ns/샘플)
+
+        self.drift_fixes = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+
+    @property
+    def frames(self) -> int:
+        return self.end - self.start
+
+    @property
+    def t_head(self) -> Optional[float]:
+        return None if self._fit is None else self._time(self.base)
+
+    def _time(self, n: float) -> float:
+        n_c, t_c, ns = self._fit
+        return t_c + (n - n_c) * ns
+
+    def _index(self, t: float) -> float:
+        n_c, t_c, ns = self._fit
+        return n_c + (t - t_c) / ns
+
+    def t_end(self) -> float:
+        """받은 샘플로 채울 수 있는 출력 시각의 끝 (exclusive)."""
+        if self.pos is None:
+            return self._time(self.total)
+        out_ns = 1e9 / self.rate
+        return self.t_pos + ((self.total - 1 - self.pos) / self.step + 1) * out_ns
+
+    def _refit(self) -> None:
+        """창 안 (샘플 번호, 캡처 시각) 최소제곱 직선. 창이 짧으면 기울기는 명목 rate."""
+        hist = np.array(self._hist, dtype=np.float64)
+        n_last, t_last = hist[-1]
+        x = hist[:, 0] - n_last
+        y = hist[:, 1] - t_last
+        nominal = 1e9 / self.rate
+        ns = nominal
+        if -y[0] >= DRIFT_MIN_SPAN * 1e9:
+            dx = x - x.mean()
+            ns = float(np.dot(dx, y - y.mean()) / np.dot(dx, dx))
+            ns = min(max(ns, nominal * (1.0 - DRIFT_MAX_RATIO)), nominal * (1.0 + DRIFT_MAX_RATIO))
+        # 최소제곱 직선은 (기울기를 고정해도) 점들의 평균을 지남
+        self._fit = (n_last + float(x.mean()), t_last + float(y.mean()), ns)
+        self.ratio = nominal / ns
+
+    def _append(self, pcm: np.ndarray) -> None:
+        n = len(pcm)
+        if self.end + n > len(self.buf):
+            # 앞으로 당기고, 그래도 넘치면 오래된 샘플을 버림
+            keep = min(self.frames, len(self.buf) - n)
+            drop = self.frames - keep
+            if drop:
+                self.dropped_frames += drop
+                self.base += drop
+            self.buf[:keep] = self.buf[self.end - keep : self.end]
+            self.start, self.end = 0, keep
+        self.buf[self.end : self.end + n] = pcm
+        self.end += n
+        self.total += n
+
+    def pull(self) -> None:
+        """링에 새로 들어온 청크를 FIFO 로 (청크 캡처 시각을 회귀 창에 넣고 직선 갱신)."""
+        ring = self.ring
+        hist = self._hist
+        while True:
+            item = self.cursor.next()
+            if item is None:
+                return
+            seq, view = item
+            pcm = np.frombuffer(view, dtype=np.int16)
+            start_ns = ring.stamp(seq) - len(pcm) * 1e9 / self.rate
+            self.silent = bool(ring.flags(seq) & FLAG_SILENT)
+            self.arrived = time.monotonic_ns()
+            if self._fit is not None and abs(start_ns - self._time(self.total)) > RESYNC_SECONDS * 1e9:
+                # 장치가 멈췄다 이어짐: 남은 샘플과 회귀 창을 버리고 캡처 시각으로 다시 시작
+                self.dropped_frames += self.frames
+                self.start = self.end = 0
+                self.base = self.total
+                self.pos = None
+                hist.clear()
+            hist.append((self.total, start_ns))
+            while start_ns - hist[0][1] > DRIFT_WINDOW * 1e9:
+                hist.popleft()
+            self._append(pcm)
+            self._refit()
+
+    def take(self, t_out: float, block: int, row: np.ndarray, live: bool) -> None:
+        """[t_out, t_out + block) 구간을 row (float32) 에 (소수 위치 선형 보간). 없는 부분은 0."""
+        row.fill(0.0)
+        if self._fit is None:
+            return
+        target = self._index(t_out)
+        if self.pos is None or abs(target - self.pos) > RESYNC_SECONDS * self.rate:
+            self.pos = target
+            self.correcting = False
+        # 위상 오차 (초, + 면 읽기가 회귀선보다 뒤짐): 크면 재생 속도를 조금 바꿔 천천히 흡수
+        err = (target - self.pos) / self.rate
+        if abs(err) > DRIFT_TOLERANCE:
+            if not self.correcting:
+                self.correcting = True
+                self.drift_fixes += 1
+        elif abs(err) < DRIFT_TOLERANCE / 4:
+            self.correcting = False
+        step = self.ratio
+        if self.correcting:
+            step += min(max(err / DRIFT_SLEW, -DRIFT_MAX_SLEW), DRIFT_MAX_SLEW)
+        self.step = step
+
+        rel = (self.pos - self.base) + self._xp[:block] * step
+        frames = self.frames
+        lo = max(int(rel[0]), 0)
+        hi = min(int(rel[-1]) + 2, frames)
+        if hi > lo:
+            s = self.start
+            row[:] = np.interp(rel, self._xp[lo:hi], self.buf[s + lo : s + hi], left=0.0, right=0.0)
+        if live:
+            # 아직 안 온 샘플 (늦은 소스)
+            self.late_frames += int(np.count_nonzero(rel > frames - 1))
+
+        self.pos += block * step
+        self.t_pos = t_out + block * 1e9 / self.rate
+        drop = min(max(int(self.pos) - self.base, 0), frames)
+        self.start += drop
+        self.base += drop
+        if self.frames == 0:
+            self.start = self.end = 0
+
+    def live(self, now_ns: int) -> bool:
+        return self._fit is not None and now_ns - self.arrived < STALE_SECONDS * 1e9
+
+
+class StreamMixer:
+    """소스 링 N 개 → 샘플 정렬 믹스 → out 링 (전용 스레드)."""
+
+    def __init__(
+        self,
+        sources: Dict[str, PcmRing],
+        out: PcmRing,
+        sample_rate: int = DEFAULT_TARGET_SR,
+        block_frames: int = DEFAULT_MIX_BLOCK,
+        gains: Optional[Sequence[float]] = None,
+        meter: Optional[LevelMeter] = None,
+    ) -> None:
+        self.sources = dict(sources)
+        self.out = out
+        self.sample_rate = sample_rate
+        self.block = block_frames
+        self.gains = np.asarray(
+            [1.0] * len(self.sources) if gains is None else gains, dtype=np.float32
+        )
+        if len(self.gains) != len(self.sources):
+            raise ValueError("gains must match the number of sources")
+        self.meter = meter or LevelMeter()
+        self.fifos: List[_SourceFifo] = []
+        self._mat = np.zeros((len(self.sources), self.block), dtype=np.float32)
+        self._acc = np.zeros(self.block, dtype=np.float32)
+        self._t0: Optional[float] = None
+        self._emitted = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.out.sample_rate = self.sample_rate
+        # 시작 시점(live)부터
+        self.fifos = [_SourceFifo(n, r, self.sample_rate) for n, r in self.sources.items()]
+        self._t0 = None
+        self._emitted = 0
+        self.meter.reset()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _t_out(self) -> float:
+        return self._t0 + self._emitted * 1e9 / self.sample_rate
+
+    def _ready(self, now_ns: int) -> bool:
+        """다음 블록을 낼 수 있는지: 살아 있는 소스가 모두 채웠거나, MAX_WAIT 가 지났거나."""
+        if self._t0 is None:
+            heads = [f.t_head for f in self.fifos if f.t_head is not None]
+            if not heads:
+                return False
+            self._t0 = min(heads)
+        t_block_end = self._t_out() + self.block * 1e9 / self.sample_rate
+        if now_ns - t_block_end > MAX_WAIT * 1e9:
+            return True
+        for f in self.fifos:
+            if f.live(now_ns) and f.t_end() < t_block_end:
+                return False
+        return True
+
+    def _emit(self, now_ns: int) -> None:
+        t_out = self._t_out()
+        block = self.block
+        silent = True
+        for f, row in zip(self.fifos, self._mat):
+            live = f.live(now_ns)
+            f.take(t_out, block, row, live)
+            silent = silent and (f.silent or not live)
+        acc = self._acc
+        # 소스별 gain 을 곱해 합산 (행렬-벡터 곱 1번)
+        np.dot(self.gains, self._mat, out=acc)
+        np.clip(acc, -32768.0, 32767.0, out=acc)
+        rms = float(np.sqrt(np.dot(acc, acc) / block)) / 32768.0
+        peak = float(max(acc.max(), -acc.min())) / 32768.0
+        self.meter.update(rms, peak, block / self.sample_rate)
+
+        slot = self.out.claim(block * 2)
+        np.copyto(slot.view(np.int16)[:block], acc, casting="unsafe")
+        self._emitted += block
+        stamp = int(t_out + block * 1e9 / self.sample_rate)   # 블록 마지막 샘플 시각
+        self.out.commit(block * 2, stamp, FLAG_SILENT if silent else 0)
+
+    def _run(self) -> None:
+        first = self.fifos[0] if self.fifos else None
+        wait = self.block / self.sample_rate / 4
+        while not self._stop.is_set():
+            for f in self.fifos:
+                f.pull()
+            now = time.monotonic_ns()
+            emitted = False
+            while self._ready(now):
+                self._emit(now)
+                emitted = True
+            if not emitted:
+                if first is not None:
+                    first.ring.wait(first.cursor.seq, wait)
+                else:
+                    self._stop.wait(wait)
+
+
+class MultiCapture:
+    """
+    장치 여러 개를 AudioCapture 로 각각 캡처 + StreamMixer 로 믹스.
+    start / stop 은 AudioCapture 와 같은 모양 (meter 는 믹스 레벨).
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[Tuple[str, object]],
+        error_callback: Optional[Callable[[Exception], None]] = None,
+        metrics: Optional[PipelineMetrics] = None,
+        silence_gate: Optional[SilenceGate] = None,
+        latency_profile: Optional[str] = None,
+        adaptive: bool = False,
+        gains: Optional[Sequence[float]] = None,
+        block_frames: int = DEFAULT_MIX_BLOCK,
+        slots: int = DEFAULT_SLOTS,
+    ) -> None:
+        if not sources:
+            raise ValueError("no capture sources")
+        names = [name for name, _ in sources]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate stream names: {names}")
+        self.mics = dict(sources)
+        self.streams: Dict[str, PcmRing] = {name: PcmRing(slots) for name in names}
+        self.captures: Dict[str, AudioCapture] = {}
+        for name in names:
+            gate = None
+            if silence_gate is not None:
+                # 게이트 상태는 장치마다 따로
+                gate = SilenceGate(silence_gate.threshold_db, silence_gate.hangover_sec)
+            self.captures[name] = AudioCapture(
+                error_callback=error_callback,
+                metrics=metrics,
+                silence_gate=gate,
+                latency_profile=latency_profile,
+                adaptive=adaptive,
+            )
+        self.ring = PcmRing(slots)
+        self.meter = LevelMeter()
+        self.mixer = StreamMixer(
+            self.streams,
+            self.ring,
+            sample_rate=next(iter(self.captures.values())).target_sr,
+            block_frames=block_frames,
+            gains=gains,
+            meter=self.meter,
+        )
+        if metrics is not None:
+            self._register_metrics(metrics)
+
+    @property
+    def chunk(self) -> int:
+        return next(iter(self.captures.values())).chunk
+
+    def _register_metrics(self, metrics: PipelineMetrics) -> None:
+        r = metrics.registry
+
+        def per_source(attr):
+            return lambda: [({"source": f.name}, getattr(f, attr)) for f in self.mixer.fifos]
+
+        # 장치별 AudioCapture 가 같은 이름으로 등록한 레벨 gauge 는 믹스 기준으로 덮어씀
+        r.register(Gauge("audiomi_level_rms_dbfs", "mix RMS level", lambda: self.meter.read().rms_db))
+        r.register(Gauge("audiomi_level_peak_dbfs", "mix peak hold", lambda: self.meter.read().peak_db))
+        r.register(
+            Gauge(
+                "audiomi_level_short_dbfs",
+                "mix short-term level (unweighted)",
+                lambda: self.meter.read().short_db,
+            )
+        )
+        r.register(
+            LabeledGauge(
+                "audiomi_source_level_rms_dbfs",
+                "RMS level per capture source",
+                lambda: [
+                    ({"source": name}, cap.meter.read().rms_db)
+                    for name, cap in self.captures.items()
+                ],
+            )
+        )
+        r.register(
+            LabeledGauge(
+                "audiomi_mix_drift_fixes",
+                "clock drift corrections per source",
+                per_source("drift_fixes"),
+            )
+        )
+        r.register(
+            LabeledGauge(
+                "audiomi_mix_clock_ratio",
+                "estimated source sample rate / nominal rate",
+                per_source("ratio"),
+            )
+        )
+        r.register(
+            LabeledGauge(
+                "audiomi_mix_late_frames",
+                "frames mixed as silence because the source was late",
+                per_source("late_frames"),
+            )
+        )
+
+    def start(self) -> None:
+        # 믹서 커서를 먼저 잡아서 장치 링의 첫 청크부터 믹스
+        self.mixer.start()
+        for name, cap in self.captures.items():
+            cap.start(self.mics[name], self.streams[name])
+
+    def stop(self) -> None:
+        for cap in self.captures.values():
+            cap.stop()
+        self.mixer.stop()
@@ -1,44 +1,455 @@
 # net_server.py
 import asyncio
+import socket
 import struct
 import threading
 import queue
+import time
+from collections import deque
 from contextlib import suppress
-from typing import Set, Optional, Callable
+from typing import Dict, Optional, Callable, Set, Union
+
+from audio_codec import CODEC_ADPCM, CODEC_NAMES, CODEC_PCM16, ChunkEncoder
+from audio_format import FORMAT_REQUEST, SAMPLE_S16, FormatHub, OutputFormat
+from frame_parser import FrameDecoder, FrameError
+from history import DEFAULT_HISTORY_BYTES, ChunkHistory
+from metrics import Gauge, LabeledGauge, PipelineMetrics
+from ring_buffer import FLAG_SILENT, PcmRing, RingCursor
+from udp_transport import MulticastSender
 
 REQUEST_AUDIO = 0x01   # 1번 커맨드: 오디오 푸시
+REQUEST_CODEC = 0x02   # 2번 커맨드: 코덱 선택 (<iii = checkcode, 2, codec_id)
+REQUEST_FORMAT = 0x03  # 3번 커맨드: 출력 포맷 구독 (<ii + <iBB = rate, channels, sample_format)
+REQUEST_STATS = 0x04   # 4번 커맨드: 지표 조회 (응답 <iii + JSON)
+REQUEST_REPLAY = 0x05  # 5번 커맨드: 지난 구간 다시 받기 (<iii + <iq = size, mode, value)
+REQUEST_STREAM = 0x06  # 6번 커맨드: 스트림 선택 (<iii + UTF-8 이름, 빈 이름 = 기본 스트림)
+REQUEST_SUBSCRIBE = 0x07  # 7번 커맨드: 스트림 구독 추가 / 해제 (<iii + <B op + UTF-8 이름)
 REQUEST_PING  = 99
+REQUEST_PING_V2 = 100  # 버전 협상 핑 (<iii = checkcode, 100, version)
+REQUEST_AUDIO_V2 = 0x11  # v2 오디오 프레임 (seq / 캡처 시각 / 샘플레이트 포함)
+REQUEST_SILENCE = 0x12   # v3 무음 프레임 (오디오 대신 "N 프레임 무음")
+REQUEST_STREAM_AUDIO = 0x13    # 구독 모드 오디오 프레임 (v2 + 스트림 ID)
+REQUEST_STREAM_SILENCE = 0x14  # 구독 모드 무음 프레임 (v3 + 스트림 ID)
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+PROTOCOL_V3 = 3   # v2 + 무음 게이트 구간은 REQUEST_SILENCE 로 대체
 
 # StatusCallback = Callable[[str], None]
 StatusCallback = Callable[[str, object], None] 
 
+# 구독 키: None = 기본 스트림, OutputFormat = 포맷 변환 스트림, str = 이름 붙은 스트림
+StreamKey = Union[None, OutputFormat, str]
+
+# 느린 클라이언트(송신 큐 가득) 처리 정책
+POLICY_DROP_OLDEST = "drop_oldest"    # 가장 오래된 패킷부터 버림
+POLICY_SKIP_TO_LIVE = "skip_to_live"  # 밀린 패킷 전부 버리고 최신부터
+POLICY_DISCONNECT = "disconnect"      # N초 이상 밀려 있으면 연결 끊음
+SLOW_POLICIES = (POLICY_DROP_OLDEST, POLICY_SKIP_TO_LIVE, POLICY_DISCONNECT)
+
+# 오디오 프레임 헤더 (checkcode, cmd, size) – 한 번만 컴파일
+AUDIO_HEADER = struct.Struct("<iii")
+# v2: (checkcode, cmd=0x11, size) + (seq:int64, capture_ns:int64, sample_rate:int32)
+# size 는 확장 헤더 20 바이트 + 페이로드 길이 (size 만큼 건너뛰면 다음 프레임)
+AUDIO_HEADER_V2 = struct.Struct("<iiiqqi")
+AUDIO_EXT_V2_SIZE = AUDIO_HEADER_V2.size - AUDIO_HEADER.size
+# v3 무음: (checkcode, cmd=0x12, size=24) + (seq, capture_ns, sample_rate, frames)
+# frames = 채널당 무음 샘플 수 (클라가 0 으로 채움)
+SILENCE_FRAME = struct.Struct("<iiiqqii")
+# v2 핑 ACK: (checkcode, 100, status, server_monotonic_ns) – 클라가 시계 오프셋 추정
+PING_V2_ACK = struct.Struct("<iiBq")
+INT_FIELD = struct.Struct("<i")
+# replay 요청 본문 (mode, value) / ACK (checkcode, 5, size=13, status, start_seq, chunks)
+# 요청 / ACK 모두 size 필드 포함 → 모르는 쪽은 건너뜀
+REPLAY_REQUEST = struct.Struct("<iq")
+REPLAY_ACK = struct.Struct("<iiiBqi")
+REPLAY_ACK_BODY = struct.Struct("<Bqi")
+# 스트림 선택 ACK (checkcode, 6, size=1, status)
+STREAM_ACK = struct.Struct("<iiiB")
+MAX_STREAM_NAME = 64
+# 구독 ACK (checkcode, 7, size=4+len(name), status, op, stream_id) + UTF-8 이름
+# 서버가 스트림을 없애면 같은 형식(op=REMOVE)으로 먼저 알림
+SUBSCRIBE_ACK = struct.Struct("<iiiBBH")
+SUBSCRIBE_ADD = 0
+SUBSCRIBE_REMOVE = 1
+DEFAULT_STREAM_ID = 0   # 기본 스트림 (빈 이름)
+MAX_STREAM_ID = 0xFFFF
+# 구독 모드 프레임: v2 / v3 프레임 확장 헤더 앞에 stream_id:uint16
+STREAM_AUDIO_HEADER = struct.Struct("<iiiHqqi")
+STREAM_AUDIO_EXT_SIZE = STREAM_AUDIO_HEADER.size - AUDIO_HEADER.size
+STREAM_SILENCE_FRAME = struct.Struct("<iiiHqqii")
+REPLAY_FROM_SEQ = 0    # value = 시작 seq
+REPLAY_LAST_MS = 1     # value = 최근 몇 ms
+
+# 클라 → 서버 요청 본문 길이 (size 필드 없음).
+# 목록에 없는 cmd 는 <i size + 본문이 붙은 것으로 보고 건너뜀 (새 명령은 반드시 size 를 붙일 것)
+REQUEST_BODY_SIZES = {
+    REQUEST_PING: 0,
+    REQUEST_PING_V2: INT_FIELD.size,
+    REQUEST_CODEC: INT_FIELD.size,
+    REQUEST_FORMAT: FORMAT_REQUEST.size,
+    REQUEST_STATS: 0,
+}
+REQUEST_SIZED = (REQUEST_REPLAY, REQUEST_STREAM, REQUEST_SUBSCRIBE)
+REQUEST_READ_SIZE = 4096   # 요청은 작으므로 작은 블록으로 충분
+
+DEFAULT_CLIENT_QUEUE = 64     # 클라이언트별 최대 대기 패킷 수 (~1.3초)
+DEFAULT_MAX_BEHIND = 5.0      # POLICY_DISCONNECT 허용 시간(초)
+BEHIND_PACKETS = 4            # 송신 큐에 이만큼 이상 쌓이면 "밀린 클라이언트" (~85 ms)
+
+
+class NotifyQueue(queue.Queue):
+    """
+    put 될 때 asyncio 루프를 직접 깨워주는 thread-safe 큐.
+    - queue.Queue 를 그대로 상속하므로 기존 put_nowait / get_nowait 사용처는 동일.
+    - 서버가 set_notify() 로 (loop, callback) 을 등록하면
+      캡처 스레드의 put 마다 call_soon_threadsafe 로 callback 호출.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self._notify: Optional[tuple] = None
+
+    def set_notify(
+        self,
+        loop: Optional[asyncio.AbstractEventLoop],
+        callback: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._notify = (loop, callback) if loop is not None else None
+
+    def _put(self, item) -> None:
+        super()._put(item)
+        notify = self._notify
+        if notify is not None:
+            loop, callback = notify
+            try:
+                loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                # 루프가 이미 닫힘
+                self._notify = None
+
+
+def build_audio_frame(checkcode: int, data) -> memoryview:
+    """
+    오디오 프레임(헤더 + 페이로드)을 청크당 한 번만 만든다.
+    반환된 memoryview 를 모든 클라이언트가 복사 없이 공유.
+    (transport 가 미전송분의 참조를 들고 있을 수 있으므로 버퍼는 재사용하지 않음)
+    """
+    n = len(data)
+    frame = bytearray(AUDIO_HEADER.size + n)
+    AUDIO_HEADER.pack_into(frame, 0, checkcode, REQUEST_AUDIO, n)
+    frame[AUDIO_HEADER.size :] = data
+    return memoryview(frame)
+
+
+def build_audio_frame_v2(
+    checkcode: int, seq: int, stamp_ns: int, sample_rate: int, data
+) -> memoryview:
+    """v2 오디오 프레임. build_audio_frame 과 마찬가지로 청크당 1회."""
+    n = len(data)
+    frame = bytearray(AUDIO_HEADER_V2.size + n)
+    AUDIO_HEADER_V2.pack_into(
+        frame,
+        0,
+        checkcode,
+        REQUEST_AUDIO_V2,
+        AUDIO_EXT_V2_SIZE + n,
+        seq,
+        stamp_ns,
+        sample_rate,
+    )
+    frame[AUDIO_HEADER_V2.size :] = data
+    return memoryview(frame)
+
+
+def build_silence_frame(
+    checkcode: int, seq: int, stamp_ns: int, sample_rate: int, frames: int
+) -> memoryview:
+    """v3 무음 프레임 (청크당 1회, 모든 v3 클라이언트 공유)."""
+    return memoryview(
+        SILENCE_FRAME.pack(
+            checkcode,
+            REQUEST_SILENCE,
+            SILENCE_FRAME.size - AUDIO_HEADER.size,
+            seq,
+            stamp_ns,
+            sample_rate,
+            frames,
+        )
+    )
+
+
+def build_stream_frame(
+    checkcode: int, stream_id: int, seq: int, stamp_ns: int, sample_rate: int, data
+) -> memoryview:
+    """구독 모드 오디오 프레임 (스트림 ID 포함). 청크당 코덱별 1회."""
+    n = len(data)
+    frame = bytearray(STREAM_AUDIO_HEADER.size + n)
+    STREAM_AUDIO_HEADER.pack_into(
+        frame,
+        0,
+        checkcode,
+        REQUEST_STREAM_AUDIO,
+        STREAM_AUDIO_EXT_SIZE + n,
+        stream_id,
+        seq,
+        stamp_ns,
+        sample_rate,
+    )
+    frame[STREAM_AUDIO_HEADER.size :] = data
+    return memoryview(frame)
+
+
+def build_stream_silence_frame(
+    checkcode: int, stream_id: int, seq: int, stamp_ns: int, sample_rate: int, frames: int
+) -> memoryview:
+    """구독 모드 무음 프레임 (v3 세션)."""
+    return memoryview(
+        STREAM_SILENCE_FRAME.pack(
+            checkcode,
+            REQUEST_STREAM_SILENCE,
+            STREAM_SILENCE_FRAME.size - AUDIO_HEADER.size,
+            stream_id,
+            seq,
+            stamp_ns,
+            sample_rate,
+            frames,
+        )
+    )
+
+
+def _frame_count(data, fmt) -> int:
+    """PCM 청크의 채널당 샘플 수 (기본 / 이름 붙은 스트림은 PCM16 모노)."""
+    if not isinstance(fmt, OutputFormat):
+        return len(data) // 2
+    return len(data) // (fmt.channels * fmt.sample_width)
+
+
+class ClientSession:
+    """
+    접속한 클라이언트 1개의 송신 상태.
+    - 자체 bounded 송신 큐 + writer 태스크를 가지므로
+      느린 클라이언트가 다른 클라이언트의 전송을 막지 않음.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        addr,
+        maxsize: int,
+        policy: str,
+        max_behind: float,
+        coalesce: int = 1,
+        metrics: Optional[PipelineMetrics] = None,
+    ) -> None:
+        self.writer = writer
+        self.addr = addr
+        self.label = f"{addr[0]}:{addr[1]}" if addr else "?"   # metrics 라벨
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.max_behind = max_behind
+        self.coalesce = max(1, coalesce)
+        self.codec = CODEC_PCM16
+        self.fmt: Optional[OutputFormat] = None   # None = 기본 스트림
+        self.stream: Optional[str] = None         # 이름 붙은 스트림 (None = send_queue)
+        # 7(SUBSCRIBE)을 한 번이라도 보내면 구독 모드: 구독한 스트림들을 ID 가 붙은 프레임으로 받음
+        self.tagged = False
+        self.subscriptions: Set[Optional[str]] = set()
+        self.version = PROTOCOL_V1
+        self.metrics = metrics
+
+        self.queue: deque = deque()
+        self.drops = 0
+        self.bytes_sent = 0
+        self.behind_since: Optional[float] = None
+        self.closing = False
+
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()   # 큐가 절반 아래로 비면 set (replay 흐름 제어)
+        self.task: Optional[asyncio.Task] = None
+        self.replay_task: Optional[asyncio.Task] = None
+
+    def push(self, packet) -> None:
+        """패킷 적재. 큐가 가득 차면 정책에 따라 버리거나 끊기."""
+        if self.closing:
+            return
+        if len(self.queue) >= self.maxsize:
+            if self.policy == POLICY_SKIP_TO_LIVE:
+                self.drops += len(self.queue)
+                self.queue.clear()
+            else:
+                self.queue.popleft()
+                self.drops += 1
+                if self.policy == POLICY_DISCONNECT:
+                    now = time.monotonic()
+                    if self.behind_since is None:
+                        self.behind_since = now
+                    elif now - self.behind_since > self.max_behind:
+                        self.close(abort=True)
+                        return
+        self.queue.append(packet)
+        self._ready.set()
+
+    def close(self, abort: bool = False) -> None:
+        """세션 종료. abort=True 면 밀린 송신 버퍼도 버리고 즉시 끊음."""
+        self.closing = True
+        self.queue.clear()
+        self._ready.set()
+        self._space.set()
+        with suppress(Exception):
+            if abort:
+                self.writer.transport.abort()
+            else:
+                self.writer.close()
+
+    @property
+    def replaying(self) -> bool:
+        return self.replay_task is not None and not self.replay_task.done()
+
+    async def wait_space(self) -> None:
+        """송신 큐가 절반 아래로 빌 때까지 대기 (replay 가 큐를 넘치게 하지 않도록)."""
+        while len(self.queue) >= max(1, self.maxsize // 2) and not self.closing:
+            self._space.clear()
+            await self._space.wait()
+
+    async def run(self) -> None:
+        """
+        writer 태스크: 큐에서 꺼내 write → drain.
+        밀려 있으면 최대 coalesce 개 프레임을 writelines 한 번으로 묶어 보냄.
+        """
+        w = self.writer
+        q = self.queue
+        metrics = self.metrics
+        try:
+            while not self.closing:
+                if not q:
+                    self.behind_since = None
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                if self.coalesce > 1 and len(q) > 1:
+                    batch = [q.popleft() for _ in range(min(self.coalesce, len(q)))]
+                    w.writelines(batch)
+                    n = sum(len(f) for f in batch)
+                else:
+                    packet = q.popleft()
+                    w.write(packet)
+                    n = len(packet)
+                self.bytes_sent += n
+                if len(q) < self.maxsize // 2:
+                    self._space.set()
+                if metrics is None:
+                    await w.drain()
+                    continue
+                metrics.bytes_sent.inc(n)
+                t0 = time.perf_counter()
+                await w.drain()
+                metrics.drain_seconds.observe(time.perf_counter() - t0)
+        except Exception:
+            # 연결 오류 → 세션 종료 (정리는 _handle_client 에서)
+            self.close()
+
 
 class NetAudioServer:
     """
     오디오 스트림 서버.
-    - 외부에서 send_queue 로 들어오는 PCM 청크를
+    - 외부에서 send_queue (PcmRing 또는 queue.Queue) 로 들어오는 PCM 청크를
       접속한 모든 클라이언트에 1번 커맨드로 브로드캐스트.
     - 클라이언트가 99(PING)을 보내면 ACK 응답.
+      100(PING_V2)로 version=2 를 협상하면 seq / 캡처 시각이 붙은 v2 프레임(0x11) 전송.
+      version=3 이면 링에 FLAG_SILENT 로 표시된 청크를 무음 프레임(0x12)으로 대체.
+    - 클라이언트가 2(CODEC)로 코덱을 고르면 이후 오디오 페이로드를 그 코덱으로 전송.
+    - format_hub 가 있으면 3(FORMAT)으로 (rate, channels, sample_format) 구독 가능.
+      포맷별 변환은 청크당 1회, 같은 포맷 구독자끼리 프레임 공유.
+    - 클라이언트마다 bounded 송신 큐를 두고, 가득 차면 slow_policy 적용
+      (drop_oldest / skip_to_live / disconnect).
+    - multicast 가 있으면 기본 스트림 청크를 UDP 멀티캐스트로도 1회씩 송출
+      (구독자 수와 무관, TCP 제어 커맨드는 그대로 사용 가능).
+    - streams 로 이름 붙은 PCM16 링(장치별 캡처, 방별 소스 등)을 추가로 제공 (add_stream / remove_stream
+      으로 실행 중에도 추가 / 제거). 스트림마다 구독자 집합이 따로 있어 청크는 그 구독자에게만 분배.
+      6(STREAM)으로 이름을 보내면 기본 스트림 대신 그 스트림을 받음 (포맷 구독 / replay 는 기본 스트림만).
+      7(SUBSCRIBE)로 여러 스트림을 구독 / 해제하면 스트림 ID 가 붙은 프레임(0x13 / 0x14)으로 받음 (v2+).
+    - history_seconds > 0 이면 기본 스트림 최근 청크를 보관하고, 5(REPLAY)로
+      "seq S 부터" / "최근 T ms" 를 요청하면 밀린 구간을 최대 속도로 보낸 뒤 라이브로 이어감.
+    - 4(STATS)를 보내면 metrics 스냅샷을 JSON 으로 응답 (metrics 미지정 시 자체 생성).
+    - coalesce > 1 이면 밀린 프레임을 writelines 한 번으로 묶어 전송.
     """
 
     def __init__(
         self,
-        send_queue: queue.Queue,
+        send_queue: Union[PcmRing, queue.Queue],
         checkcode: int,
         host: str = "0.0.0.0",
         port: int = 26070,
         status_cb: Optional[StatusCallback] = None,
+        client_queue_size: int = DEFAULT_CLIENT_QUEUE,
+        slow_policy: str = POLICY_DROP_OLDEST,
+        max_behind_sec: float = DEFAULT_MAX_BEHIND,
+        coalesce: int = 1,
+        tcp_nodelay: bool = True,
+        sndbuf: Optional[int] = None,
+        format_hub: Optional[FormatHub] = None,
+        backlog: int = 1024,
+        sample_rate: int = 16000,
+        metrics: Optional[PipelineMetrics] = None,
+        multicast: Optional[MulticastSender] = None,
+        reuse_port: bool = False,
+        history_seconds: float = 0.0,
+        history_bytes: int = DEFAULT_HISTORY_BYTES,
+        streams: Optional[Dict[str, PcmRing]] = None,
     ) -> None:
+        if slow_policy not in SLOW_POLICIES:
+            raise ValueError(f"unknown slow_policy: {slow_policy}")
         self.send_queue = send_queue
         self.checkcode = checkcode
         self.host = host
         self.port = port
         self.status_cb = status_cb or (lambda msg: None)
+        self.client_queue_size = client_queue_size
+        self.slow_policy = slow_policy
+        self.max_behind_sec = max_behind_sec
+        self.coalesce = coalesce
+        self.tcp_nodelay = tcp_nodelay
+        self.sndbuf = sndbuf
+        self.format_hub = format_hub
+        self.backlog = backlog
+        # queue.Queue 입력일 때 v2 헤더에 넣을 샘플레이트 (PcmRing 은 링 값 사용)
+        self.sample_rate = sample_rate
+        self._queue_seq = 0
+        self.multicast = multicast
+        # 이름 → PCM16 모노 링 (REQUEST_STREAM)
+        self.streams: Dict[str, PcmRing] = {}
+        # 스트림 → 구독 모드 프레임의 stream_id (기본 스트림 0, 이름 붙은 스트림은 추가 순서대로)
+        self._stream_ids: Dict[Optional[str], int] = {None: DEFAULT_STREAM_ID}
+        self._next_stream_id = DEFAULT_STREAM_ID + 1
+        self._stream_tasks: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # SO_REUSEPORT: 여러 워커 프로세스가 같은 포트에서 accept (mp_server)
+        self.reuse_port = reuse_port
+        # 기본 스트림 최근 청크 보관 (REQUEST_REPLAY). 0 이면 끔
+        self.history: Optional[ChunkHistory] = (
+            ChunkHistory(history_seconds, history_bytes) if history_seconds > 0 else None
+        )
 
         self._stop_event = threading.Event()
         self._thread: Optional[threading.Thread] = None
         self._server: Optional[asyncio.AbstractServer] = None
-        self._clients: Set[asyncio.StreamWriter] = set()
+        self._clients: Dict[asyncio.StreamWriter, ClientSession] = {}
+        self._reported_drops: Dict[object, int] = {}
+        self._cursor: Optional[RingCursor] = None
+        self._codec_encoder = ChunkEncoder()
+        # 기본 스트림 외 스트림별 인코더 (ADPCM 상태가 스트림끼리 섞이지 않게)
+        self._stream_encoders: Dict[StreamKey, ChunkEncoder] = {}
+        # 스트림(포맷 / 이름) → 구독 세션. None 은 send_queue 기본 스트림
+        self._subs: Dict[StreamKey, Set[ClientSession]] = self._empty_subs()
+        self._format_tasks: Dict[OutputFormat, asyncio.Task] = {}
+        self._reported_overruns = 0
+
+        for name, ring in (streams or {}).items():
+            self.add_stream(name, ring)
+
+        self.metrics = metrics or PipelineMetrics()
+        self._register_metrics()
 
     # ---------- 상태 출력 ----------    
     def _log(self, tag: str, payload=None):
@@ -62,7 +473,67 @@ class NetAudioServer:
             self._thread.join(timeout=2.0)
             self._thread = None
 
+    def add_stream(self, name: str, ring: PcmRing) -> int:
+        """이름 붙은 스트림 추가 (서버 실행 중에도 가능). 스트림 ID 반환."""
+        if not name or len(name.encode("utf-8")) > MAX_STREAM_NAME:
+            raise ValueError(f"invalid stream name: {name!r}")
+        if name in self.streams:
+            raise ValueError(f"duplicate stream: {name}")
+        if self._next_stream_id > MAX_STREAM_ID:
+            raise ValueError("too many streams")
+        stream_id = self._next_stream_id
+        self._next_stream_id += 1
+        self._stream_ids[name] = stream_id
+        self.streams[name] = ring
+        self._call_in_loop(self._start_stream, name, ring)
+        return stream_id
+
+    def remove_stream(self, name: str) -> None:
+        """이름 붙은 스트림 제거. 구독 모드 세션에는 해제를 알리고, 6(STREAM) 세션은 끊음."""
+        if self.streams.pop(name, None) is None:
+            raise ValueError(f"unknown stream: {name}")
+        stream_id = self._stream_ids[name]
+        if not self._call_in_loop(self._stop_stream, name, stream_id):
+            self._stream_ids.pop(name, None)
+            self._subs.pop(name, None)
+
     # ---------- 내부 구현 ----------
+    def _call_in_loop(self, fn, *args) -> bool:
+        """서버 루프 스레드에서 fn 실행 예약. 루프가 없으면 False."""
+        loop = self._loop
+        if loop is None:
+            return False
+        try:
+            loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            # 루프가 이미 닫힘
+            return False
+        return True
+
+    def _start_stream(self, name: str, ring: PcmRing) -> None:
+        if name in self._stream_tasks or self.streams.get(name) is not ring:
+            # 이미 시작했거나, 예약 사이에 제거됨
+            return
+        self._subs.setdefault(name, set())
+        self._stream_tasks[name] = asyncio.create_task(self._broadcast_ring(ring, name))
+
+    def _stop_stream(self, name: str, stream_id: int) -> None:
+        task = self._stream_tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+        if name not in self.streams:
+            # 예약 사이에 같은 이름으로 다시 add_stream 됐으면 새 ID 유지
+            self._stream_ids.pop(name, None)
+        self._stream_encoders.pop(name, None)
+        for sess in self._subs.pop(name, set()):
+            if sess.tagged:
+                sess.subscriptions.discard(name)
+                sess.push(self._subscribe_ack(0, SUBSCRIBE_REMOVE, stream_id, name))
+            else:
+                # 이 스트림만 받던 세션: 재접속하면 거부되므로 클라가 알 수 있음
+                sess.close()
+        self._log("status", f"[SERVER] stream removed: {name}")
+
     def _server_thread(self) -> None:
         try:
             asyncio.run(self._async_main())
@@ -72,23 +543,47 @@ class NetAudioServer:
     async def _async_main(self) -> None:
         self._log(f"[SERVER] listen on {self.host}:{self.port}")
         self._server = await asyncio.start_server(
-            self._handle_client, self.host, self.port
+            self._handle_client,
+            self.host,
+            self.port,
+            backlog=self.backlog,
+            reuse_port=self.reuse_port or None,
         )
 
-        # 오디오 브로드캐스트 태스크
+        if self.multicast is not None:
+            self.multicast.open()
+            self._log(
+                f"[SERVER] multicast {self.multicast.group}:{self.multicast.port}"
+            )
+
+        # 오디오 브로드캐스트 태스크 (기본 스트림 + 이름 붙은 스트림마다 1개)
         broadcaster = asyncio.create_task(self._broadcast_loop())
+        # 루프를 먼저 알려서, 아래 목록을 만든 뒤 add_stream 된 스트림도 놓치지 않음
+        self._loop = asyncio.get_running_loop()
+        for name, ring in list(self.streams.items()):
+            self._start_stream(name, ring)
 
         try:
             async with self._server:
+                tick = 0
                 while not self._stop_event.is_set():
                     await asyncio.sleep(0.1)
+                    tick += 1
+                    if tick % 10 == 0:
+                        self._report_drops()
         finally:
-            broadcaster.cancel()
-            with suppress(asyncio.CancelledError):
-                await broadcaster
+            self._loop = None
+            tasks = [broadcaster, *self._stream_tasks.values(), *self._format_tasks.values()]
+            for task in tasks:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+            self._format_tasks.clear()
+            self._stream_tasks.clear()
 
             # 클라이언트 모두 정리
-            for w in list(self._clients):
+            for w, sess in list(self._clients.items()):
+                sess.close()
                 try:
                     w.close()
                     with suppress(Exception):
@@ -96,49 +591,296 @@ class NetAudioServer:
                 except Exception:
                     pass
             self._clients.clear()
+            self._subs = self._empty_subs()
+            if self.multicast is not None:
+                self.multicast.close()
 
             self._log("[SERVER] stopped")
 
+    def _empty_subs(self) -> Dict[StreamKey, Set[ClientSession]]:
+        # 이름 붙은 스트림은 _start_stream 에서 추가
+        return {None: set()}
+
+    def _register_metrics(self) -> None:
+        """서버 상태를 수집 시점에 읽는 gauge 등록."""
+        r = self.metrics.registry
+        r.register(
+            Gauge(
+                "audiomi_send_queue_depth",
+                "chunks waiting between capture and broadcast",
+                self._send_queue_depth,
+            )
+        )
+        r.register(Gauge("audiomi_clients", "connected clients", lambda: len(self._clients)))
+        r.register(
+            Gauge(
+                "audiomi_clients_behind",
+                f"clients with >= {BEHIND_PACKETS} packets queued",
+                lambda: sum(
+                    len(s.queue) >= BEHIND_PACKETS for s in list(self._clients.values())
+                ),
+            )
+        )
+        r.register(
+            LabeledGauge(
+                "audiomi_client_bytes_sent",
+                "bytes sent per connected client",
+                lambda: [
+                    ({"client": s.label}, s.bytes_sent)
+                    for s in list(self._clients.values())
+                ],
+            )
+        )
+        r.register(
+            LabeledGauge(
+                "audiomi_client_queue_depth",
+                "packets queued per connected client",
+                lambda: [
+                    ({"client": s.label}, len(s.queue))
+                    for s in list(self._clients.values())
+                ],
+            )
+        )
+        # 스트림은 실행 중에도 추가되므로 항상 등록
+        r.register(
+            LabeledGauge(
+                "audiomi_stream_clients",
+                "subscribers per stream",
+                lambda: [
+                    ({"stream": "default" if key is None else str(key)}, len(subs))
+                    for key, subs in list(self._subs.items())
+                ],
+            )
+        )
+        if self.multicast is not None:
+            mc = self.multicast
+            r.register(
+                Gauge(
+                    "audiomi_multicast_datagrams",
+                    "UDP datagrams sent",
+                    lambda: mc.datagrams,
+                )
+            )
+            r.register(
+                Gauge(
+                    "audiomi_multicast_errors",
+                    "UDP datagrams dropped on send",
+                    lambda: mc.errors,
+                )
+            )
+        if self.history is not None:
+            hist = self.history
+            r.register(
+                Gauge("audiomi_history_seconds", "replayable history length", lambda: hist.seconds)
+            )
+            r.register(
+                Gauge("audiomi_history_bytes", "memory held by replay history", lambda: hist.bytes)
+            )
+            r.register(
+                Gauge(
+                    "audiomi_clients_replaying",
+                    "clients currently receiving a replay backlog",
+                    lambda: sum(1 for s in list(self._clients.values()) if s.replaying),
+                )
+            )
+
+    def _send_queue_depth(self) -> int:
+        if isinstance(self.send_queue, PcmRing):
+            return self._cursor.lag if self._cursor is not None else 0
+        return self.send_queue.qsize()
+
+    def _report_drops(self) -> None:
+        """
+        클라이언트별 누적 드롭 수, 링 overrun 수가 바뀌었으면 status_cb 로 보고.
+        """
+        if self._cursor is not None and self._cursor.overruns != self._reported_overruns:
+            self.metrics.send_drops.inc(self._cursor.overruns - self._reported_overruns)
+            self._reported_overruns = self._cursor.overruns
+            self._log("ring_overrun", self._reported_overruns)
+
+        drops = {str(s.addr): s.drops for s in self._clients.values() if s.drops}
+        if drops and drops != self._reported_drops:
+            self._reported_drops = drops
+            self._log("client_drops", drops)
+
+    def _tune_socket(self, writer: asyncio.StreamWriter) -> None:
+        """accept 된 소켓에 TCP_NODELAY / SO_SNDBUF 적용."""
+        sock = writer.get_extra_info("socket")
+        if sock is None:
+            return
+        with suppress(OSError):
+            sock.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if self.tcp_nodelay else 0
+            )
+        if self.sndbuf:
+            with suppress(OSError):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+
+    # ---------- 포맷 구독 ----------
+    @staticmethod
+    def _codec_ok(codec: int, fmt: Optional[OutputFormat]) -> bool:
+        """코덱은 s16 에만, ADPCM 은 모노 s16 에만 적용 가능."""
+        if codec not in CODEC_NAMES:
+            return False
+        if codec == CODEC_PCM16 or fmt is None:
+            return True
+        if fmt.sample_format != SAMPLE_S16:
+            return False
+        return codec != CODEC_ADPCM or fmt.channels == 1
+
+    def _request_format(
+        self, session: ClientSession, rate: int, channels: int, sample_format: int
+    ) -> int:
+        """REQUEST_FORMAT 처리. rate == 0 이면 기본 스트림으로 복귀. 0 = 성공."""
+        if session.replaying or session.stream is not None or session.tagged:
+            # replay 중에는 기본 스트림 구독을 replay 태스크가 관리, 포맷 변환은 기본 스트림만
+            return 1
+        if rate == 0:
+            self._set_format(session, None)
+            return 0
+        if self.format_hub is None:
+            return 1
+        fmt = OutputFormat(rate, channels, sample_format)
+        try:
+            fmt.validate()
+        except ValueError:
+            return 1
+        if not self._codec_ok(session.codec, fmt):
+            return 1
+        self._set_format(session, fmt)
+        return 0
+
+    def _set_format(self, session: ClientSession, fmt: Optional[OutputFormat]) -> None:
+        """세션을 fmt 스트림으로 옮김. 구독자 없는 포맷 태스크는 정리."""
+        old = session.fmt
+        if old == fmt:
+            return
+        subs = self._subs.get(old)
+        if subs is not None:
+            subs.discard(session)
+        if old is not None:
+            self.format_hub.unsubscribe(old)
+            if not subs:
+                self._subs.pop(old, None)
+                task = self._format_tasks.pop(old, None)
+                if task is not None:
+                    task.cancel()
+
+        session.fmt = fmt
+        self._subs.setdefault(fmt, set()).add(session)
+        if fmt is not None:
+            ring = self.format_hub.subscribe(fmt)
+            if fmt not in self._format_tasks:
+                self._format_tasks[fmt] = asyncio.create_task(
+                    self._broadcast_ring(ring, fmt)
+                )
+
+    def _set_stream(self, session: ClientSession, name: Optional[str]) -> int:
+        """REQUEST_STREAM 처리: 세션을 이름 붙은 스트림으로 옮김 (None = 기본). 0 = 성공."""
+        if name not in self._subs or session.tagged:
+            return 1
+        if session.stream == name:
+            return 0
+        if session.replaying or session.fmt is not None:
+            return 1
+        self._subs[session.stream].discard(session)
+        session.stream = name
+        self._subs[name].add(session)
+        return 0
+
+    def _subscribe(self, session: ClientSession, op: int, name: Optional[str]) -> int:
+        """REQUEST_SUBSCRIBE 처리 (name None = 기본 스트림). 0 = 성공."""
+        subs = self._subs.get(name)
+        if subs is None or op not in (SUBSCRIBE_ADD, SUBSCRIBE_REMOVE):
+            return 1
+        if session.version < PROTOCOL_V2 or session.replaying or session.fmt is not None:
+            # 구독 모드 프레임은 v2 헤더 기반, 포맷 / replay 는 기본 스트림 전용
+            return 1
+        if not session.tagged:
+            # 첫 구독: 접속 때의 기본 스트림 (또는 6번 스트림) 구독에서 빠지고 구독 모드로
+            self._subs[session.stream].discard(session)
+            session.stream = None
+            session.tagged = True
+        if op == SUBSCRIBE_ADD:
+            subs.add(session)
+            session.subscriptions.add(name)
+        else:
+            subs.discard(session)
+            session.subscriptions.discard(name)
+        return 0
+
+    def _subscribe_ack(self, status: int, op: int, stream_id: int, name: Optional[str]) -> bytes:
+        raw = (name or "").encode("utf-8")
+        size = SUBSCRIBE_ACK.size - AUDIO_HEADER.size + len(raw)
+        return (
+            SUBSCRIBE_ACK.pack(self.checkcode, REQUEST_SUBSCRIBE, size, status, op, stream_id)
+            + raw
+        )
+
     async def _handle_client(
         self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
     ) -> None:
         addr = writer.get_extra_info("peername")
-        self._clients.add(writer)
+        self._tune_socket(writer)
+        session = ClientSession(
+            writer,
+            addr,
+            self.client_queue_size,
+            self.slow_policy,
+            self.max_behind_sec,
+            self.coalesce,
+            self.metrics,
+        )
+        session.task = asyncio.create_task(session.run())
+        self._clients[writer] = session
+        self._subs[None].add(session)
         # self._log(f"[CLIENT] connected: {addr}, total={len(self._clients)}")
         self._log("status", f"[CLIENT] connected: {addr}, total={len(self._clients)}")
         self._log("client_count", len(self._clients))
 
+        decoder = FrameDecoder(
+            self.checkcode, REQUEST_BODY_SIZES, REQUEST_SIZED, capacity=REQUEST_READ_SIZE
+        )
         try:
             while not self._stop_event.is_set():
                 try:
-                    header = await reader.readexactly(8)
-                except asyncio.IncompleteReadError:
+                    data = await reader.read(REQUEST_READ_SIZE)
+                except ConnectionError:
                     break
-
-                recv_checkcode, cmd = struct.unpack("<ii", header)
-                if recv_checkcode != self.checkcode:
-                    self._log(
-                        f"[CLIENT {addr}] invalid checkcode: {recv_checkcode}"
-                    )
+                if not data:
                     break
-
-                if cmd == REQUEST_PING:
-                    # PING ACK
-                    ack = struct.pack("<iiB", self.checkcode, REQUEST_PING, 0)
-                    try:
-                        writer.write(ack)
-                        await writer.drain()
-                    except Exception as e:
-                        self._log(f"[CLIENT {addr}] ping ack fail: {e}")
-                        break
-                    self._log(f"[CLIENT {addr}] ping ok")
-
-                else:
-                    # 현재 프로토콜상 클라→서버로 다른 명령은 무시
-                    self._log(f"[CLIENT {addr}] unknown cmd={cmd}, ignored")
+                decoder.feed(data)
+                skipped = decoder.skipped
+                try:
+                    for cmd, body in decoder.frames():
+                        if not await self._handle_request(session, cmd, body):
+                            return
+                except FrameError as e:
+                    self._log(f"[CLIENT {addr}] {e}")
+                    break
+                if decoder.skipped != skipped:
+                    # 현재 프로토콜상 클라→서버로 다른 명령은 무시 (size 만큼 건너뜀)
+                    self._log(f"[CLIENT {addr}] unknown cmd ignored ({decoder.skipped})")
 
         finally:
-            self._clients.discard(writer)            
+            self._clients.pop(writer, None)
+            if session.replay_task is not None:
+                session.replay_task.cancel()
+            self._set_format(session, None)
+            self._subs[None].discard(session)
+            if session.stream is not None:
+                self._subs.get(session.stream, set()).discard(session)
+            for name in session.subscriptions:
+                self._subs.get(name, set()).discard(session)
+            session.close()
+            session.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await session.task
+            if session.drops:
+                self._log(
+                    "status",
+                    f"[CLIENT] {addr} dropped {session.drops} packets ({self.slow_policy})",
+                )
             try:
                 writer.close()
                 with suppress(Exception):
@@ -148,55 +890,408 @@ class NetAudioServer:
             self._log("status", f"[CLIENT] disconnected: {addr}, total={len(self._clients)}")
             self._log("client_count", len(self._clients))
 
+    async def _handle_request(self, session: ClientSession, cmd: int, body) -> bool:
+        """클라이언트 요청 1개 처리 후 ACK. False 면 연결 종료."""
+        writer = session.writer
+        addr = session.addr
+        if cmd == REQUEST_PING:
+            # PING ACK
+            ack = struct.pack("<iiB", self.checkcode, REQUEST_PING, 0)
+            try:
+                writer.write(ack)
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] ping ack fail: {e}")
+                return False
+            self._log(f"[CLIENT {addr}] ping ok")
+
+        elif cmd == REQUEST_PING_V2:
+            (version,) = INT_FIELD.unpack(body)
+            status = 0 if version in (PROTOCOL_V1, PROTOCOL_V2, PROTOCOL_V3) else 1
+            if status == 0:
+                session.version = version
+            ack = PING_V2_ACK.pack(
+                self.checkcode, REQUEST_PING_V2, status, time.monotonic_ns()
+            )
+            try:
+                writer.write(ack)
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] ping ack fail: {e}")
+                return False
+            self._log("status", f"[CLIENT {addr}] ping ok (v{session.version})")
+
+        elif cmd == REQUEST_CODEC:
+            (codec,) = INT_FIELD.unpack(body)
+            status = 0 if self._codec_ok(codec, session.fmt) else 1
+            if status == 0:
+                session.codec = codec
+            ack = struct.pack("<iiB", self.checkcode, REQUEST_CODEC, status)
+            try:
+                writer.write(ack)
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] codec ack fail: {e}")
+                return False
+            self._log(
+                "status",
+                f"[CLIENT {addr}] codec={CODEC_NAMES.get(codec, codec)}"
+                + ("" if status == 0 else " unsupported"),
+            )
+
+        elif cmd == REQUEST_FORMAT:
+            rate, channels, sample_format = FORMAT_REQUEST.unpack(body)
+            status = self._request_format(session, rate, channels, sample_format)
+            ack = struct.pack("<iiB", self.checkcode, REQUEST_FORMAT, status)
+            try:
+                writer.write(ack)
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] format ack fail: {e}")
+                return False
+            self._log(
+                "status",
+                f"[CLIENT {addr}] format={session.fmt or 'default'}"
+                + ("" if status == 0 else " rejected"),
+            )
+
+        elif cmd == REQUEST_STREAM:
+            try:
+                name = bytes(body[:MAX_STREAM_NAME]).decode("utf-8")
+                status = self._set_stream(session, name or None)
+            except UnicodeDecodeError:
+                status = 1
+            ack = STREAM_ACK.pack(self.checkcode, REQUEST_STREAM, 1, status)
+            try:
+                writer.write(ack)
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] stream ack fail: {e}")
+                return False
+            if status == 0:
+                self._log("status", f"[CLIENT {addr}] stream={session.stream or 'default'}")
+            else:
+                self._log("status", f"[CLIENT {addr}] stream={bytes(body[:MAX_STREAM_NAME])!r} rejected")
+
+        elif cmd == REQUEST_SUBSCRIBE:
+            op = body[0] if len(body) else -1
+            try:
+                name = bytes(body[1 : 1 + MAX_STREAM_NAME]).decode("utf-8") or None
+                status = self._subscribe(session, op, name)
+            except UnicodeDecodeError:
+                name, status = None, 1
+            stream_id = self._stream_ids.get(name, DEFAULT_STREAM_ID) if status == 0 else 0
+            try:
+                writer.write(self._subscribe_ack(status, max(op, 0), stream_id, name))
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] subscribe ack fail: {e}")
+                return False
+            action = "subscribe" if op == SUBSCRIBE_ADD else "unsubscribe"
+            self._log(
+                "status",
+                f"[CLIENT {addr}] {action} {name or 'default'}"
+                + (f" (id={stream_id})" if status == 0 else " rejected"),
+            )
+
+        elif cmd == REQUEST_REPLAY:
+            if len(body) < REPLAY_REQUEST.size:
+                self._log(f"[CLIENT {addr}] replay request too short ({len(body)})")
+                return False
+            mode, value = REPLAY_REQUEST.unpack_from(body, 0)
+            start = self._replay_start(session, mode, value)
+            status = 0 if start is not None else 1
+            chunks = self.history.last_seq - start + 1 if start is not None else 0
+            ack = REPLAY_ACK.pack(
+                self.checkcode,
+                REQUEST_REPLAY,
+                REPLAY_ACK_BODY.size,
+                status,
+                -1 if start is None else start,
+                chunks,
+            )
+            try:
+                writer.write(ack)
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] replay ack fail: {e}")
+                return False
+            if start is None:
+                self._log("status", f"[CLIENT {addr}] replay rejected (mode={mode}, value={value})")
+            else:
+                self._start_replay(session, start)
+                self._log("status", f"[CLIENT {addr}] replay from seq {start} ({chunks} chunks)")
+
+        elif cmd == REQUEST_STATS:
+            body = self.metrics.snapshot_json()
+            try:
+                writer.write(
+                    struct.pack("<iii", self.checkcode, REQUEST_STATS, len(body)) + body
+                )
+                await writer.drain()
+            except Exception as e:
+                self._log(f"[CLIENT {addr}] stats fail: {e}")
+                return False
+        return True
+
+    # ---------- replay ----------
+    def _replay_start(self, session: ClientSession, mode: int, value: int) -> Optional[int]:
+        """replay 시작 seq (보관 구간으로 제한). 불가하면 None."""
+        hist = self.history
+        if hist is None or not len(hist) or session.fmt is not None:
+            return None
+        if session.stream is not None or session.tagged:
+            return None
+        if mode == REPLAY_FROM_SEQ:
+            seq = value
+        elif mode == REPLAY_LAST_MS and value >= 0:
+            seq = hist.seq_for_time(time.monotonic_ns() - value * 1_000_000)
+        else:
+            return None
+        entry = hist.entry_from(seq)
+        return None if entry is None else entry[0]
+
+    def _start_replay(self, session: ClientSession, start: int) -> None:
+        """세션을 라이브 구독에서 빼고 start 부터 다시 보냄 (큐에 남은 라이브 프레임은 버림)."""
+        if session.replay_task is not None:
+            session.replay_task.cancel()
+        self._subs[None].discard(session)
+        session.queue.clear()
+        session.replay_task = asyncio.create_task(self._replay(session, start))
+
+    async def _replay(self, session: ClientSession, seq: int) -> None:
+        """
+        history 를 송신 큐가 허락하는 만큼 빠르게 보낸 뒤, 마지막 청크까지 보냈으면
+        같은 루프 차례 안에서 라이브 구독으로 복귀 (다음 _fanout 부터 이어짐 → 중복 / 빈틈 없음).
+        """
+        hist = self.history
+        # 라이브 스트림 ADPCM 상태에 영향이 없도록 전용 인코더
+        encoder = ChunkEncoder()
+        sent = 0
+        while not session.closing:
+            entry = hist.entry_from(seq)
+            if entry is None:
+                self._subs[None].add(session)
+                self._log("status", f"[CLIENT {session.addr}] replay done ({sent} chunks), live")
+                return
+            eseq, stamp_ns, flags, data = entry
+            session.push(
+                self._session_frame(session, encoder, data, eseq, stamp_ns, hist.sample_rate, flags)
+            )
+            seq = eseq + 1
+            sent += 1
+            await session.wait_space()
+
+    def _session_frame(
+        self,
+        session: ClientSession,
+        encoder: ChunkEncoder,
+        data,
+        seq: int,
+        stamp_ns: int,
+        sample_rate: int,
+        flags: int,
+    ) -> memoryview:
+        """세션 1개용 프레임 (replay 처럼 공유할 상대가 없을 때)."""
+        if flags & FLAG_SILENT and session.version >= PROTOCOL_V3:
+            return build_silence_frame(
+                self.checkcode, seq, stamp_ns, sample_rate, _frame_count(data, None)
+            )
+        payload = encoder.encode(session.codec, data)
+        if session.version >= PROTOCOL_V2:
+            return build_audio_frame_v2(self.checkcode, seq, stamp_ns, sample_rate, payload)
+        return build_audio_frame(self.checkcode, payload)
+
+    def _blocking_get(self):
+        """일반 queue.Queue 용: executor 스레드에서 대기. 서버가 멈추는 중이면 꺼낸 청크는 되돌림."""
+        try:
+            item = self.send_queue.get(timeout=0.2)
+        except queue.Empty:
+            return None
+        if self._stop_event.is_set():
+            self._requeue(item)
+            return None
+        return item
+
+    def _requeue(self, item) -> None:
+        """꺼냈지만 분배하지 못한 청크를 큐 앞으로 (다음 start 때 순서 그대로 이어짐)."""
+        q = self.send_queue
+        with q.mutex:
+            # get 에서 task_done 전이므로 unfinished_tasks 는 그대로
+            if isinstance(q.queue, deque):
+                q.queue.appendleft(item)
+            else:
+                q._put(item)
+            q.not_empty.notify()
+
     async def _broadcast_loop(self) -> None:
         """
         send_queue 에 들어온 오디오 청크를
-        현재 접속한 모든 클라이언트로 전송.
+        현재 접속한 모든 클라이언트의 송신 큐로 분배.
+        - PcmRing 이면 자체 커서로 읽고, commit 알림으로 깨어난다.
+        - NotifyQueue 면 put 시점에 바로 깨어나고, 비어 있으면 잠든다.
+        - 일반 queue.Queue 면 executor 에서 blocking get 으로 대기.
         """
-        while not self._stop_event.is_set():
-            try:
-                data = self.send_queue.get_nowait()
-            except queue.Empty:
-                await asyncio.sleep(0.01)
-                continue
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
 
-            if not self._clients:
-                # 접속자가 없으면 그냥 버림
-                continue
+        if isinstance(self.send_queue, PcmRing):
+            await self._broadcast_ring(self.send_queue)
+            return
 
-            header = struct.pack("<ii", self.checkcode, REQUEST_AUDIO)
-            size = struct.pack("<i", len(data))
-            packet = header + size + data
+        notify = isinstance(self.send_queue, NotifyQueue)
+        if notify:
+            self.send_queue.set_notify(loop, wakeup.set)
 
-            dead_clients = []
+        try:
+            await self._broadcast_run(loop, wakeup, notify)
+        finally:
+            if notify:
+                self.send_queue.set_notify(None)
 
-            # 전송
-            for w in list(self._clients):
-                try:
-                    w.write(packet)
-                except Exception:
-                    dead_clients.append(w)
+    async def _broadcast_ring(self, ring: PcmRing, key: StreamKey = None) -> None:
+        """링 1개를 커서로 따라가며 key 스트림 구독자에게 분배."""
+        wakeup = asyncio.Event()
+        lid = ring.add_listener(asyncio.get_running_loop(), wakeup.set)
+        cursor = ring.cursor()
+        if key is None:
+            self._cursor = cursor
+        try:
+            while not self._stop_event.is_set():
+                item = cursor.next()
+                if item is None:
+                    wakeup.clear()
+                    # clear 직전에 들어온 commit 을 놓치지 않도록 재확인
+                    if cursor.lag:
+                        continue
+                    await wakeup.wait()
                     continue
+                seq, view = item
+                self._fanout(
+                    view, key, seq, ring.stamp(seq), ring.sample_rate, ring.flags(seq)
+                )
+        finally:
+            ring.remove_listener(lid)
 
-            # drain
-            for w in list(self._clients):
-                if w in dead_clients:
+    async def _broadcast_run(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        wakeup: asyncio.Event,
+        notify: bool,
+    ) -> None:
+        while not self._stop_event.is_set():
+            if notify:
+                try:
+                    data = self.send_queue.get_nowait()
+                except queue.Empty:
+                    wakeup.clear()
+                    # clear 직전에 들어온 put 을 놓치지 않도록 재확인
+                    if self.send_queue.qsize():
+                        continue
+                    await wakeup.wait()
                     continue
+            else:
+                fut = loop.run_in_executor(None, self._blocking_get)
                 try:
-                    await w.drain()
-                except Exception:
-                    dead_clients.append(w)
+                    # stop 때 취소돼도 executor 의 get 은 계속 돌므로, 결과를 버리지 않게 shield
+                    data = await asyncio.shield(fut)
+                except asyncio.CancelledError:
+                    fut.add_done_callback(self._requeue_result)
+                    raise
+                if data is None:
+                    continue
 
-            # 에러난 클라 정리
-            for w in dead_clients:
-                self._clients.discard(w)
-                try:
-                    w.close()
-                    with suppress(Exception):
-                        await w.wait_closed()
-                except Exception:
-                    pass
-            if dead_clients:
-                self._log(
-                    f"[SERVER] removed {len(dead_clients)} dead clients, total={len(self._clients)}"
-                )
\ No newline at end of file
+            # queue 입력은 seq / 캡처 시각이 없으므로 서버에서 부여
+            seq = self._queue_seq
+            self._queue_seq += 1
+            self._fanout(data, None, seq, time.monotonic_ns(), self.sample_rate)
+
+    def _requeue_result(self, fut: asyncio.Future) -> None:
+        if not fut.cancelled() and fut.exception() is None and fut.result() is not None:
+            self._requeue(fut.result())
+
+    def _fanout(
+        self,
+        data,
+        key: StreamKey = None,
+        seq: int = 0,
+        stamp_ns: int = 0,
+        sample_rate: int = 0,
+        flags: int = 0,
+    ) -> None:
+        payloads = {}
+        if key is None and self.history is not None:
+            self.history.sample_rate = sample_rate
+            self.history.append(seq, stamp_ns, data, flags)
+        if key is None and self.multicast is not None:
+            # 멀티캐스트는 TCP 구독자와 무관하게 청크당 1회
+            mc = self.multicast
+            payload = payloads[mc.codec] = self._codec_encoder.encode(mc.codec, data)
+            mc.send(seq, stamp_ns, sample_rate, payload)
+
+        subs = self._subs.get(key)
+        if not subs:
+            # 구독자가 없으면 그냥 버림
+            return
+
+        encoder = self._codec_encoder
+        if key is not None:
+            encoder = self._stream_encoders.get(key)
+            if encoder is None:
+                encoder = self._stream_encoders[key] = ChunkEncoder()
+        # 프레임은 청크당 (코덱, 버전)별로 1회만 만들고, 같은 조합 클라이언트가 view 공유
+        frames = {}
+        silence = None
+        for sess in list(subs):
+            if sess.tagged:
+                # 구독 모드: 스트림 ID 가 붙은 프레임 (무음 / 코덱별로 1회)
+                silent = bool(flags & FLAG_SILENT) and sess.version >= PROTOCOL_V3
+                fkey = ("stream", None if silent else sess.codec)
+                packet = frames.get(fkey)
+                if packet is None:
+                    stream_id = self._stream_ids.get(key, DEFAULT_STREAM_ID)
+                    if silent:
+                        packet = build_stream_silence_frame(
+                            self.checkcode,
+                            stream_id,
+                            seq,
+                            stamp_ns,
+                            sample_rate,
+                            _frame_count(data, key),
+                        )
+                    else:
+                        payload = payloads.get(sess.codec)
+                        if payload is None:
+                            payload = payloads[sess.codec] = encoder.encode(sess.codec, data)
+                        packet = build_stream_frame(
+                            self.checkcode, stream_id, seq, stamp_ns, sample_rate, payload
+                        )
+                    frames[fkey] = packet
+                sess.push(packet)
+                continue
+            if flags & FLAG_SILENT and sess.version >= PROTOCOL_V3:
+                # 무음 구간: 인코딩 없이 고정 32바이트 프레임 (v1 / v2 는 PCM 그대로)
+                if silence is None:
+                    silence = build_silence_frame(
+                        self.checkcode, seq, stamp_ns, sample_rate, _frame_count(data, key)
+                    )
+                sess.push(silence)
+                continue
+            # v3 의 오디오 프레임은 v2 와 같음
+            fkey = (sess.codec, min(sess.version, PROTOCOL_V2))
+            packet = frames.get(fkey)
+            if packet is None:
+                payload = payloads.get(sess.codec)
+                if payload is None:
+                    payload = payloads[sess.codec] = encoder.encode(
+                        sess.codec, data
+                    )
+                if sess.version >= PROTOCOL_V2:
+                    packet = build_audio_frame_v2(
+                        self.checkcode, seq, stamp_ns, sample_rate, payload
+                    )
+                else:
+                    packet = build_audio_frame(self.checkcode, payload)
+                frames[fkey] = packet
+            # 클라이언트별 큐에 적재만 하고, 실제 write/drain 은 각 세션 태스크가 담당
+            sess.push(packet)
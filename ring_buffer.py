@@ -0,0 +1,346 @@
+# ring_buffer.py
+import asyncio
+import threading
+import time
+from contextlib import suppress
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_SLOTS = 256
+DEFAULT_SLOT_BYTES = 4096
+
+# 슬롯 플래그 (commit 시 생산자가 지정)
+FLAG_SILENT = 0x01   # 무음 게이트가 닫힌 청크 (PCM 은 그대로 기록, 송신 쪽에서 무음 프레임으로 대체 가능)
+
+
+class PcmRing:
+    """
+    단일 생산자 / 다중 소비자 PCM 링버퍼.
+    - (slots, slot_bytes) uint8 배열을 미리 잡아 두고 청크를 슬롯에 기록.
+    - 청크마다 단조 증가 시퀀스 번호와 캡처 시각(monotonic ns), 플래그(FLAG_SILENT 등)를 부여.
+    - 소비자는 각자 RingCursor 로 읽으며, 슬롯의 view 를 복사 없이 받음.
+    - 생산자는 절대 막히지 않음. 소비자가 너무 밀리면 overrun 으로 집계.
+
+    생산자:
+        buf = ring.claim(nbytes)   # 슬롯 view (uint8)
+        ...buf 에 직접 기록...
+        ring.commit(nbytes)
+
+    소비자가 받은 view 는 생산자가 slots-1 개를 더 쓰기 전까지 유효.
+    """
+
+    def __init__(
+        self,
+        slots: int = DEFAULT_SLOTS,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        sample_rate: int = 0,
+    ) -> None:
+        self.slots = max(2, slots)
+        # 청크 샘플레이트 (생산자가 설정, v2 헤더용. 0 = 모름)
+        self.sample_rate = sample_rate
+        self._data = np.zeros((self.slots, slot_bytes), dtype=np.uint8)
+        self._lengths = np.zeros(self.slots, dtype=np.int32)
+        self._seqs = np.full(self.slots, -1, dtype=np.int64)
+        self._stamps = np.zeros(self.slots, dtype=np.int64)
+        self._flags = np.zeros(self.slots, dtype=np.uint8)
+
+        # 다음에 기록될 시퀀스 번호 (= 지금까지 commit 된 청크 수)
+        self.head = 0
+        self._claimed = False
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._listeners: Dict[int, Tuple[asyncio.AbstractEventLoop, Callable]] = {}
+        self._next_listener = 0
+
+    @property
+    def slot_bytes(self) -> int:
+        return self._data.shape[1]
+
+    # ---------- 생산자 ----------
+    def claim(self, nbytes: int) -> np.ndarray:
+        """다음 슬롯을 nbytes 이상 확보해서 쓰기용 view 반환."""
+        if nbytes > self.slot_bytes:
+            self._grow(nbytes)
+        idx = self.head % self.slots
+        # 덮어쓸 슬롯은 commit 전까지 무효 처리
+        self._seqs[idx] = -1
+        self._claimed = True
+        return self._data[idx]
+
+    def commit(self, nbytes: int, stamp_ns: Optional[int] = None, flags: int = 0) -> int:
+        """
+        claim 한 슬롯에 nbytes 기록 완료. 부여된 시퀀스 번호 반환.
+        stamp_ns : 캡처 시각 (time.monotonic_ns). 없으면 commit 시각.
+        flags    : FLAG_SILENT 등
+        """
+        if not self._claimed:
+            raise RuntimeError("commit() without claim()")
+        seq = self.head
+        idx = seq % self.slots
+        self._lengths[idx] = nbytes
+        self._stamps[idx] = time.monotonic_ns() if stamp_ns is None else stamp_ns
+        self._flags[idx] = flags
+        self._seqs[idx] = seq
+        self._claimed = False
+        with self._cond:
+            self.head = seq + 1
+            self._cond.notify_all()
+        self._notify()
+        return seq
+
+    def write(self, data, stamp_ns: Optional[int] = None, flags: int = 0) -> int:
+        """bytes-like 한 청크를 복사해서 기록 (claim + commit)."""
+        mv = memoryview(data).cast("B")
+        n = len(mv)
+        self.claim(n)[:n] = mv
+        return self.commit(n, stamp_ns, flags)
+
+    def _grow(self, nbytes: int) -> None:
+        # 기존 view 는 예전 배열을 그대로 참조하므로 안전
+        data = np.zeros((self.slots, nbytes), dtype=np.uint8)
+        data[:, : self.slot_bytes] = self._data
+        self._data = data
+
+    # ---------- 소비자 ----------
+    @property
+    def oldest(self) -> int:
+        """아직 읽을 수 있는 가장 오래된 시퀀스 (claim 중인 슬롯 1개 제외)."""
+        return max(0, self.head - self.slots + 1)
+
+    def cursor(self, from_seq: Optional[int] = None) -> "RingCursor":
+        """소비자 커서 생성. 기본은 최신(live) 위치부터."""
+        return RingCursor(self, self.head if from_seq is None else from_seq)
+
+    def get(self, seq: int) -> Optional[memoryview]:
+        """seq 청크의 view. 이미 덮어써졌거나 아직 없으면 None."""
+        idx = seq % self.slots
+        if self._seqs[idx] != seq:
+            return None
+        return memoryview(self._data[idx, : self._lengths[idx]])
+
+    def stamp(self, seq: int) -> int:
+        """seq 청크의 캡처 시각 (monotonic ns). get() 직후에 호출."""
+        return int(self._stamps[seq % self.slots])
+
+    def flags(self, seq: int) -> int:
+        """seq 청크의 플래그. get() 직후에 호출."""
+        return int(self._flags[seq % self.slots])
+
+    def wait(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """(스레드용) head 가 seq 를 넘을 때까지 대기."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.head > seq, timeout)
+
+    # ---------- asyncio 알림 ----------
+    def add_listener(
+        self, loop: asyncio.AbstractEventLoop, callback: Callable[[], None]
+    ) -> int:
+        """commit 마다 loop.call_soon_threadsafe(callback) 호출. 해제용 id 반환."""
+        with self._lock:
+            lid = self._next_listener
+            self._next_listener += 1
+            self._listeners[lid] = (loop, callback)
+        return lid
+
+    def remove_listener(self, lid: int) -> None:
+        with self._lock:
+            self._listeners.pop(lid, None)
+
+    def _notify(self) -> None:
+        for lid, (loop, callback) in tuple(self._listeners.items()):
+            try:
+                loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                # 루프가 이미 닫힘
+                self.remove_listener(lid)
+
+
+class RingCursor:
+    """PcmRing 소비자 1개의 읽기 위치."""
+
+    def __init__(self, ring: PcmRing, seq: int) -> None:
+        self.ring = ring
+        self.seq = seq
+        self.overruns = 0   # 놓친 청크 수 누적
+
+    @property
+    def lag(self) -> int:
+        """아직 읽지 않은 청크 수."""
+        return max(0, self.ring.head - self.seq)
+
+    def next(self) -> Optional[Tuple[int, memoryview]]:
+        """
+        다음 청크 (seq, view). 읽을 게 없으면 None.
+        밀려서 덮어써진 청크는 건너뛰고 overruns 에 집계.
+        """
+        ring = self.ring
+        while self.seq < ring.head:
+            oldest = ring.oldest
+            if self.seq < oldest:
+                self.overruns += oldest - self.seq
+                self.seq = oldest
+            seq = self.seq
+            view = ring.get(seq)
+            self.seq += 1
+            if view is not None:
+                return seq, view
+            self.overruns += 1
+        return None
+
+    def skip_to_live(self) -> int:
+        """밀린 청크를 버리고 최신 위치로 이동. 버린 개수 반환."""
+        skipped = self.lag
+        self.seq = self.ring.head
+        return skipped
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    """
+    기존 공유 메모리에 붙기. 3.13+ 는 track=False 로 resource_tracker 등록을 생략.
+    3.12 이하는 등록되지만, spawn 한 워커는 부모와 같은 tracker 를 쓰므로
+    생성자(owner)가 unlink 하기 전에는 지워지지 않음.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedPcmRing(PcmRing):
+    """
+    multiprocessing.shared_memory 위의 PcmRing (프로세스 간 단일 생산자 / 다중 소비자).
+    - 생산자(캡처) 프로세스: SharedPcmRing(slots, slot_bytes) 로 생성, 끝나면 close().
+    - 소비자(워커) 프로세스: SharedPcmRing.attach(name).
+    슬롯 크기는 고정 (claim 이 slot_bytes 를 넘으면 ValueError).
+    다른 프로세스의 commit 은 알 수 없으므로, 소비자 쪽 listener 는
+    poll_interval 마다 head 를 확인하는 스레드가 깨움.
+
+    레이아웃: int64[4] 헤더 (head, sample_rate, slots, slot_bytes)
+              + int32 lengths[slots] + int64 seqs[slots] + int64 stamps[slots]
+              + uint8 flags[slots] + uint8 data[slots, slot_bytes]
+    """
+
+    _HEADER = 4
+
+    def __init__(
+        self,
+        slots: int = DEFAULT_SLOTS,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        sample_rate: int = 0,
+        name: Optional[str] = None,
+        poll_interval: float = 0.001,
+    ) -> None:
+        if name is None:
+            slots = max(2, slots)
+            self.owner = True
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=self._layout_size(slots, slot_bytes)
+            )
+        else:
+            self.owner = False
+            self._shm = _attach_shm(name)
+        buf = self._shm.buf
+        self._hdr = np.ndarray((self._HEADER,), dtype=np.int64, buffer=buf)
+        if self.owner:
+            self._hdr[:] = (0, sample_rate, slots, slot_bytes)
+        slots, slot_bytes = int(self._hdr[2]), int(self._hdr[3])
+        self.slots = slots
+
+        off = self._HEADER * 8
+        self._lengths = np.ndarray((slots,), np.int32, buf, off)
+        off += slots * 4
+        self._seqs = np.ndarray((slots,), np.int64, buf, off)
+        off += slots * 8
+        self._stamps = np.ndarray((slots,), np.int64, buf, off)
+        off += slots * 8
+        self._flags = np.ndarray((slots,), np.uint8, buf, off)
+        off += slots
+        self._data = np.ndarray((slots, slot_bytes), np.uint8, buf, off)
+        if self.owner:
+            self._seqs[:] = -1
+
+        self._claimed = False
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._listeners: Dict[int, Tuple[asyncio.AbstractEventLoop, Callable]] = {}
+        self._next_listener = 0
+        self.poll_interval = poll_interval
+        self._poller: Optional[threading.Thread] = None
+
+    @classmethod
+    def attach(cls, name: str, poll_interval: float = 0.001) -> "SharedPcmRing":
+        return cls(name=name, poll_interval=poll_interval)
+
+    @classmethod
+    def _layout_size(cls, slots: int, slot_bytes: int) -> int:
+        return cls._HEADER * 8 + slots * (4 + 8 + 8 + 1) + slots * slot_bytes
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    # head / sample_rate 는 공유 헤더에 둬서 다른 프로세스에서도 보이게
+    @property
+    def head(self) -> int:
+        return int(self._hdr[0])
+
+    @head.setter
+    def head(self, value: int) -> None:
+        self._hdr[0] = value
+
+    @property
+    def sample_rate(self) -> int:
+        return int(self._hdr[1])
+
+    @sample_rate.setter
+    def sample_rate(self, value: int) -> None:
+        self._hdr[1] = value
+
+    def _grow(self, nbytes: int) -> None:
+        raise ValueError(f"chunk {nbytes} bytes > shared slot {self.slot_bytes} bytes")
+
+    def wait(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """(스레드용) head 가 seq 를 넘을 때까지 polling 대기."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.head <= seq:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def add_listener(
+        self, loop: asyncio.AbstractEventLoop, callback: Callable[[], None]
+    ) -> int:
+        lid = super().add_listener(loop, callback)
+        if not self.owner and self._poller is None:
+            self._poller = threading.Thread(target=self._poll, daemon=True)
+            self._poller.start()
+        return lid
+
+    def _poll(self) -> None:
+        last = self.head
+        while self._shm is not None:
+            head = self.head
+            if head != last:
+                last = head
+                self._notify()
+            time.sleep(self.poll_interval)
+
+    def close(self) -> None:
+        """공유 메모리 해제 (생산자는 unlink 까지). 이후 이 링은 사용 불가."""
+        shm, self._shm = self._shm, None
+        if shm is None:
+            return
+        if self._poller is not None:
+            self._poller.join(timeout=1.0)
+            self._poller = None
+        # shm.close() 전에 버퍼를 참조하는 배열부터 해제
+        self._hdr = self._lengths = self._seqs = self._stamps = self._flags = self._data = None
+        with suppress(BufferError):
+            shm.close()
+        if self.owner:
+            with suppress(FileNotFoundError):
+                shm.unlink()
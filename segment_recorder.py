@@ -0,0 +1,201 @@
+# segment_recorder.py
+"""
+장시간 녹음용 분할 레코더.
+
+- write() 는 수신 루프(이벤트 루프 스레드)에서 호출: 메모리 버퍼에 이어 붙이기만 하고,
+  batch_bytes 가 차면 전용 writer 스레드로 넘김 → 디스크가 느려도 소켓 수신은 안 막힘.
+- writer 큐가 max_pending 개 이상 밀리면 새 배치를 버리고 dropped_bytes 에 집계
+  (무한정 메모리를 쓰는 것보다 구멍이 나는 편이 낫다).
+- segment_seconds 마다 새 WAV 파일로 넘김 (파일마다 헤더가 정확하고 크기가 제한됨).
+  0 이면 분할 없이 파일 1개.
+- <stem>.index.json : 세그먼트별 파일명 / 시작 시각 / 스트림 기준 바이트 오프셋 / 프레임 수.
+  세그먼트를 닫을 때마다 갱신 (임시 파일 → replace).
+  시작 시각은 배치마다 첫 데이터 수신 시각(epoch)을 같이 넘겨서 계산
+  (버린 배치 / 네트워크 정체가 있어도 뒤 세그먼트 시각이 밀리지 않음).
+
+    rec = SegmentedRecorder("capture.wav", 16000, 1, segment_seconds=600)
+    rec.start()
+    rec.write(pcm16_bytes)   # 수신 루프에서
+    rec.close()
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import wave
+from typing import List, Optional, Tuple
+
+DEFAULT_SEGMENT_SECONDS = 600.0
+DEFAULT_BATCH_BYTES = 256 * 1024
+DEFAULT_MAX_PENDING = 64   # 256 KiB x 64 = 16 MiB 까지 디스크 지연 흡수
+
+
+class SegmentedRecorder:
+    def __init__(
+        self,
+        base_path: str,
+        sample_rate: int,
+        channels: int = 1,
+        sampwidth: int = 2,
+        segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+        batch_bytes: int = DEFAULT_BATCH_BYTES,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.base_path = base_path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sampwidth = sampwidth
+        self.frame_bytes = channels * sampwidth
+        self.segment_seconds = segment_seconds
+        # 세그먼트 경계가 프레임 중간에 걸리지 않도록 프레임 단위로 계산
+        self.segment_bytes = (
+            int(segment_seconds * sample_rate) * self.frame_bytes
+            if segment_seconds > 0
+            else 0
+        )
+        self.batch_bytes = max(self.frame_bytes, batch_bytes)
+
+        stem, ext = os.path.splitext(base_path)
+        self._stem = stem
+        self._ext = ext or ".wav"
+        self.index_path = stem + ".index.json"
+
+        self._batch = bytearray()
+        self._batch_t: Optional[float] = None   # 배치 첫 데이터 수신 시각 (epoch)
+        self._q: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue(max(1, max_pending))
+        self._thread: Optional[threading.Thread] = None
+
+        # writer 스레드 상태
+        self._wf: Optional[wave.Wave_write] = None
+        self._seg_written = 0
+        self.segments: List[dict] = []
+
+        # 수신 스레드 쪽 집계
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        self.error: Optional[Exception] = None
+
+    # ---------- 수신 루프 쪽 ----------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def write(self, data) -> None:
+        """payload 를 배치 버퍼에 추가. 디스크 I/O 없음."""
+        if self._batch_t is None:
+            self._batch_t = time.time()
+        self._batch += data
+        self.total_bytes += len(data)
+        if len(self._batch) >= self.batch_bytes:
+            self._handoff()
+
+    def _handoff(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = bytes(self._batch), bytearray()
+        t, self._batch_t = self._batch_t, None
+        try:
+            self._q.put_nowait((t, batch))
+        except queue.Full:
+            self.dropped_bytes += len(batch)
+
+    def close(self) -> None:
+        """남은 배치까지 기록하고 writer 스레드 종료 (마지막 세그먼트 헤더 / 인덱스 확정)."""
+        if self._thread is None:
+            return
+        self._handoff()
+        self._q.put(None)   # 종료 표시는 밀려 있어도 반드시 전달
+        self._thread.join()
+        self._thread = None
+
+    # ---------- writer 스레드 ----------
+    def _segment_path(self, n: int) -> str:
+        if not self.segment_bytes:
+            return self._stem + self._ext
+        return f"{self._stem}_{n:05d}{self._ext}"
+
+    def _open_segment(self, start_time: float) -> None:
+        n = len(self.segments)
+        path = self._segment_path(n)
+        offset = sum(s["bytes"] for s in self.segments)
+        start_frame = offset // self.frame_bytes
+        wf = wave.open(path, "wb")
+        wf.setnchannels(self.channels)
+        wf.setsampwidth(self.sampwidth)
+        wf.setframerate(self.sample_rate)
+        self._wf = wf
+        self._seg_written = 0
+        self.segments.append(
+            {
+                "index": n,
+                "file": os.path.basename(path),
+                # 세그먼트 첫 샘플이 든 배치의 수신 시각 + 배치 안 위치
+                "start_time": round(start_time, 6),
+                "start_frame": start_frame,
+                "byte_offset": offset,
+                "bytes": 0,
+                "frames": 0,
+            }
+        )
+
+    def _close_segment(self) -> None:
+        if self._wf is None:
+            return
+        self._wf.close()   # 여기서 RIFF / data 크기가 확정됨
+        self._wf = None
+        self._write_index()
+
+    def _write_index(self) -> None:
+        doc = {
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "sampwidth": self.sampwidth,
+            "segment_seconds": self.segment_seconds,
+            "dropped_bytes": self.dropped_bytes,
+            "segments": self.segments,
+        }
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _write_batch(self, t: float, data: bytes) -> None:
+        mv = memoryview(data)
+        while mv:
+            if self._wf is None:
+                frames = (len(data) - len(mv)) // self.frame_bytes
+                self._open_segment(t + frames / self.sample_rate)
+            n = len(mv)
+            if self.segment_bytes:
+                n = min(n, self.segment_bytes - self._seg_written)
+            self._wf.writeframesraw(mv[:n])
+            self._seg_written += n
+            seg = self.segments[-1]
+            seg["bytes"] += n
+            seg["frames"] = seg["bytes"] // self.frame_bytes
+            mv = mv[n:]
+            if self.segment_bytes and self._seg_written >= self.segment_bytes:
+                self._close_segment()
+
+    def _writer(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._write_batch(*item)
+            except OSError as e:
+                # 디스크 오류: 이후 배치는 버리고 close() 에서 보고
+                self.error = e
+        try:
+            self._close_segment()
+            if not self.segments:
+                self._write_index()
+        except OSError as e:
+            self.error = self.error or e
@@ -0,0 +1,353 @@
+# server_cli.py
+"""
+헤드리스 서버 진입점 (GUI 없이 캡처 + 서버 실행).
+
+- tkinter / messagebox 를 전혀 로드하지 않음.
+- 무거운 모듈은 필요한 기능에서만 로드:
+    soundcard  : 실제 loopback 장치를 쓸 때 (--source 면 불필요)
+    scipy      : 리샘플링 필터를 처음 설계할 때 (utils._polyphase_taps)
+    dotenv     : .env 파일이 있을 때만
+    http.server: --metrics-port 를 줄 때만
+    mp_server  : --workers 를 줄 때만
+- 설정 우선순위: 명령행 > 환경 변수 / .env > 기본값
+
+사용법:
+  python server_cli.py                         # 기본 loopback 장치
+  python server_cli.py --device "Speakers"     # 이름 일부로 장치 선택
+  python server_cli.py --source sine:440       # 장치 없이 (sine / noise / silence / wav:path)
+  python server_cli.py --list-devices
+  python server_cli.py --device desk=Speakers --device room=USB   # 여러 장치: 믹스 + 장치별 스트림
+"""
+
+import argparse
+import os
+import re
+import signal
+import sys
+import threading
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 26070
+DEFAULT_CHECKCODE = 20250918
+
+
+def _load_env() -> None:
+    """실행 파일(또는 이 파일) 옆 .env 로드. python-dotenv 가 없거나 파일이 없으면 건너뜀."""
+    from etc import get_base_dir
+
+    env_path = os.path.join(get_base_dir(), ".env")
+    if not os.path.exists(env_path):
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(env_path)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default):
+    try:
+        return float(os.getenv(name, ""))
+    except ValueError:
+        return default
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="audioMi headless server")
+    ap.add_argument("--host", default=None, help=f"기본 HOST 또는 {DEFAULT_HOST}")
+    ap.add_argument("--port", type=int, default=None, help=f"기본 PORT 또는 {DEFAULT_PORT}")
+    ap.add_argument("--checkcode", type=int, default=None)
+    ap.add_argument(
+        "--device",
+        action="append",
+        default=None,
+        help="loopback 장치 이름 (부분 일치). 여러 번 주면 믹스 + 장치별 스트림, [이름=]장치",
+    )
+    ap.add_argument(
+        "--source",
+        action="append",
+        default=None,
+        help="가상 소스 (sine[:freq] / noise / silence / wav:path / raw:...), 여러 번 가능, [이름=]소스",
+    )
+    ap.add_argument("--list-devices", action="store_true", help="loopback 장치 목록 출력")
+    ap.add_argument("--slow-policy", default="drop_oldest", choices=("drop_oldest", "skip_to_live", "disconnect"))
+    ap.add_argument("--metrics-port", type=int, default=None, help="Prometheus /metrics 포트 (0 = 끔)")
+    ap.add_argument("--multicast", default=None, help="UDP 멀티캐스트 group:port")
+    ap.add_argument("--workers", type=int, default=None, help="송신 워커 프로세스 수 (0 = 단일)")
+    ap.add_argument("--silence-db", type=float, default=None, help="무음 게이트 임계값 dBFS (예: -60, 기본 끔)")
+    ap.add_argument("--hangover", type=float, default=None, help="무음 게이트를 닫기 전 유지 시간(초)")
+    ap.add_argument("--history", type=float, default=None, help="replay 용 보관 시간(초, 0 = 끔)")
+    ap.add_argument("--archive", default=None, help="서버 내장 아카이브 디렉터리 (세그먼트 WAV + archive.idx)")
+    ap.add_argument("--archive-segment", type=float, default=None, help="아카이브 세그먼트 길이(초)")
+    ap.add_argument("--latency", default=None, choices=("low", "normal", "bulk"), help="청크 크기 프로파일")
+    ap.add_argument("--adaptive", action="store_true", help="클라이언트 수 / drain / 큐 깊이에 따라 청크 크기 자동 조정")
+    ap.add_argument("--no-formats", action="store_true", help="포맷 구독(cmd=3) 비활성")
+    ap.add_argument("--quiet", action="store_true", help="접속 / 해제 로그 숨김")
+    return ap.parse_args(argv)
+
+
+def _list_devices() -> int:
+    from utils import list_loopback_mics
+
+    for i, m in enumerate(list_loopback_mics()):
+        print(f"{i:2d}: {m.name}")
+    return 0
+
+
+def _pick_device(name):
+    from utils import list_loopback_mics
+
+    mics = list_loopback_mics()
+    if not mics:
+        raise SystemExit("[CLI] no loopback device found")
+    if name is None:
+        return mics[0]
+    for m in mics:
+        if name.lower() in m.name.lower():
+            return m
+    raise SystemExit(f"[CLI] device not found: {name}")
+
+
+def _split_name(spec: str, index: int):
+    """'이름=스펙' → (이름, 스펙). 이름이 없으면 src0, src1, ..."""
+    m = re.match(r"^(\w+)=(.+)$", spec)
+    if m:
+        return m.group(1), m.group(2)
+    return f"src{index}", spec
+
+
+def _open_sources(args: argparse.Namespace):
+    """(스트림 이름, 장치 / 가상 소스) 리스트. 아무것도 안 주면 기본 loopback 장치 1개."""
+    sources = []
+    for spec in args.source or []:
+        from audio_sources import open_source
+
+        name, spec = _split_name(spec, len(sources))
+        sources.append((name, open_source(spec)))
+    for spec in args.device or []:
+        name, spec = _split_name(spec, len(sources))
+        sources.append((name, _pick_device(spec)))
+    if not sources:
+        sources.append(("src0", _pick_device(None)))
+    return sources
+
+
+def run(args: argparse.Namespace) -> int:
+    _load_env()
+    host = args.host or os.getenv("HOST", DEFAULT_HOST)
+    port = args.port if args.port is not None else _env_int("PORT", DEFAULT_PORT)
+    checkcode = (
+        args.checkcode if args.checkcode is not None else _env_int("CHECKCODE", DEFAULT_CHECKCODE)
+    )
+    metrics_port = (
+        args.metrics_port if args.metrics_port is not None else _env_int("METRICS_PORT", 0)
+    )
+    multicast_spec = args.multicast if args.multicast is not None else os.getenv("MULTICAST", "")
+    workers = args.workers if args.workers is not None else _env_int("WORKERS", 0)
+    silence_db = args.silence_db if args.silence_db is not None else _env_float("SILENCE_DB", None)
+    hangover = args.hangover if args.hangover is not None else _env_float("SILENCE_HANGOVER", None)
+    history = args.history if args.history is not None else _env_float("HISTORY_SECONDS", 0.0)
+    archive_dir = args.archive if args.archive is not None else os.getenv("ARCHIVE_DIR", "").strip()
+    archive_segment = (
+        args.archive_segment
+        if args.archive_segment is not None
+        else _env_float("ARCHIVE_SEGMENT_SECONDS", None)
+    )
+    latency = args.latency or os.getenv("LATENCY_PROFILE", "").strip() or None
+    adaptive = args.adaptive or _env_int("ADAPTIVE_CHUNK", 0) != 0
+
+    if args.list_devices:
+        return _list_devices()
+
+    sources = _open_sources(args)
+    multi_source = len(sources) > 1
+    if multi_source and workers > 0:
+        raise SystemExit("[CLI] multiple sources are not supported with --workers")
+    mic = sources[0][1]
+
+    from audio_module import DEFAULT_HANGOVER_SEC, DEFAULT_SAMPLE_RATE, AudioCapture, SilenceGate
+    from metrics import PipelineMetrics
+
+    stop = threading.Event()
+
+    def status_cb(tag: str, payload=None) -> None:
+        if tag == "status":
+            if not args.quiet:
+                print(payload, flush=True)
+        elif tag in ("client_count", "ring_overrun", "client_drops"):
+            if not args.quiet:
+                print(f"[{tag}] {payload}", flush=True)
+        else:
+            # 태그 없이 메시지만 넘기는 로그
+            print(tag if payload is None else f"{tag} {payload}", flush=True)
+
+    def on_error(e: Exception) -> None:
+        print(f"[AUDIO] {e}", flush=True)
+        stop.set()
+
+    metrics = PipelineMetrics()
+
+    multicast = None
+    if multicast_spec:
+        from udp_transport import DEFAULT_UDP_PORT, MulticastSender
+
+        group, _, mc_port = multicast_spec.partition(":")
+        multicast = MulticastSender(checkcode, group, int(mc_port or DEFAULT_UDP_PORT))
+
+    gate = None
+    if silence_db is not None:
+        gate = SilenceGate(silence_db, DEFAULT_HANGOVER_SEC if hangover is None else hangover)
+        print(f"[AUDIO] silence gate < {silence_db} dBFS, hangover {gate.hangover_sec}s", flush=True)
+
+    sharded = None
+    format_hub = None
+    multi = None
+    if workers > 0:
+        from audio_module import capture_slot_bytes
+        from mp_server import ShardedAudioServer
+        from ring_buffer import DEFAULT_SLOT_BYTES
+
+        sharded = server = ShardedAudioServer(
+            checkcode,
+            host,
+            port,
+            workers=workers,
+            status_cb=status_cb,
+            metrics=metrics,
+            multicast=multicast,
+            slow_policy=args.slow_policy,
+            history_seconds=history,
+            # 공유 링 슬롯은 고정 크기 → 프로파일 / adaptive 최대 청크가 들어가도록
+            slot_bytes=max(
+                DEFAULT_SLOT_BYTES, capture_slot_bytes(latency_profile=latency, adaptive=adaptive)
+            ),
+        )
+        send_q = sharded.ring
+    else:
+        from net_server import NetAudioServer
+        from ring_buffer import PcmRing
+
+        streams = None
+        if multi_source:
+            from multi_capture import MultiCapture
+
+            # 기본 스트림 = 믹스, 장치별 링은 이름 붙은 스트림 (포맷 구독은 단일 장치에서만)
+            multi = MultiCapture(
+                sources,
+                error_callback=on_error,
+                metrics=metrics,
+                silence_gate=gate,
+                latency_profile=latency,
+                adaptive=adaptive,
+            )
+            send_q = multi.ring
+            streams = multi.streams
+        else:
+            if not args.no_formats:
+                from audio_format import FormatHub
+
+                format_hub = FormatHub(DEFAULT_SAMPLE_RATE)
+            send_q = PcmRing(slots=256)
+        server = NetAudioServer(
+            send_queue=send_q,
+            checkcode=checkcode,
+            host=host,
+            port=port,
+            status_cb=status_cb,
+            slow_policy=args.slow_policy,
+            format_hub=format_hub,
+            metrics=metrics,
+            multicast=multicast,
+            history_seconds=history,
+            streams=streams,
+        )
+
+    # 서버를 먼저 열고 (접속 가능 시점 단축), 리샘플러 설계(scipy)는 그 다음
+    server.start()
+    print(f"[SERVER] {host}:{port} checkcode={checkcode}", flush=True)
+    capture = multi or AudioCapture(
+        error_callback=on_error,
+        format_hub=format_hub,
+        metrics=metrics,
+        silence_gate=gate,
+        latency_profile=latency,
+        adaptive=adaptive,
+    )
+    archive = None
+    if archive_dir:
+        from archive import DEFAULT_SEGMENT_SECONDS, ArchiveTap
+
+        # 캡처보다 먼저 커서를 잡아서 첫 청크부터 기록
+        archive = ArchiveTap(
+            send_q,
+            archive_dir,
+            segment_seconds=archive_segment or DEFAULT_SEGMENT_SECONDS,
+            status_cb=status_cb,
+            metrics=metrics,
+        )
+        archive.start()
+    if multi is not None:
+        multi.start()
+        names = ", ".join(f"{name}='{m.name}'" for name, m in sources)
+        print(f"[AUDIO] mixing {len(sources)} sources: {names} (chunk={multi.chunk})", flush=True)
+    else:
+        capture.start(mic, send_q)
+        print(
+            f"[AUDIO] capture started on '{mic.name}' (chunk={capture.chunk}"
+            + (", adaptive)" if adaptive else ")"),
+            flush=True,
+        )
+
+    metrics_http = None
+    if metrics_port:
+        from metrics import MetricsHttpServer
+
+        try:
+            metrics_http = MetricsHttpServer(metrics.registry, port=metrics_port)
+            metrics_http.start()
+            print(f"[METRICS] http://127.0.0.1:{metrics_http.port}/metrics", flush=True)
+        except OSError as e:
+            metrics_http = None
+            print(f"[METRICS] disabled: {e}", flush=True)
+
+    def on_signal(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, on_signal)
+
+    try:
+        # 메인 스레드는 시그널 대기만 (Event.wait 는 윈도우에서 Ctrl+C 를 늦게 받으므로 짧게 끊어서)
+        while not stop.wait(0.5):
+            pass
+    finally:
+        if metrics_http is not None:
+            metrics_http.stop()
+        server.stop()
+        capture.stop()
+        if archive is not None:
+            archive.close()
+        if sharded is not None:
+            sharded.close()
+        print("[CLI] stopped", flush=True)
+    return 0
+
+
+def main(argv=None) -> int:
+    return run(_parse_args(argv))
+
+
+if __name__ == "__main__":
+    # PyInstaller 실행 파일에서 워커 프로세스(spawn) 지원
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# udp_transport.py
+"""
+UDP 멀티캐스트(또는 브로드캐스트) 오디오 전송.
+
+TCP 는 청취자마다 스트림 1개라 서버 부하가 청취자 수에 비례하지만,
+멀티캐스트는 청크당 데이터그램을 한 번만 보내고 LAN 의 모든 수신기가 공유.
+TCP 쪽(핑 / 코덱 / 지표)은 그대로 사용 가능.
+
+데이터그램 = UDP_HEADER + 페이로드 조각
+  <iBBHHqqi = (checkcode, kind, codec, frag_index, frag_count,
+               seq:int64, capture_ns:int64, sample_rate:int32)
+  청크 페이로드가 max_datagram 보다 크면 frag_count 개로 쪼개서 전송.
+
+수신 측:
+  Reassembler  : 조각 → 청크 (seq, codec, capture_ns, sample_rate, payload)
+  JitterBuffer : seq 순서 재정렬 + 손실 구간 은닉 (직전 청크 감쇠 반복 → 무음)
+"""
+
+import ipaddress
+import socket
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_codec import CODEC_PCM16
+
+UDP_HEADER = struct.Struct("<iBBHHqqi")
+KIND_AUDIO = 1
+
+DEFAULT_GROUP = "239.255.42.70"   # organization-local scope
+DEFAULT_UDP_PORT = 26071
+DEFAULT_MAX_DATAGRAM = 1200       # 보통 MTU 1500 에서 IP/UDP 헤더 빼고 여유
+DEFAULT_JITTER_CHUNKS = 3         # 재정렬 대기 청크 수 (~64 ms)
+
+# (seq, codec, capture_ns, sample_rate, payload)
+Chunk = Tuple[int, int, int, int, bytes]
+
+
+def _is_multicast(group: str) -> bool:
+    try:
+        return ipaddress.ip_address(group).is_multicast
+    except ValueError:
+        return False
+
+
+class MulticastSender:
+    """
+    청크 1개 → 데이터그램 1개 이상. 서버 루프에서 호출 (non-blocking 소켓).
+    group 이 멀티캐스트 주소가 아니면 브로드캐스트 / 유니캐스트로 전송.
+    """
+
+    def __init__(
+        self,
+        checkcode: int,
+        group: str = DEFAULT_GROUP,
+        port: int = DEFAULT_UDP_PORT,
+        codec: int = CODEC_PCM16,
+        ttl: int = 1,
+        interface: Optional[str] = None,
+        max_datagram: int = DEFAULT_MAX_DATAGRAM,
+        loopback: bool = True,
+    ) -> None:
+        self.checkcode = checkcode
+        self.group = group
+        self.port = port
+        self.codec = codec
+        self.ttl = ttl
+        self.interface = interface
+        self.loopback = loopback
+        self.max_payload = max_datagram - UDP_HEADER.size
+        if self.max_payload <= 0:
+            raise ValueError(f"max_datagram too small: {max_datagram}")
+
+        self._buf = bytearray(max_datagram)
+        self._sock: Optional[socket.socket] = None
+
+        self.datagrams = 0
+        self.bytes_sent = 0
+        self.errors = 0
+
+    def open(self) -> None:
+        if self._sock is not None:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        if _is_multicast(self.group):
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+            sock.setsockopt(
+                socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1 if self.loopback else 0
+            )
+            if self.interface:
+                sock.setsockopt(
+                    socket.IPPROTO_IP,
+                    socket.IP_MULTICAST_IF,
+                    socket.inet_aton(self.interface),
+                )
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setblocking(False)
+        self._sock = sock
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def send(self, seq: int, stamp_ns: int, sample_rate: int, payload) -> int:
+        """청크 1개 전송. 보낸 데이터그램 수 반환 (실패 조각은 errors 에 집계)."""
+        if self._sock is None:
+            return 0
+        mv = memoryview(payload).cast("B")
+        n = len(mv)
+        step = self.max_payload
+        count = max(1, -(-n // step))
+        if count > 0xFFFF:
+            self.errors += 1
+            return 0
+
+        buf = self._buf
+        hsize = UDP_HEADER.size
+        addr = (self.group, self.port)
+        sent = 0
+        for i in range(count):
+            part = mv[i * step : (i + 1) * step]
+            UDP_HEADER.pack_into(
+                buf, 0, self.checkcode, KIND_AUDIO, self.codec,
+                i, count, seq, stamp_ns, sample_rate,
+            )
+            size = hsize + len(part)
+            buf[hsize:size] = part
+            try:
+                self._sock.sendto(memoryview(buf)[:size], addr)
+            except (BlockingIOError, OSError):
+                # 송신 버퍼가 찼거나 네트워크 오류 → 이 조각은 버림
+                self.errors += 1
+                continue
+            sent += 1
+            self.bytes_sent += size
+        self.datagrams += sent
+        return sent
+
+
+def open_multicast_socket(
+    group: str = DEFAULT_GROUP,
+    port: int = DEFAULT_UDP_PORT,
+    interface: str = "0.0.0.0",
+) -> socket.socket:
+    """수신용 소켓 (SO_REUSEADDR + 그룹 가입). 브로드캐스트 주소면 가입 생략."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except OSError:
+            pass
+    sock.bind(("", port))
+    if _is_multicast(group):
+        mreq = socket.inet_aton(group) + socket.inet_aton(interface)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    sock.setblocking(False)
+    return sock
+
+
+class Reassembler:
+    """데이터그램 조각 → 완성된 청크. 오래된 미완성 청크는 버림."""
+
+    def __init__(self, checkcode: int, window: int = 64) -> None:
+        self.checkcode = checkcode
+        self.window = window
+        # seq → (codec, capture_ns, sample_rate, parts)
+        self._partial: Dict[int, Tuple[int, int, int, List[Optional[bytes]]]] = {}
+        self.newest = -1
+        self.invalid = 0
+        self.incomplete = 0
+
+    def feed(self, datagram) -> Optional[Chunk]:
+        if len(datagram) < UDP_HEADER.size:
+            self.invalid += 1
+            return None
+        check, kind, codec, index, count, seq, stamp, rate = UDP_HEADER.unpack_from(
+            datagram, 0
+        )
+        if check != self.checkcode or kind != KIND_AUDIO or index >= count:
+            self.invalid += 1
+            return None
+        body = bytes(memoryview(datagram)[UDP_HEADER.size :])
+        if count == 1:
+            self._advance(seq)
+            return seq, codec, stamp, rate, body
+
+        entry = self._partial.get(seq)
+        if entry is None:
+            entry = self._partial[seq] = (codec, stamp, rate, [None] * count)
+        parts = entry[3]
+        parts[index] = body
+        self._advance(seq)
+        if any(p is None for p in parts):
+            return None
+        del self._partial[seq]
+        return seq, codec, stamp, rate, b"".join(parts)
+
+    def _advance(self, seq: int) -> None:
+        if seq <= self.newest:
+            return
+        self.newest = seq
+        if self._partial:
+            stale = [s for s in self._partial if s < seq - self.window]
+            for s in stale:
+                del self._partial[s]
+            self.incomplete += len(stale)
+
+
+class JitterBuffer:
+    """
+    seq 순서 재정렬 + 손실 은닉 (디코딩된 int16 청크 단위).
+    - depth 청크만큼 뒤 청크가 도착할 때까지 빈 seq 를 기다리고, 그래도 없으면 은닉.
+    - 은닉: 직전 청크를 conceal_decay 배씩 줄여 반복, max_conceal 개 이후는 무음.
+    - 이미 내보낸 seq 보다 늦게 온 청크는 버림 (late).
+    """
+
+    def __init__(
+        self,
+        depth: int = DEFAULT_JITTER_CHUNKS,
+        max_conceal: int = 3,
+        conceal_decay: float = 0.5,
+        resync_gap: int = 256,
+    ) -> None:
+        self.depth = max(0, depth)
+        self.max_conceal = max_conceal
+        self.conceal_decay = conceal_decay
+        self.resync_gap = resync_gap
+
+        self.next_seq: Optional[int] = None
+        self._pending: Dict[int, np.ndarray] = {}
+        self._last: Optional[np.ndarray] = None
+        self._conceal_run = 0
+
+        self.received = 0
+        self.reordered = 0
+        self.late = 0
+        self.concealed = 0
+
+    def push(self, seq: int, pcm: np.ndarray) -> List[Tuple[int, np.ndarray, bool]]:
+        """청크 1개 추가. 내보낼 수 있는 (seq, pcm, concealed) 목록 반환."""
+        if self.next_seq is None:
+            self.next_seq = seq
+        if seq < self.next_seq:
+            self.late += 1
+            return []
+        if seq - self.next_seq > self.resync_gap:
+            # 송신측 재시작 등으로 seq 가 크게 튐 → 그 위치부터 다시 시작
+            self._pending.clear()
+            self.next_seq = seq
+        if seq in self._pending:
+            return []
+        if self._pending and seq < max(self._pending):
+            self.reordered += 1
+        self._pending[seq] = pcm
+        self.received += 1
+        return self._drain()
+
+    def _drain(self) -> List[Tuple[int, np.ndarray, bool]]:
+        out = []
+        pending = self._pending
+        while pending:
+            seq = self.next_seq
+            pcm = pending.pop(seq, None)
+            if pcm is not None:
+                self._last = pcm
+                self._conceal_run = 0
+                out.append((seq, pcm, False))
+            elif max(pending) - seq >= self.depth:
+                out.append((seq, self._conceal(), True))
+            else:
+                break
+            self.next_seq = seq + 1
+        return out
+
+    def _conceal(self) -> np.ndarray:
+        self.concealed += 1
+        self._conceal_run += 1
+        last = self._last
+        if last is None:
+            return np.zeros(0, dtype=np.int16)
+        if self._conceal_run > self.max_conceal:
+            return np.zeros_like(last)
+        gain = self.conceal_decay ** self._conceal_run
+        return (last.astype(np.float32) * gain).astype(np.int16)
@@ -1,6 +1,7 @@
+from functools import lru_cache
+from typing import Optional
+
 import numpy as np
-import soundcard as sc
-from scipy.signal import resample_poly
 
 
 def list_loopback_mics():
@@ -8,6 +9,9 @@ def list_loopback_mics():
     Loopback 장치 목록 반환.
     기본 스피커의 loopback 을 최우선으로 배치.
     """
+    # 사운드 장치가 필요한 곳에서만 로드 (클라이언트 / 서버 모듈은 불필요)
+    import soundcard as sc
+
     mics = sc.all_microphones(include_loopback=True)
 
     def is_loopback(m):
@@ -33,10 +37,131 @@ def dbfs_from_chunk(chunk: np.ndarray) -> float:
     return min(20 * np.log10(rms + 1e-12), 0.0)
 
 
-def float32_to_pcm16_resampled(chunk: np.ndarray, in_sr: int, out_sr: int) -> bytes:
+@lru_cache(maxsize=None)
+def _polyphase_taps(up: int, down: int) -> np.ndarray:
+    """
+    (up, down) 쌍에 대한 polyphase FIR 계수 (resample_poly 와 같은 설계).
+    반환 shape = (up, L), 각 행은 내적용으로 뒤집혀 있음.
+    """
+    # scipy 는 import 가 무거우므로 필터를 처음 설계할 때만 로드
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * up
+
+    taps_per_phase = -(-len(h) // up)
+    padded = np.zeros(taps_per_phase * up, dtype=np.float64)
+    padded[: len(h)] = h
+    # phase p 의 j 번째 계수 = h[p + j*up]
+    phases = padded.reshape(taps_per_phase, up).T
+    taps = np.ascontiguousarray(phases[:, ::-1], dtype=np.float32)
+    taps.setflags(write=False)
+    return taps
+
+
+class StreamResampler:
+    """
+    청크 단위 스트리밍 polyphase 리샘플러.
+    - 필터 계수는 (in_sr, out_sr) 쌍마다 한 번만 설계해서 캐시.
+    - 필터 상태(직전 입력 꼬리)를 청크 사이에 이어 붙이므로
+      청크 경계에 zero-padding 불연속이 생기지 않음.
+    - 입출력 버퍼를 미리 잡아 두고 재사용.
+    """
+
+    def __init__(self, in_sr: int, out_sr: int, max_chunk: int = 1024) -> None:
+        gcd = int(np.gcd(in_sr, out_sr))
+        self.in_sr = in_sr
+        self.out_sr = out_sr
+        self.up = out_sr // gcd
+        self.down = in_sr // gcd
+        self.passthrough = self.up == self.down
+
+        # 같은 레이트면 필터 없이 통과
+        self._taps = (
+            np.ones((1, 1), dtype=np.float32)
+            if self.passthrough
+            else _polyphase_taps(self.up, self.down)
+        )
+        self._ntaps = self._taps.shape[1]
+        self._in_buf = np.zeros(0, dtype=np.float32)
+        self._out_buf = np.zeros(0, dtype=np.float32)
+        self._reserve(max_chunk)
+        self.reset()
+
+    @property
+    def latency_frames(self) -> float:
+        """필터 군지연 (입력 샘플 기준)."""
+        if self.passthrough:
+            return 0.0
+        return 10 * max(self.up, self.down) / self.up
+
+    def reset(self) -> None:
+        """필터 상태 초기화 (스트림 재시작 시)."""
+        self._in_buf[: self._ntaps - 1] = 0.0
+        # 다음 출력 샘플의 위치 (업샘플 좌표, 현재 청크 시작 기준)
+        self._t = 0
+
+    def _reserve(self, n: int) -> None:
+        hist = self._ntaps - 1
+        if len(self._in_buf) < hist + n:
+            buf = np.zeros(hist + n, dtype=np.float32)
+            if len(self._in_buf) >= hist:
+                buf[:hist] = self._in_buf[:hist]
+            self._in_buf = buf
+        max_out = (n * self.up) // self.down + 1
+        if len(self._out_buf) < max_out:
+            self._out_buf = np.zeros(max_out, dtype=np.float32)
+
+    def process(self, mono: np.ndarray) -> np.ndarray:
+        """
+        mono float 청크 → 리샘플된 float32.
+        반환값은 내부 버퍼의 view 이므로 다음 호출 전까지만 유효.
+        """
+        if self.passthrough:
+            return mono
+
+        n = len(mono)
+        self._reserve(n)
+        hist = self._ntaps - 1
+        buf = self._in_buf
+        buf[hist : hist + n] = mono
+
+        up, down = self.up, self.down
+        span = n * up
+        t0 = self._t
+        count = max(0, -(-(span - t0) // down))
+        out = self._out_buf[:count]
+
+        if count:
+            windows = np.lib.stride_tricks.sliding_window_view(
+                buf[: hist + n], self._ntaps
+            )
+            if up == 1:
+                # 출력 위치가 입력에서 등간격 → strided view 로 바로 내적
+                np.dot(windows[t0 : t0 + count * down : down], self._taps[0], out=out)
+            else:
+                t = t0 + down * np.arange(count)
+                np.einsum(
+                    "ij,ij->i", windows[t // up], self._taps[t % up], out=out
+                )
+
+        self._t = t0 + count * down - span
+        # 다음 청크를 위해 입력 꼬리 보관
+        buf[:hist] = buf[n : n + hist]
+        return out
+
+
+def float32_to_pcm16_resampled(
+    chunk: np.ndarray,
+    in_sr: int,
+    out_sr: int,
+    resampler: "StreamResampler | None" = None,
+) -> bytes:
     """
     float32 [-1,1] → mono int16 → bytes
-    필요 시 resample_poly로 리샘플링.
+    필요 시 리샘플링. resampler 를 넘기면 스트리밍 리샘플러를 쓰고,
+    없으면 청크마다 resample_poly (상태 없음).
     """
     # 1. Stereo -> Mono Mixdown
     if chunk.ndim == 2:
@@ -48,9 +173,13 @@ def float32_to_pcm16_resampled(chunk: np.ndarray, in_sr: int, out_sr: int) -> by
     mono = np.clip(mono, -1.0, 1.0)
 
     # 3. 리샘플링
-    if in_sr != out_sr:
+    if resampler is not None:
+        mono = resampler.process(mono)
+    elif in_sr != out_sr:
         gcd = np.gcd(in_sr, out_sr)
         up, down = out_sr // gcd, in_sr // gcd
+        from scipy.signal import resample_poly
+
         mono = resample_poly(mono, up, down)
 
     # 4. [중요 수정] 증폭 및 2차 클리핑 (오버플로우 방지)
@@ -61,4 +190,93 @@ def float32_to_pcm16_resampled(chunk: np.ndarray, in_sr: int, out_sr: int) -> by
     # 5. int16 변환
     pcm16 = scaled.astype(np.int16)
     
-    return pcm16.tobytes()
\ No newline at end of file
+    return pcm16.tobytes()
+
+class Pcm16Encoder:
+    """
+    캡처 청크 1-pass 변환기.
+    - 스테레오 → 모노 믹스다운을 한 번만 하고,
+      같은 모노 버퍼에서 RMS / peak 를 계산,
+    - (스트리밍) 리샘플 후 재사용 int16 버퍼에 바로 기록.
+    - encode() 는 bytes 대신 memoryview 를 돌려줌.
+      출력 버퍼는 pool 개수만큼 돌려 쓰므로, 큐에 쌓인 view 는
+      pool 바퀴를 다 돌기 전까지 유효.
+    """
+
+    def __init__(
+        self,
+        in_sr: int,
+        out_sr: int,
+        max_chunk: int = 1024,
+        pool: int = 4,
+        resampler: Optional[StreamResampler] = None,
+    ) -> None:
+        self.resampler = resampler or StreamResampler(in_sr, out_sr, max_chunk)
+        self.max_chunk = max_chunk
+        self._mono = np.zeros(max_chunk, dtype=np.float32)
+        self._out: list = []
+        self._idx = 0
+        self.reserve_pool(pool)
+
+        self.last_rms = 0.0
+        self.last_peak = 0.0
+        self.last_dbfs = -240.0
+
+    @property
+    def max_out_bytes(self) -> int:
+        """max_chunk 입력 1개에 대한 최대 출력 바이트 수."""
+        return ((self.max_chunk * self.resampler.up) // self.resampler.down + 1) * 2
+
+    def reserve_pool(self, pool: int) -> None:
+        """출력 버퍼 개수를 최소 pool 개로 확보."""
+        max_out = self.max_out_bytes // 2
+        while len(self._out) < max(1, pool):
+            self._out.append(np.zeros(max_out, dtype=np.int16))
+
+    def _reserve_chunk(self, n: int) -> None:
+        if n <= self.max_chunk:
+            return
+        self.max_chunk = n
+        self._mono = np.zeros(n, dtype=np.float32)
+        pool = len(self._out)
+        self._out = []
+        self.reserve_pool(pool)
+
+    def encode(self, chunk: np.ndarray, out: Optional[np.ndarray] = None) -> memoryview:
+        """
+        float32 [-1,1] 청크 → PCM16 mono (out_sr) memoryview.
+        out (int16 배열) 을 주면 내부 pool 대신 거기에 직접 기록.
+        """
+        n = chunk.shape[0]
+        self._reserve_chunk(n)
+        mono = self._mono[:n]
+
+        # 1. 믹스다운 (1회)
+        if chunk.ndim == 2 and chunk.shape[1] == 2:
+            np.add(chunk[:, 0], chunk[:, 1], out=mono)
+            mono *= 0.5
+        elif chunk.ndim == 2 and chunk.shape[1] > 2:
+            np.sum(chunk, axis=1, out=mono)
+            mono *= 1.0 / chunk.shape[1]
+        else:
+            mono[:] = chunk.reshape(n)
+
+        # 2. 같은 버퍼에서 레벨 계산
+        rms = float(np.sqrt(np.dot(mono, mono) / max(n, 1) + 1e-12))
+        self.last_rms = rms
+        self.last_peak = float(max(mono.max(), -mono.min())) if n else 0.0
+        self.last_dbfs = min(20 * np.log10(rms + 1e-12), 0.0)
+
+        # 3. 클리핑 → 리샘플 → 스케일 (모두 in-place)
+        np.clip(mono, -1.0, 1.0, out=mono)
+        res = self.resampler.process(mono)
+        res *= 32767.0
+        np.clip(res, -32768.0, 32767.0, out=res)
+
+        # 4. int16 재사용 버퍼에 기록
+        if out is None:
+            out = self._out[self._idx]
+            self._idx = (self._idx + 1) % len(self._out)
+        out = out[: len(res)]
+        np.copyto(out, res, casting="unsafe")
+        return memoryview(out).cast("B")